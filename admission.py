@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Controle de admissão dos jobs paralelos por memória e espaço em disco
+
+Antes de iniciar um job, a memória do ffmpeg e o tamanho das saídas são
+estimados a partir da sondagem (resolução, duração, bitrate ou tamanho
+alvo). Um job só começa quando a soma dos jobs em andamento cabe no limite
+de memória e no espaço livre do disco de saída; um job que não caberia nem
+sozinho falha na hora, com o motivo, em vez de depois de uma hora de encode.
+"""
+import os
+import shutil
+import threading
+
+import mediaprobe
+import planner
+import profiles
+import ratecontrol
+import tuning
+
+# Resolução de referência de tuning.MEMORY_PER_JOB (encode 1080p)
+REFERENCE_PIXELS = 1920 * 1080
+MIN_MEMORY_SCALE = 0.25
+# A fração da memória disponível (no início do lote) que os jobs podem usar
+MEMORY_FRACTION = 0.8
+# Bits por pixel de um H.264 em CRF 23 com conteúdo típico; o ffprobe
+# resumido não traz a taxa de quadros, então vale um valor comum
+BITS_PER_PIXEL_CRF23 = 0.1
+REFERENCE_CRF = 23
+DEFAULT_FPS = 30
+DEFAULT_AUDIO_BITRATE = 192000
+# Estimativas de tamanho erram para cima: é melhor esperar do que encher o disco
+SIZE_MARGIN = 1.1
+DEFAULT_DISK_RESERVE = 512 * 1024 * 1024
+# Intervalo para reavaliar os jobs retidos (o espaço livre muda por fora)
+ADMISSION_POLL = 2.0
+
+def _format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def estimate_memory(info, profile, plan):
+    """Memória estimada do ffmpeg para uma saída (bytes)"""
+    if plan['video'] != 'encode':
+        kind = tuning.JOB_COPY if plan['video'] == 'copy' else tuning.JOB_AUDIO
+        return tuning.MEMORY_PER_JOB[kind]
+    video = mediaprobe.first_stream(info, 'video') if info else None
+    pixels = (video['width'] or 0) * (video['height'] or 0) if video else 0
+    # Lookahead e quadros de referência crescem com a área do quadro
+    scale = max(MIN_MEMORY_SCALE, pixels / REFERENCE_PIXELS) if pixels else 1.0
+    return int(tuning.MEMORY_PER_JOB[tuning.JOB_VIDEO] * scale)
+
+def _video_bitrate(info, profile, plan):
+    video = mediaprobe.first_stream(info, 'video')
+    if plan['video'] == 'copy':
+        return video.get('bit_rate') or info.get('bit_rate') or 0
+    if profile.get('video_bitrate'):
+        return ratecontrol.parse_bitrate(profile['video_bitrate'])
+    pixels = (video['width'] or 0) * (video['height'] or 0) if video else 0
+    if profile.get('crf') is not None and pixels:
+        return pixels * DEFAULT_FPS * BITS_PER_PIXEL_CRF23 * 2 ** ((REFERENCE_CRF - profile['crf']) / 6)
+    return info.get('bit_rate') or 0
+
+def _audio_bitrate(info, profile, plan):
+    if plan['audio'] == 'copy':
+        stream = mediaprobe.first_stream(info, 'audio')
+        return (stream.get('bit_rate') if stream else None) or DEFAULT_AUDIO_BITRATE
+    if profile.get('audio_bitrate'):
+        return ratecontrol.parse_bitrate(profile['audio_bitrate'])
+    return DEFAULT_AUDIO_BITRATE
+
+def estimate_output_size(input_file, info, profile, plan):
+    """Tamanho estimado de uma saída (bytes, com margem)"""
+    duration = info['duration'] if info else None
+    if profile.get('target_size'):
+        return int(ratecontrol.parse_size(profile['target_size']) * SIZE_MARGIN)
+    if not duration:
+        # Sem sondagem: a saída raramente passa do tamanho da entrada
+        try:
+            return int(os.path.getsize(input_file) * SIZE_MARGIN)
+        except OSError:
+            # Entrada apagada ou movida no meio do lote: o job falha sozinho
+            # na conversão, sem derrubar o lote aqui
+            return 0
+    if profile.get('target_bitrate') and plan['video'] == 'encode':
+        bitrate = ratecontrol.parse_bitrate(profile['target_bitrate'])
+    else:
+        bitrate = 0
+        if plan['video']:
+            bitrate += _video_bitrate(info, profile, plan)
+        if plan['audio']:
+            bitrate += _audio_bitrate(info, profile, plan)
+    return int(bitrate * duration / 8 * SIZE_MARGIN)
+
+def estimate_job(input_file, profile, outputs, info=None):
+    """Estimativa de um job: memória total e (saída final, temporária, bytes)
+
+    outputs é a lista de (arquivo final, arquivo temporário) na ordem dos
+    perfis, como em core.prepare_conversion. info é a sondagem, se quem
+    chama já a tem (senão o arquivo é sondado aqui).
+    """
+    if info is None:
+        info = mediaprobe.probe_media(input_file)
+    memory = 0
+    sizes = []
+    for target, (final_file, partial_file) in zip(profiles.as_list(profile), outputs):
+        plan = planner.plan_conversion(info, target)
+        memory += estimate_memory(info, target, plan)
+        sizes.append((final_file, partial_file, estimate_output_size(input_file, info, target, plan)))
+    return {'input': input_file, 'memory': memory, 'outputs': sizes}
+
+def _existing_dir(path):
+    """Primeira pasta existente no caminho (a pasta de saída pode não existir ainda)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    while not os.path.isdir(directory) and os.path.dirname(directory) != directory:
+        directory = os.path.dirname(directory)
+    return directory
+
+def _disk_needs(estimate):
+    """Bytes a gravar por disco: {st_dev: (pasta, bytes)}"""
+    needs = {}
+    for final_file, partial_file, size in estimate['outputs']:
+        directory = _existing_dir(final_file)
+        device = os.stat(directory).st_dev
+        # O que já foi gravado no temporário não precisa mais ser reservado
+        try:
+            size = max(0, size - os.path.getsize(partial_file))
+        except OSError:
+            pass
+        _, total = needs.get(device, (directory, 0))
+        needs[device] = (directory, total + size)
+    return needs
+
+class AdmissionController:
+    """Decide quais jobs podem começar sem estourar a memória ou o disco
+
+    memory_limit em bytes (padrão: MEMORY_FRACTION da memória disponível;
+    None quando ela não pode ser medida). disk_reserve é o espaço mínimo
+    que sempre fica livre em cada disco de saída. Os métodos podem ser
+    chamados de várias threads.
+    """
+
+    def __init__(self, memory_limit=None, disk_reserve=DEFAULT_DISK_RESERVE):
+        if memory_limit is None:
+            available = tuning.available_memory()
+            memory_limit = int(available * MEMORY_FRACTION) if available else None
+        self.memory_limit = memory_limit
+        self.disk_reserve = disk_reserve
+        self._running = []
+        self._lock = threading.Lock()
+
+    def _free(self, directory):
+        return shutil.disk_usage(directory).free - self.disk_reserve
+
+    def check(self, estimate):
+        """Motivo pelo qual o job não cabe nem sozinho (None se couber)"""
+        if self.memory_limit and estimate['memory'] > self.memory_limit:
+            return (f"precisa de ~{_format_size(estimate['memory'])} de memória "
+                    f"(limite {_format_size(self.memory_limit)})")
+        for directory, needed in _disk_needs(estimate).values():
+            free = self._free(directory)
+            if needed > free:
+                return (f"espaço insuficiente em {directory}: saída estimada em "
+                        f"{_format_size(needed)}, livre {_format_size(max(0, free))}")
+        return None
+
+    def try_admit(self, estimate):
+        """Reserva memória e disco para o job se couber junto dos que rodam
+
+        Sem jobs em andamento o job é sempre admitido (check já garantiu que
+        ele cabe sozinho). Retorna True se o job pode começar.
+        """
+        with self._lock:
+            if self._running:
+                if self.memory_limit:
+                    memory = sum(job['memory'] for job in self._running) + estimate['memory']
+                    if memory > self.memory_limit:
+                        return False
+                pending = {}
+                for job in self._running:
+                    for device, (_, size) in _disk_needs(job).items():
+                        pending[device] = pending.get(device, 0) + size
+                for device, (directory, needed) in _disk_needs(estimate).items():
+                    if needed + pending.get(device, 0) > self._free(directory):
+                        return False
+            self._running.append(estimate)
+            return True
+
+    def release(self, estimate):
+        with self._lock:
+            if estimate in self._running:
+                self._running.remove(estimate)
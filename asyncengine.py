@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""Motor asyncio: os ffmpeg rodam como filhos diretos, sem um processo Python por worker
+
+Um semáforo limita quantas conversões rodam ao mesmo tempo. O progresso
+(-progress pipe:1) e o stderr são lidos como streams, guardando só as
+últimas linhas. Cada job pode ter um tempo limite, e Ctrl+C cancela o lote:
+os ffmpeg em andamento são encerrados e as saídas parciais apagadas.
+"""
+import asyncio
+import functools
+import os
+import signal
+import time
+from collections import deque
+
+import admission
+import convertermoreperformace as core
+import metrics
+import profiles
+import recovery
+import tuning
+
+STDERR_TAIL_LINES = 40
+
+class DashboardSink:
+    """Entrega os eventos direto ao painel (mesmo processo, sem Manager)"""
+
+    def __init__(self, dashboard):
+        self.dashboard = dashboard
+
+    def put(self, event):
+        self.dashboard.handle(event)
+        self.dashboard.render()
+
+async def in_thread(func, *args):
+    """Roda func(*args) no pool de threads do loop (asyncio.to_thread exige Python 3.9)"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+async def _read_progress(stream, progress_queue, job_id, pid=None, stats=None):
+    fields = {}
+    async for raw in stream:
+        key, sep, value = raw.decode('utf-8', 'replace').strip().partition('=')
+        if not sep:
+            continue
+        fields[key] = value
+        if key == 'progress':
+            # Fim de um bloco de progresso; o último (progress=end) chega
+            # logo antes do ffmpeg sair, então a amostra final é fiel
+            if stats is not None:
+                stats.update(metrics.sample_process(pid) or {})
+            if progress_queue is not None:
+                position, speed, fps = core.parse_progress_block(fields)
+                progress_queue.put({'type': 'progress', 'job': job_id, 'time': position,
+                                    'speed': speed, 'fps': fps})
+            fields = {}
+
+async def _read_tail(stream, tail):
+    async for raw in stream:
+        tail.append(raw.decode('utf-8', 'replace'))
+
+async def _kill(process):
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+async def run_ffmpeg_async(cmd, progress_queue=None, job_id=None, timeout=None, stats=None):
+    """Versão assíncrona de run_ffmpeg com tempo limite opcional
+
+    Retorna (código de saída, últimas linhas do stderr); o código é None
+    quando o tempo limite estourou. Se a tarefa for cancelada, o ffmpeg é
+    encerrado antes de propagar o cancelamento. stats recebe CPU e pico de
+    memória amostrados de /proc (o asyncio é quem aguarda o processo, então
+    os.wait4 não pode ser usado).
+    """
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + cmd[1:]
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    async def communicate():
+        await asyncio.gather(_read_progress(process.stdout, progress_queue, job_id, process.pid, stats),
+                             _read_tail(process.stderr, stderr_tail))
+        return await process.wait()
+
+    try:
+        returncode = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(process)
+        return None, ''.join(stderr_tail)
+    except BaseException:
+        await _kill(process)
+        raise
+    return returncode, ''.join(stderr_tail)
+
+async def _admit(controller, input_file, profile):
+    """Espera o job caber na memória e no disco; retorna (estimativa, motivo da recusa)"""
+    estimate = await in_thread(admission.estimate_job, input_file, profile,
+                               core.job_outputs(input_file, profile))
+    reason = controller.check(estimate)
+    if reason:
+        return None, reason
+    while not controller.try_admit(estimate):
+        await asyncio.sleep(admission.ADMISSION_POLL)
+    return estimate, None
+
+async def _run_attempt(input_file, profile, threads, slot, job_id, progress_queue, timeout, partial_tag=None):
+    """Uma tentativa de conversão, como core._run_attempt
+
+    Retorna (sucesso, job, código de saída, stderr, tempo, tamanho, uso);
+    o código é None quando o tempo limite estourou. Se a tarefa for
+    cancelada, as saídas parciais são apagadas antes de propagar.
+    """
+    filename = os.path.basename(input_file)
+    # A sondagem pode chamar o ffprobe: fora do event loop
+    job = await in_thread(core.prepare_conversion, input_file, profile, threads, partial_tag)
+    success = False
+    returncode, stderr_tail, total_time, actual_size = None, '', 0.0, 0
+    stats = {}
+    try:
+        if progress_queue is not None:
+            progress_queue.put({'type': 'start', 'job': job_id, 'pid': f"slot-{slot}",
+                                'filename': filename, 'duration': job['duration']})
+        for note in job['notes']:
+            core._log(progress_queue, f"   [P{slot}] {note}")
+        start_time = time.time()
+        returncode = 0
+        for cmd in job['pre_cmds'] + [job['cmd']] + job['post_cmds']:
+            # O tempo limite vale para o job inteiro, com todas as passadas
+            remaining = timeout - (time.time() - start_time) if timeout else None
+            returncode, stderr_tail = await run_ffmpeg_async(cmd, progress_queue, job_id, remaining, stats)
+            if returncode != 0:
+                break
+        total_time = time.time() - start_time
+
+        if returncode == 0:
+            actual_size = core.finalize_conversion(job, True)
+            success = True
+            core._log(progress_queue, f"✅ [P{slot}] Sucesso: {filename} | Tempo: {core.format_time(total_time)} "
+                                      f"| Tamanho: {core.format_size(actual_size)} | {job['path']}")
+    except asyncio.CancelledError:
+        # No Python 3.7 CancelledError ainda é um Exception: não vira falha do job
+        raise
+    except Exception as e:
+        stderr_tail += str(e)
+        returncode = returncode or 1
+    finally:
+        if not success:
+            core.finalize_conversion(job, False)
+    return success, job, returncode, stderr_tail, total_time, actual_size, stats
+
+async def convert_job(input_file, job_id, profile, threads, semaphore, free_slots,
+                      progress_queue=None, timeout=None, metrics_path=None, controller=None, partial_tag=None):
+    """Converte um arquivo quando houver vaga no semáforo (e na memória/disco)
+
+    Falhas seguem as políticas de recovery.py, como em core.convert_file.
+    partial_tag entra nos nomes temporários (ver core.get_partial_path).
+    Retorna (sucesso, nome do arquivo, caminho de conversão ou None).
+    """
+    filename = os.path.basename(input_file)
+    submitted_at = time.time()
+    async with semaphore:
+        estimate = None
+        if controller is not None:
+            estimate, reason = await _admit(controller, input_file, profile)
+            if reason:
+                core._log(progress_queue, f"❌ Não iniciado: {filename} - {reason}")
+                if progress_queue is not None:
+                    progress_queue.put({'type': 'end', 'job': job_id, 'success': False})
+                return False, filename, None
+        slot = min(free_slots)
+        free_slots.remove(slot)
+        started_at = time.time()
+        job = None
+        success = False
+        try:
+            core._log(progress_queue, f"🔄 [P{slot}] Convertendo: {filename}")
+            chain = recovery.fallback_chain(profile)
+            step = 0
+            retries = 0
+            attempt = 0
+            while True:
+                attempt += 1
+                success, job, returncode, stderr_tail, total_time, actual_size, stats = await _run_attempt(
+                    input_file, chain[step], threads, slot, job_id, progress_queue, timeout, partial_tag)
+                category = None if success else recovery.classify(returncode, stderr_tail)
+                if metrics_path:
+                    metrics.append_record(metrics_path, metrics.build_record(
+                        job, returncode, stderr_tail, total_time, actual_size, stats,
+                        started_at - submitted_at if attempt == 1 else None, 'async', category, attempt))
+                if success:
+                    break
+
+                action, delay = recovery.decide(category, retries, step + 1 < len(chain))
+                if action == recovery.FALLBACK:
+                    step += 1
+                elif action == recovery.RETRY:
+                    retries += 1
+                if category == recovery.TIMEOUT:
+                    core._log(progress_queue, f"⏱️  [P{slot}] Tempo limite de {core.format_time(timeout)} "
+                                              f"excedido: {filename}")
+                else:
+                    core.log_failure(progress_queue, slot, filename, category, stderr_tail, action, delay,
+                                     chain[step])
+                if action == recovery.GIVE_UP:
+                    break
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            raise    # Ctrl+C ou lease perdido: sem nova tentativa (ver _run_attempt)
+        except Exception as e:
+            core._log(progress_queue, f"❌ [P{slot}] Erro: {filename} - {str(e)}")
+        finally:
+            if progress_queue is not None:
+                progress_queue.put({'type': 'end', 'job': job_id, 'success': success})
+            if estimate is not None:
+                controller.release(estimate)
+            free_slots.append(slot)
+        return success, filename, job['path'] if job else None
+
+async def _refresh(dashboard):
+    while True:
+        dashboard.render()
+        await asyncio.sleep(dashboard.refresh)
+
+async def _run_batch(video_files, profile, max_workers, threads, dashboard, batch_manifest, timeout,
+                     metrics_path=None, controller=None, verifier=None):
+    """Executa o lote; retorna (resultados por arquivo, cancelado?)"""
+    main_task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    try:
+        # Ctrl+C cancela o lote em vez de interromper o event loop no meio
+        loop.add_signal_handler(signal.SIGINT, main_task.cancel)
+    except (NotImplementedError, RuntimeError):
+        pass    # Windows: o asyncio.run já cancela a tarefa principal
+
+    semaphore = asyncio.Semaphore(max_workers)
+    free_slots = list(range(1, max_workers + 1))
+    progress_queue = DashboardSink(dashboard) if dashboard is not None else None
+    refresher = asyncio.create_task(_refresh(dashboard)) if dashboard is not None else None
+
+    tasks = {}
+    for i, file in enumerate(video_files):
+        if batch_manifest is not None:
+            batch_manifest.record('start', file)
+        task = asyncio.create_task(convert_job(file, i, profile, threads, semaphore, free_slots,
+                                               progress_queue, timeout, metrics_path, controller))
+        tasks[task] = file
+
+    results = {}
+    cancelled = False
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[tasks[task]] = task.result()
+                if batch_manifest is not None:
+                    batch_manifest.record('done' if task.result()[0] else 'failed', tasks[task])
+                if task.result()[0] and verifier is not None:
+                    # Verificação em threads de baixa prioridade, sem esperar por ela
+                    verifier.submit(tasks[task], core.job_outputs(tasks[task], profile))
+                if dashboard is None:
+                    print(f"📊 Progresso: {len(results)}/{len(video_files)} concluídos")
+    except asyncio.CancelledError:
+        cancelled = True
+        # Encerrar os ffmpeg em andamento e apagar as saídas parciais
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGINT)
+        except (NotImplementedError, RuntimeError):
+            pass
+        if refresher is not None:
+            refresher.cancel()
+            dashboard.render(force=True)
+    return results, cancelled
+
+def convert_files_async(video_files, max_workers=None, show_progress=True, schedule=True,
+                        batch_manifest=None, profile=None, timeout=None, metrics_path=None,
+                        admission_control=None, verifier=None):
+    """Equivalente a core.convert_files_parallel usando asyncio
+
+    timeout limita, em segundos, cada conversão; metrics_path recebe uma
+    linha de métricas por job (ver metrics.py); admission_control e
+    verifier como em core.convert_files_parallel. Retorna
+    (sucessos, falhas, tempo total); Ctrl+C gera KeyboardInterrupt depois
+    de limpar os jobs em andamento.
+    """
+    # Encoders que este ffmpeg não tem são trocados uma vez, antes do lote
+    profile = recovery.resolve_encoders(profile or profiles.profile_for_flags())
+    controller = admission_control or admission.AdmissionController()
+    batch = core.plan_batch(video_files, profile, max_workers, schedule)
+    video_files = batch['files']
+    max_workers = batch['max_workers']
+
+    print(f"🚀 Processando {len(video_files)} arquivos com {max_workers} conversões simultâneas"
+          + (f" ({batch['threads']} threads cada)" if batch['kind'] == tuning.JOB_VIDEO else ""))
+    print(f"{'='*60}")
+
+    dashboard = core.ProgressDashboard(len(video_files), durations=batch['durations']) if show_progress else None
+    start_time = time.time()
+    results, cancelled = asyncio.run(_run_batch(
+        video_files, profile, max_workers, batch['threads'], dashboard, batch_manifest, timeout,
+        metrics_path, controller, verifier))
+    if cancelled:
+        raise KeyboardInterrupt
+
+    success_files = []
+    failed_files = []
+    conversion_paths = {}
+    for file in video_files:
+        success, _, conversion_path = results[file]
+        (success_files if success else failed_files).append(file)
+        if conversion_path:
+            conversion_paths[file] = conversion_path
+
+    verification = None
+    if verifier is not None:
+        verification = core.apply_verification(verifier, success_files, failed_files, batch_manifest)
+    elapsed_time = time.time() - start_time
+    core.print_batch_summary(conversion_paths, batch['predicted_makespan'], elapsed_time, verification)
+    return success_files, failed_files, elapsed_time
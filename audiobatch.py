@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Motor em lote para muitos arquivos de áudio curtos (WAV/AC3 → MP3/AC3)
+
+Com milhares de clipes, iniciar um ffmpeg por arquivo custa mais que a
+conversão em si. Aqui cada ffmpeg recebe um grupo de entradas, com um -map
+e uma saída por entrada, e vários grupos rodam ao mesmo tempo. Cada clipe
+passa pelo planner como nos outros motores (um AC3 que já está no formato
+de destino é copiado, não reconvertido), e cada grupo passa pelo controle
+de admissão (memória e disco somados dos clipes). Se um grupo falhar, os
+arquivos dele são refeitos um a um por core.convert_file, com as novas
+tentativas e a cadeia de encoders de recovery.py, para que um clipe
+corrompido não derrube os outros.
+"""
+import math
+import os
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import admission
+import convertermoreperformace as core
+import metrics
+import planner
+import profiles
+import recovery
+import tuning
+
+AUDIO_EXTENSIONS = ('.wav', '.ac3')
+DEFAULT_BATCH_SIZE = 16
+# Abaixo disso o ganho de agrupar não compensa: motor normal
+MIN_BATCH_FILES = 4
+STDERR_TAIL_LINES = 40
+
+def is_audio_input(path):
+    return path.lower().endswith(AUDIO_EXTENSIONS)
+
+def applies_to(files, profile):
+    """O lote de áudio vale para estes arquivos e perfil(is)?"""
+    return (all(profiles.is_audio_only(target) for target in profiles.as_list(profile))
+            and sum(1 for f in files if is_audio_input(f)) >= MIN_BATCH_FILES)
+
+def build_group_command(files, profile, infos):
+    """Um ffmpeg para o grupo: todas as entradas, uma saída por entrada e perfil
+
+    infos são as sondagens ({arquivo: resumo do mediaprobe}) usadas pelo
+    planner. Retorna (comando, {arquivo: [(saída final, temporária)]},
+    {arquivo: caminho do planner}).
+    """
+    targets = profiles.as_list(profile)
+    cmd = ['ffmpeg', '-v', 'error', '-nostdin']
+    for file in files:
+        cmd += ['-i', file]
+    outputs = {}
+    paths = {}
+    for i, file in enumerate(files):
+        outputs[file] = []
+        plans = []
+        for target, (final_file, output_file) in zip(targets, core.job_outputs(file, profile)):
+            os.makedirs(os.path.dirname(final_file), exist_ok=True)
+            plan = planner.plan_conversion(infos.get(file), target)
+            cmd += ['-map', f'{i}:a:0'] + profiles.output_args(target, plan) + [output_file]
+            outputs[file].append((final_file, output_file))
+            plans.append(plan['path'])
+        paths[file] = '+'.join(plans)
+    return cmd, outputs, paths
+
+def _discard(outputs):
+    for _, output_file in outputs:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+def convert_group(files, profile, infos):
+    """Converte um grupo com um único ffmpeg
+
+    Retorna ([(arquivo, sucesso, tamanho das saídas, caminho)], código de
+    saída, stderr, segundos).
+    """
+    cmd, outputs, paths = build_group_command(files, profile, infos)
+    start_time = time.time()
+    result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, errors='replace')
+    elapsed = time.time() - start_time
+    stderr_tail = '\n'.join(result.stderr.splitlines()[-STDERR_TAIL_LINES:])
+    results = []
+    for file in files:
+        if result.returncode == 0:
+            for final_file, output_file in outputs[file]:
+                os.replace(output_file, final_file)
+            size = sum(os.path.getsize(final_file) for final_file, _ in outputs[file])
+            results.append((file, True, size, paths[file]))
+        else:
+            _discard(outputs[file])
+            results.append((file, False, 0, paths[file]))
+    return results, result.returncode, stderr_tail, elapsed
+
+def make_groups(files, batch_size, workers):
+    """Divide os arquivos em grupos, com pelo menos um grupo por worker"""
+    size = max(1, min(batch_size, math.ceil(len(files) / workers)))
+    return [files[i:i + size] for i in range(0, len(files), size)]
+
+def _record_metrics(metrics_path, file, profile, info, path, success, seconds, size, returncode, stderr_tail):
+    job = {'input': file, 'path': path, 'duration': info['duration'] if info else None, 'probe_seconds': 0.0,
+           'outputs': core.job_outputs(file, profile)}
+    metrics.append_record(metrics_path, metrics.build_record(
+        job, returncode, stderr_tail, seconds, size, engine='audio-batch',
+        failure=None if success else recovery.classify(returncode, stderr_tail)))
+
+def _group_estimate(estimates):
+    """Estimativa de admissão de um grupo: memória e saídas somadas dos clipes"""
+    return {'input': estimates[0]['input'], 'memory': sum(e['memory'] for e in estimates),
+            'outputs': [output for e in estimates for output in e['outputs']]}
+
+def convert_audio_batch(files, profile, max_workers=None, batch_size=DEFAULT_BATCH_SIZE,
+                        batch_manifest=None, metrics_path=None, admission_control=None, verifier=None):
+    """Converte arquivos de áudio em grupos, vários por ffmpeg
+
+    admission_control (admission.AdmissionController) retém grupos que não
+    cabem na memória ou no disco, e verifier (verify.Verifier) confere as
+    saídas de cada clipe, como em core.convert_files_parallel.
+    Retorna (sucessos, falhas, tempo total), como core.convert_files_parallel.
+    """
+    # Encoders que este ffmpeg não tem são trocados uma vez, antes do lote
+    profile = recovery.resolve_encoders(profile)
+    controller = admission_control or admission.AdmissionController()
+    if max_workers is None:
+        max_workers, _ = tuning.recommend(tuning.JOB_AUDIO)
+    # Sondagens só dos streams de áudio (o ffprobe não lista o resto), para
+    # o planner, a admissão e as métricas; em cache nas próximas execuções
+    infos = dict(zip(files, core.probe_files(files, streams='a')))
+    groups = make_groups(files, batch_size, max_workers)
+    print(f"🎵 Lote de áudio: {len(files)} arquivos em {len(groups)} grupos "
+          f"({len(groups[0])} por ffmpeg, {max_workers} simultâneos)")
+    print(f"{'='*60}")
+
+    success_files = []
+    failed_files = []
+    start_time = time.time()
+
+    def record_result(file, success, error=None):
+        (success_files if success else failed_files).append(file)
+        if batch_manifest is not None:
+            batch_manifest.record('done' if success else 'failed', file,
+                                  **({'error': error} if error else {}))
+        if success and verifier is not None:
+            verifier.submit(file, core.job_outputs(file, profile))
+
+    # Grupos, ou arquivos isolados (single=True) refeitos por core.convert_file
+    pending = deque((group, False) for group in groups)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        slot = 0
+        reported = 0
+        while pending or futures:
+            # Submeter os próximos grupos enquanto couberem na memória e no disco
+            while pending and len(futures) < max_workers:
+                group, single = pending[0]
+                estimates = []
+                for file in list(group):
+                    estimate = admission.estimate_job(file, profile, core.job_outputs(file, profile),
+                                                      infos.get(file))
+                    reason = controller.check(estimate)
+                    if reason:
+                        print(f"❌ Não iniciado: {os.path.basename(file)} - {reason}")
+                        record_result(file, False, reason)
+                        group.remove(file)
+                    else:
+                        estimates.append(estimate)
+                if not group:
+                    pending.popleft()
+                    continue
+                estimate = _group_estimate(estimates)
+                if len(group) > 1 and controller.check(estimate):
+                    # Os clipes cabem sozinhos, mas não todos juntos
+                    pending.popleft()
+                    pending.extendleft(([file], False) for file in reversed(group))
+                    continue
+                if not controller.try_admit(estimate):
+                    break
+                pending.popleft()
+                if batch_manifest is not None:
+                    for file in group:
+                        batch_manifest.record('start', file)
+                slot = slot % max_workers + 1
+                if single:
+                    future = executor.submit(core.convert_file, group[0], slot, profile=profile,
+                                             metrics_path=metrics_path, submitted_at=time.time())
+                else:
+                    future = executor.submit(convert_group, group, profile, infos)
+                futures[future] = (group, single, estimate)
+            if not futures:
+                continue
+
+            # Reavaliar os grupos retidos de tempos em tempos: o espaço livre muda
+            done, _ = wait(futures, timeout=admission.ADMISSION_POLL, return_when=FIRST_COMPLETED)
+            for future in done:
+                group, single, estimate = futures.pop(future)
+                controller.release(estimate)
+                if single:
+                    try:
+                        success = future.result()[0]
+                    except Exception as e:
+                        print(f"❌ Erro: {os.path.basename(group[0])} - {e}")
+                        success = False
+                    record_result(group[0], success)
+                    continue
+                try:
+                    results, returncode, stderr_tail, elapsed = future.result()
+                except Exception as e:
+                    results, returncode, stderr_tail, elapsed = [(file, False, 0, None) for file in group], 1, str(e), 0.0
+                if returncode != 0:
+                    # Grupo falhou: refazer um a um, com novas tentativas e encoders alternativos
+                    label = recovery.LABELS[recovery.classify(returncode, stderr_tail)]
+                    print(f"⚠️  Grupo de {len(group)} arquivos falhou ({label}); convertendo um a um")
+                    pending.extendleft(([file], True) for file in reversed(group))
+                    continue
+                for file, success, size, path in results:
+                    record_result(file, success)
+                    if metrics_path:
+                        _record_metrics(metrics_path, file, profile, infos.get(file), path, success,
+                                        elapsed / len(group), size, returncode, stderr_tail)
+            finished = len(success_files) + len(failed_files)
+            if finished != reported:
+                reported = finished
+                print(f"📊 Progresso: {finished}/{len(files)} concluídos")
+
+    verification = None
+    if verifier is not None:
+        verification = core.apply_verification(verifier, success_files, failed_files, batch_manifest)
+    elapsed_time = time.time() - start_time
+    rate = len(files) / elapsed_time if elapsed_time > 0 else 0.0
+    print(f"\n🎵 {len(files)} clipes em {core.format_time(elapsed_time)} ({rate:.1f} clipes/s)")
+    core.print_batch_summary({}, None, elapsed_time, verification)
+    return success_files, failed_files, elapsed_time
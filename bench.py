@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Benchmark reproduzível dos modos de conversão com mídia sintética
+
+As entradas são geradas pelo próprio ffmpeg (fontes lavfi testsrc2 e sine,
+com flags bitexact), então o benchmark roda totalmente offline e produz
+sempre os mesmos arquivos. Cada modo (MP4, MP3, AC3, remux, segmentos e o
+converter.py sequencial) é executado como um processo separado para cada
+número de processos da grade; o resultado é um JSON que pode ser comparado
+entre versões.
+"""
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import convertermoreperformace as core
+import mediaprobe
+import metrics
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Entradas sintéticas: codecs e durações variados
+SYNTHETIC_INPUTS = [
+    {
+        'name': 'h264_aac_720p_20s.mkv', 'size': '1280x720', 'duration': 20,
+        'video': ['-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p'],
+        'audio': ['-c:a', 'aac', '-b:a', '128k', '-ar', '48000'],
+    },
+    {
+        'name': 'h264_aac_1080p_60s.mp4', 'size': '1920x1080', 'duration': 60,
+        'video': ['-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p'],
+        'audio': ['-c:a', 'aac', '-b:a', '128k', '-ar', '48000'],
+    },
+    {
+        'name': 'mpeg4_mp3_480p_30s.avi', 'size': '854x480', 'duration': 30,
+        'video': ['-c:v', 'mpeg4', '-q:v', '5'],
+        'audio': ['-c:a', 'libmp3lame', '-b:a', '192k', '-ar', '44100'],
+    },
+    {
+        'name': 'mpeg2_ac3_576p_15s.mkv', 'size': '720x576', 'duration': 15,
+        'video': ['-c:v', 'mpeg2video', '-q:v', '4'],
+        'audio': ['-c:a', 'ac3', '-b:a', '384k', '-ar', '48000'],
+    },
+    {
+        'name': 'pcm_30s.wav', 'size': None, 'duration': 30,
+        'video': None,
+        'audio': ['-c:a', 'pcm_s16le', '-ar', '44100'],
+    },
+]
+
+# Modo -> (argumentos do convert, quais entradas usar)
+MODES = {
+    'mp4': (['-f', 'mp4', '--no-copy'], 'video'),
+    'remux': (['-f', 'mp4'], 'video'),
+    'mp3': (['-f', 'mp3'], 'all'),
+    'ac3': (['-f', 'ac3'], 'all'),
+    'chunked': (['-f', 'mp4', '--no-copy', '--segments', 'auto'], 'longest'),
+    'converter': (None, 'video'),
+}
+
+def default_workdir():
+    return os.path.join(mediaprobe.default_cache_dir(), 'bench')
+
+def ffmpeg_version():
+    try:
+        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
+        return result.stdout.splitlines()[0] if result.stdout else None
+    except OSError:
+        return None
+
+def generate_input(spec, directory):
+    """Gera (ou reaproveita) uma entrada sintética; retorna o caminho ou None"""
+    path = os.path.join(directory, spec['name'])
+    if os.path.exists(path):
+        return path
+    duration = spec['duration']
+    cmd = ['ffmpeg', '-v', 'error', '-nostdin']
+    if spec['video']:
+        cmd += ['-f', 'lavfi', '-i', f"testsrc2=size={spec['size']}:rate=25:duration={duration}"]
+    cmd += ['-f', 'lavfi', '-i', f"sine=frequency=440:beep_factor=4:sample_rate=48000:duration={duration}"]
+    cmd += (spec['video'] or []) + spec['audio']
+    # Saída determinística: sem metadados variáveis e com uma única thread
+    cmd += ['-threads', '1', '-fflags', '+bitexact', '-flags:v', '+bitexact', '-flags:a', '+bitexact',
+            '-map_metadata', '-1', '-y', path + '.tmp' + os.path.splitext(path)[1]]
+    result = subprocess.run(cmd, capture_output=True, text=True, errors='replace')
+    if result.returncode != 0:
+        print(f"⚠️  Não foi possível gerar {spec['name']}: {result.stderr.strip()[-200:]}", file=sys.stderr)
+        return None
+    os.replace(path + '.tmp' + os.path.splitext(path)[1], path)
+    return path
+
+def prepare_inputs(workdir, paths=None):
+    """Entradas do benchmark: sintéticas ou links para os arquivos do usuário
+
+    Tudo fica dentro de workdir, para que as saídas (pasta "convertida")
+    possam ser apagadas entre execuções sem tocar nos arquivos originais.
+    """
+    input_dir = os.path.join(workdir, 'entradas')
+    os.makedirs(input_dir, exist_ok=True)
+    if not paths:
+        files = [generate_input(spec, input_dir) for spec in SYNTHETIC_INPUTS]
+        return [f for f in files if f]
+
+    files = []
+    for path in core.collect_media_files(paths):
+        link = os.path.join(input_dir, os.path.basename(path))
+        if not os.path.exists(link):
+            try:
+                os.symlink(os.path.abspath(path), link)
+            except OSError:
+                shutil.copy2(path, link)
+        files.append(link)
+    return files
+
+def _select_inputs(files, infos, which):
+    if which == 'all':
+        return files
+    videos = [f for f in files if mediaprobe.first_stream(infos[f], 'video')]
+    if which == 'longest':
+        return [max(videos, key=lambda f: infos[f]['duration'] or 0)] if videos else []
+    return videos
+
+def _mode_command(mode, files, workers, workdir):
+    args, _ = MODES[mode]
+    if args is None:
+        return [sys.executable, os.path.join(SCRIPT_DIR, 'converter.py'), '-f', 'mp4'] + files
+    # Manifesto próprio: não sobrescrever o lote que o usuário pode querer continuar
+    return ([sys.executable, os.path.join(SCRIPT_DIR, 'convertermoreperformace.py'), 'convert']
+            + args + ['-w', str(workers), '--no-progress',
+                      '--manifest', os.path.join(workdir, 'manifest.jsonl')] + files)
+
+def _run_measured(cmd):
+    """Executa o comando e retorna (código, parede, CPU user+sys, pico de RSS em bytes)
+
+    os.wait4 devolve o uso de recursos do processo e dos filhos que ele
+    aguardou (workers do pool e processos do ffmpeg).
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        process.returncode = metrics.exit_code(status)
+        cpu = usage.ru_utime + usage.ru_stime
+        # ru_maxrss: KB no Linux, bytes no macOS
+        peak_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        return process.returncode, wall, cpu, peak_rss
+    returncode = process.wait()
+    return returncode, time.perf_counter() - start, None, None
+
+def _output_bytes(files):
+    total = 0
+    for directory in {os.path.join(os.path.dirname(f), 'convertida') for f in files}:
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                if entry.is_file():
+                    total += entry.stat().st_size
+    return total
+
+def _clear_outputs(files):
+    for directory in {os.path.join(os.path.dirname(f), 'convertida') for f in files}:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def run_benchmark(paths=None, modes=None, workers_grid=None, workdir=None):
+    """Executa a grade modos x processos e retorna o relatório (dict)
+
+    O andamento vai para o stderr: o stdout fica só com o JSON do relatório.
+    """
+    workdir = workdir or default_workdir()
+    cpu_count = multiprocessing.cpu_count()
+    modes = modes or list(MODES)
+    workers_grid = workers_grid or sorted({1, core.get_optimal_workers()})
+
+    files = prepare_inputs(workdir, paths)
+    infos = {f: mediaprobe.probe_media(f) for f in files}
+    report = {
+        'version': 1,
+        'host': {
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': cpu_count,
+            'python': platform.python_version(),
+            'ffmpeg': ffmpeg_version(),
+        },
+        'inputs': [
+            {'name': os.path.basename(f), 'duration': infos[f]['duration'] if infos[f] else None,
+             'bytes': os.path.getsize(f)}
+            for f in files
+        ],
+        'results': [],
+    }
+
+    for mode in modes:
+        selected = _select_inputs(files, infos, MODES[mode][1])
+        if not selected:
+            continue
+        media_seconds = sum((infos[f] or {}).get('duration') or 0 for f in selected)
+        # O converter.py é sequencial: uma única execução
+        grid = [1] if mode == 'converter' else workers_grid
+        for workers in grid:
+            _clear_outputs(selected)
+            returncode, wall, cpu, peak_rss = _run_measured(_mode_command(mode, selected, workers, workdir))
+            result = {
+                'mode': mode,
+                'workers': workers,
+                'files': len(selected),
+                'exit_code': returncode,
+                'wall_seconds': round(wall, 3),
+                'realtime_factor': round(media_seconds / wall, 3) if wall else None,
+                'cpu_seconds': round(cpu, 3) if cpu is not None else None,
+                'cpu_utilisation': round(cpu / (wall * cpu_count), 3) if cpu is not None and wall else None,
+                'peak_rss_bytes': peak_rss,
+                'output_bytes': _output_bytes(selected),
+            }
+            report['results'].append(result)
+            print(f"   • {mode:9} {workers:2} proc. | {core.format_time(wall):>10} | "
+                  f"{result['realtime_factor']}x tempo real | saída {core.format_size(result['output_bytes'])}"
+                  + ("" if returncode == 0 else f" | ❌ código {returncode}"), file=sys.stderr)
+    _clear_outputs(files)
+    return report
+
+def save_report(report, path=None):
+    """Grava o relatório em JSON (no stdout quando path é None)"""
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📁 Resultado salvo em {path}")
+    else:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+
+def failed(report):
+    return any(result['exit_code'] != 0 for result in report['results'])
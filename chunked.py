@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Conversão de um único vídeo longo em segmentos paralelos (split-encode-concat)
+
+O vídeo é cortado nos keyframes da fonte em N segmentos, que são
+convertidos ao mesmo tempo pelo pool de processos. O áudio é convertido
+uma única vez, do arquivo inteiro, para não ter emendas nem perder o
+sincronismo; no fim os segmentos são unidos com o concat demuxer (sem
+reconversão) junto com o áudio, mantendo o +faststart.
+"""
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import convertermoreperformace as core
+import mediaprobe
+import metrics
+import planner
+import profiles
+import ratecontrol
+import recovery
+
+MIN_SEGMENT_SECONDS = 30
+
+def find_keyframes(input_file):
+    """Instantes (s) dos keyframes do primeiro stream de vídeo, lidos dos pacotes (sem decodificar)"""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        input_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, errors='replace')
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' in flags and pts not in ('', 'N/A'):
+            keyframes.append(float(pts))
+    return sorted(keyframes)
+
+def choose_split_points(keyframes, duration, segments):
+    """Escolhe, para cada corte ideal (duração * i / N), o keyframe mais próximo
+
+    Retorna a lista de instantes de início dos segmentos (o primeiro é 0).
+    """
+    starts = [0.0]
+    for i in range(1, segments):
+        target = duration * i / segments
+        candidates = [k for k in keyframes if k > starts[-1] + 1.0]
+        if not candidates:
+            break
+        best = min(candidates, key=lambda k: abs(k - target))
+        if best >= duration:
+            break
+        starts.append(best)
+    return starts
+
+def default_segments(duration, cpu_count=None):
+    """Um segmento por CPU, mas sem segmentos menores que MIN_SEGMENT_SECONDS"""
+    cpu_count = cpu_count or multiprocessing.cpu_count()
+    return max(1, min(cpu_count, int(duration // MIN_SEGMENT_SECONDS)))
+
+def _segment_command(input_file, start, length, output_file, profile, threads):
+    # -ss antes do -i: busca rápida e precisa, começando no keyframe de corte
+    cmd = ['ffmpeg', '-ss', f"{start:.6f}", '-i', input_file]
+    if length is not None:
+        cmd += ['-t', f"{length:.6f}"]
+    cmd += ['-map', '0:v:0', '-an', '-sn', '-c:v', profile['video_codec']]
+    if profile.get('crf') is not None:
+        cmd += ['-crf', str(profile['crf'])]
+    if profile.get('preset'):
+        cmd += ['-preset', profile['preset']]
+    if profile.get('video_bitrate'):
+        cmd += ['-b:v', str(profile['video_bitrate'])]
+    cmd += [str(arg) for arg in profile.get('video_args', [])]
+    cmd += ['-threads', str(threads), '-y', output_file]
+    return cmd
+
+def _audio_command(input_file, output_file, profile, plan):
+    cmd = ['ffmpeg', '-i', input_file, '-map', '0:a:0', '-vn', '-sn']
+    if plan['audio'] == 'copy':
+        cmd += ['-c:a', 'copy']
+    else:
+        cmd += ['-c:a', profile['audio_codec']]
+        if profile.get('audio_bitrate'):
+            cmd += ['-b:a', str(profile['audio_bitrate'])]
+        if profile.get('sample_rate'):
+            cmd += ['-ar', str(profile['sample_rate'])]
+    cmd += ['-y', output_file]
+    return cmd
+
+def _run_part(cmd, progress_queue, job_id, label, duration):
+    """Executa uma parte (segmento ou áudio) reportando ao painel
+
+    Retorna (código de saída, final do stderr, CPU/memória do ffmpeg).
+    """
+    if progress_queue is not None:
+        progress_queue.put({'type': 'start', 'job': job_id, 'pid': os.getpid(),
+                            'filename': label, 'duration': duration})
+    stats = {}
+    returncode, stderr_tail = core.run_ffmpeg(cmd, progress_queue, job_id, stats)
+    if progress_queue is not None:
+        progress_queue.put({'type': 'end', 'job': job_id, 'success': returncode == 0})
+    return returncode, stderr_tail, stats
+
+def _add_usage(total, stats):
+    """Soma a CPU das partes; a memória é o maior pico entre elas"""
+    for key in ('cpu_user', 'cpu_system'):
+        if stats.get(key) is not None:
+            total[key] = total.get(key, 0.0) + stats[key]
+    if stats.get('peak_rss_bytes') is not None:
+        total['peak_rss_bytes'] = max(total.get('peak_rss_bytes') or 0, stats['peak_rss_bytes'])
+
+def _concat_list_entry(path):
+    # Aspas simples escapadas conforme a sintaxe do concat demuxer
+    return "file '" + path.replace("'", "'\\''") + "'\n"
+
+def convert_file_chunked(input_file, segments=None, max_workers=None, profile=None, show_progress=True,
+                         metrics_path=None):
+    """Converte um único arquivo dividido em segmentos paralelos
+
+    Retorna (sucesso, nome do arquivo, caminho de conversão). Perfis apenas
+    de áudio, vídeos que serão copiados (remux) ou curtos demais seguem o
+    caminho normal de convert_file. metrics_path recebe uma linha de
+    métricas para o job (ver metrics.py), com o tempo e a CPU de todos os
+    segmentos somados.
+    """
+    profile = profile or profiles.profile_for_flags()
+    filename = os.path.basename(input_file)
+    probe_start = time.time()
+    info = mediaprobe.probe_media(input_file)
+    probe_seconds = time.time() - probe_start
+    plan = planner.plan_conversion(info, profile)
+    duration = info['duration'] if info else None
+
+    if plan['video'] != 'encode' or not duration:
+        return core.convert_file(input_file, profile=profile, metrics_path=metrics_path)
+
+    segments = segments or default_segments(duration)
+    starts = choose_split_points(find_keyframes(input_file), duration, segments)
+    if len(starts) < 2:
+        return core.convert_file(input_file, profile=profile, metrics_path=metrics_path)
+
+    cpu_count = multiprocessing.cpu_count()
+    max_workers = max_workers or min(len(starts), cpu_count)
+    threads = max(1, cpu_count // max_workers)
+    if ratecontrol.has_target(profile):
+        # Cada segmento é uma conversão independente: duas passadas não se
+        # aplicam, então o alvo é atingido pelo CRF previsto com amostras
+        profile, _, _, note = ratecontrol.apply(
+            input_file, dict(profile, rate_control=ratecontrol.RATE_CONTROL_CRF), info, plan, cpu_count)
+        print(note)
+    bounds = list(zip(starts, starts[1:] + [duration]))
+
+    final_file = core.get_output_path(input_file, profile['format'])
+    output_dir = os.path.dirname(final_file)
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = core.get_partial_path(final_file)
+    # Pasta de trabalho no mesmo disco da saída (renomeação/concat sem cópias extras)
+    work_dir = tempfile.mkdtemp(prefix='.segmentos-', dir=output_dir)
+
+    print(f"🧩 {filename}: {len(bounds)} segmentos em {max_workers} processos ({threads} threads cada)")
+    start_time = time.time()
+    success = False
+    returncode, stderr_tail = 1, ''
+    usage = {}
+    try:
+        jobs = []
+        for i, (start, end) in enumerate(bounds):
+            segment_file = os.path.join(work_dir, f"seg_{i:04d}.mp4")
+            length = end - start if i < len(bounds) - 1 else None
+            cmd = _segment_command(input_file, start, length, segment_file, profile, threads)
+            jobs.append((cmd, f"{filename} [{i + 1}/{len(bounds)}]", end - start, segment_file))
+        audio_file = None
+        if plan['audio']:
+            audio_file = os.path.join(work_dir, "audio.mka")
+            jobs.append((_audio_command(input_file, audio_file, profile, plan),
+                         f"{filename} [áudio]", duration, audio_file))
+
+        durations = [job[2] for job in jobs]
+        with core.progress_dashboard(len(jobs), durations, show_progress) as progress_queue:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(_run_part, cmd, progress_queue, i, label, part_duration): label
+                    for i, (cmd, label, part_duration, _) in enumerate(jobs)
+                }
+                failed = []
+                for future in as_completed(futures):
+                    part_returncode, part_stderr, part_stats = future.result()
+                    _add_usage(usage, part_stats)
+                    if part_returncode != 0:
+                        failed.append(futures[future])
+                        returncode, stderr_tail = part_returncode, part_stderr
+                        core._log(progress_queue, f"❌ Erro em {futures[future]}: {part_stderr.strip()[-300:]}")
+
+        if failed:
+            return False, filename, plan['path']
+
+        # Unir os segmentos (concat demuxer) com o áudio, sem reconverter
+        list_file = os.path.join(work_dir, "segmentos.txt")
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for _, _, _, segment_file in jobs[:len(bounds)]:
+                f.write(_concat_list_entry(segment_file))
+        cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', list_file]
+        if audio_file:
+            cmd += ['-i', audio_file, '-map', '0:v:0', '-map', '1:a:0']
+        cmd += ['-c', 'copy']
+        if profile['format'] in profiles.FASTSTART_FORMATS:
+            cmd += ['-movflags', '+faststart']
+        cmd += ['-y', output_file]
+        stats = {}
+        returncode, stderr_tail = core.run_ffmpeg(cmd, stats=stats)
+        _add_usage(usage, stats)
+        if returncode != 0:
+            print(f"❌ Erro ao unir os segmentos de {filename}: {stderr_tail.strip()[-300:]}")
+            return False, filename, plan['path']
+
+        os.replace(output_file, final_file)
+        success = True
+        total_time = time.time() - start_time
+        print(f"✅ Sucesso: {filename} | Tempo: {core.format_time(total_time)} | "
+              f"Tamanho: {core.format_size(os.path.getsize(final_file))} | {len(bounds)} segmentos")
+        return True, filename, plan['path']
+    except Exception as e:
+        stderr_tail += str(e)
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if not success and os.path.exists(output_file):
+            os.remove(output_file)
+        if metrics_path:
+            job = {'input': input_file, 'path': plan['path'], 'duration': duration,
+                   'probe_seconds': probe_seconds, 'outputs': [(final_file, output_file)]}
+            metrics.append_record(metrics_path, metrics.build_record(
+                job, returncode, stderr_tail, time.time() - start_time,
+                os.path.getsize(final_file) if success else 0, usage, engine='chunked',
+                failure=None if success else recovery.classify(returncode, stderr_tail)))
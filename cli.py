@@ -0,0 +1,683 @@
+#!/usr/bin/env python3
+"""Interface de linha de comando não interativa (cron, pipelines)
+
+    python convertermoreperformace.py convert -f mp3 -w 4 pasta/
+    python convertermoreperformace.py convert -f mp4,mp3,ac3 acervo/
+    python convertermoreperformace.py convert -p web --profiles-file perfis.toml *.mkv
+    python convertermoreperformace.py convert --target-size 700M filme.mkv
+    python convertermoreperformace.py convert --resume
+    python convertermoreperformace.py probe --json video.mkv
+    python convertermoreperformace.py bench -w 1,2,4 video.mkv
+    python convertermoreperformace.py watch -f mp4,mp3 entrada/
+    python convertermoreperformace.py coordinator --host 0.0.0.0 /mnt/acervo
+    python convertermoreperformace.py worker http://servidor:8765
+
+Códigos de saída: 0 sucesso, 1 algum arquivo falhou, 2 erro de uso/ambiente.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import manifest
+import mediaprobe
+import profiles
+import scanner
+
+class _LazyModule:
+    """Módulo importado só no primeiro acesso a um atributo
+
+    probe e --help não usam o núcleo do conversor; assim não pagam a
+    importação dele (e de tudo o que ele importa) a cada execução.
+    """
+
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr):
+        __import__(self._name)
+        module = sys.modules[self._name]
+        globals()[self._alias] = module    # Os próximos acessos vão direto ao módulo
+        return getattr(module, attr)
+
+core = _LazyModule('convertermoreperformace', 'core')
+ratecontrol = _LazyModule('ratecontrol', 'ratecontrol')
+
+def _int_list(value):
+    try:
+        return [max(1, int(v)) for v in value.split(',') if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"lista de inteiros inválida: '{value}'")
+
+def _segments(value):
+    if value == 'auto':
+        return 0
+    try:
+        return max(2, int(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número de segmentos inválido: '{value}'")
+
+def _size(value):
+    try:
+        ratecontrol.parse_size(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamanho inválido: '{value}' (ex.: 700M, 1.4G)")
+    return value
+
+def _bitrate(value):
+    try:
+        ratecontrol.parse_bitrate(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bitrate inválido: '{value}' (ex.: 2500k, 4M)")
+    return value
+
+FORMATS = ('mp4', 'mp3', 'ac3')
+
+def _name_list(value):
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+def _format_list(value):
+    formats = _name_list(value)
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(
+            f"formato inválido: '{value}' (use {', '.join(FORMATS)} ou uma lista, ex.: mp4,mp3)")
+    return formats
+
+def _add_profile_args(parser):
+    parser.add_argument('-f', '--format', type=_format_list, default=['mp4'],
+                        help="formato(s) de saída com o perfil padrão; vários formatos separados "
+                             "por vírgula (ex.: mp4,mp3,ac3) são gerados com uma única decodificação "
+                             "(padrão: mp4)")
+    parser.add_argument('--gpu', action='store_true',
+                        help="usar o perfil de GPU para MP4 (h264_videotoolbox)")
+    parser.add_argument('-p', '--profile', type=_name_list,
+                        help="perfil(is) de codificação nomeado(s), separados por vírgula "
+                             "(substitui --format/--gpu)")
+    parser.add_argument('--profiles-file',
+                        help="arquivo TOML/JSON com perfis extras (padrão: CONVERSOR_PROFILES "
+                             "ou profiles.toml no diretório de configuração)")
+
+def _add_rate_args(parser):
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--target-size', type=_size, metavar='TAMANHO',
+                        help="tamanho final desejado de cada vídeo, ex.: 700M; o CRF é escolhido "
+                             "convertendo amostras curtas em paralelo")
+    target.add_argument('--target-bitrate', type=_bitrate, metavar='BITRATE',
+                        help="bitrate total desejado (vídeo + áudio), ex.: 2500k")
+    parser.add_argument('--two-pass', action='store_true',
+                        help="com --target-size/--target-bitrate: duas passadas do libx264 "
+                             "para o tamanho exato")
+
+def _add_thumbnail_args(parser):
+    parser.add_argument('--thumbnails', type=int, metavar='N',
+                        help="gravar N miniaturas espaçadas igualmente e um sprite com todas elas "
+                             "junto com o vídeo")
+    parser.add_argument('--thumbnail-format', choices=['jpg', 'webp'], help="formato das miniaturas (padrão: jpg)")
+    parser.add_argument('--thumbnail-width', type=int, metavar='PIXELS',
+                        help="largura das miniaturas (padrão: 320)")
+    parser.add_argument('--thumbnail-mode', choices=['auto', 'same-pass', 'keyframes'],
+                        help="same-pass: no mesmo ffmpeg da conversão; keyframes: ffmpeg separado que "
+                             "decodifica só os quadros-chave; auto (padrão): same-pass quando o vídeo "
+                             "é reconvertido")
+    parser.add_argument('--sprite-columns', type=int, metavar='N',
+                        help="colunas do sprite (padrão: grade quase quadrada)")
+
+def _add_admission_args(parser):
+    parser.add_argument('--max-memory', type=_size, metavar='TAMANHO',
+                        help="memória total dos ffmpeg simultâneos, ex.: 8G (padrão: 80%% da "
+                             "memória disponível); jobs que não cabem esperam")
+    parser.add_argument('--min-free-disk', type=_size, default='512M', metavar='TAMANHO',
+                        help="espaço que sempre fica livre no disco de saída (padrão: 512M)")
+
+def _add_scan_args(parser):
+    parser.add_argument('--include', action='append', default=[], metavar='PADRÃO',
+                        help="só arquivos que casam com o padrão glob (nome ou caminho relativo); repetível")
+    parser.add_argument('--exclude', action='append', default=[], metavar='PADRÃO',
+                        help="ignorar arquivos/pastas que casam com o padrão glob; repetível")
+    parser.add_argument('--no-recursive', action='store_true', help="não entrar nas subpastas")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="converter também as cópias idênticas (sem ligar as saídas)")
+
+def _add_metrics_args(parser):
+    parser.add_argument('--metrics', metavar='ARQUIVO',
+                        help="gravar métricas de cada job em JSON Lines neste arquivo")
+    parser.add_argument('--metrics-port', type=int, metavar='PORTA',
+                        help="expor as métricas no formato do Prometheus em http://127.0.0.1:PORTA/metrics")
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]) or 'conversor',
+        description="Conversor paralelo AVI/MKV/MP4/WAV → MP4/MP3/AC3",
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help="converter arquivos ou pastas")
+    convert.add_argument('paths', nargs='*', help="arquivos ou pastas")
+    _add_profile_args(convert)
+    _add_rate_args(convert)
+    _add_thumbnail_args(convert)
+    convert.add_argument('-w', '--workers', type=int,
+                         help="processos simultâneos (padrão: automático)")
+    convert.add_argument('--incremental', action='store_true',
+                         help="pular saídas já existentes e mais novas que a fonte")
+    convert.add_argument('--resume', action='store_true',
+                         help="continuar o último lote a partir do manifesto")
+    convert.add_argument('--manifest', help="caminho do manifesto do lote")
+    convert.add_argument('--no-progress', action='store_true', help="desativar o painel de progresso")
+    convert.add_argument('--no-schedule', action='store_true',
+                         help="converter na ordem recebida (sem ordenar pelo custo)")
+    convert.add_argument('--engine', choices=['async', 'process', 'pipeline'], default='async',
+                         help="async: ffmpeg como filhos diretos via asyncio (padrão); "
+                              "process: um processo Python por worker; pipeline: varredura, "
+                              "sondagem e conversão simultâneas (a conversão começa com o "
+                              "primeiro arquivo sondado; ideal para árvores enormes)")
+    convert.add_argument('--probe-workers', type=int, default=4, metavar='N',
+                         help="sondagens simultâneas do motor pipeline (padrão: 4)")
+    convert.add_argument('--verify', action='store_true',
+                         help="conferir cada saída depois da conversão: duração (contra a fonte), "
+                              "streams e codecs; saídas reprovadas são apagadas e contam como falha")
+    convert.add_argument('--verify-decode', action='store_true',
+                         help="com --verify, decodificar também a saída inteira (-f null) em baixa "
+                              "prioridade")
+    convert.add_argument('--verify-tolerance', type=float, metavar='SEGUNDOS',
+                         help="diferença de duração aceita na verificação (padrão: 1s ou 1%% da duração)")
+    convert.add_argument('--verify-workers', type=int, default=1, metavar='N',
+                         help="verificações simultâneas (padrão: 1)")
+    convert.add_argument('--timeout', type=float, metavar='SEGUNDOS',
+                         help="tempo limite de cada conversão (motor async)")
+    convert.add_argument('--no-copy', action='store_true',
+                         help="sempre reconverter (não copiar streams já no formato de destino)")
+    convert.add_argument('--segments', type=_segments, metavar='N',
+                         help="dividir cada vídeo em N segmentos convertidos em paralelo "
+                              "('auto' = um por CPU); ideal para um único arquivo longo")
+    convert.add_argument('--audio-batch-size', type=int, default=16, metavar='N',
+                         help="arquivos WAV/AC3 por ffmpeg no lote de áudio (padrão: 16)")
+    convert.add_argument('--no-audio-batch', action='store_true',
+                         help="converter cada arquivo de áudio com seu próprio ffmpeg")
+    _add_scan_args(convert)
+    _add_admission_args(convert)
+    _add_metrics_args(convert)
+    convert.add_argument('--list-profiles', action='store_true', help="listar os perfis e sair")
+
+    probe = subparsers.add_parser('probe', help="mostrar duração, streams e codecs")
+    probe.add_argument('paths', nargs='+', help="arquivos ou pastas")
+    probe.add_argument('--json', action='store_true', help="saída em JSON")
+    probe.add_argument('--no-cache', action='store_true', help="ignorar o cache de sondagem")
+
+    bench = subparsers.add_parser('bench', help="medir os modos de conversão com diferentes números de processos")
+    bench.add_argument('paths', nargs='*',
+                       help="arquivos ou pastas de teste (padrão: mídia sintética gerada pelo ffmpeg)")
+    _add_profile_args(bench)
+    bench.add_argument('-w', '--workers', type=_int_list,
+                       help="números de processos a comparar, ex.: 1,2,4 (padrão: 1 e o automático)")
+    bench.add_argument('-m', '--modes', type=lambda v: [m for m in v.split(',') if m],
+                       help="modos a medir, ex.: mp4,remux (padrão: mp4,remux,mp3,ac3,chunked,converter)")
+    bench.add_argument('--workdir', help="pasta das entradas sintéticas e saídas temporárias")
+    bench.add_argument('-o', '--output', help="gravar o resultado em JSON neste arquivo")
+    bench.add_argument('--calibrate', action='store_true',
+                       help="medir processos x threads com o primeiro arquivo e guardar a melhor "
+                            "configuração desta máquina para as próximas conversões")
+
+    watch = subparsers.add_parser('watch', help="monitorar pastas e converter os arquivos que chegarem")
+    watch.add_argument('paths', nargs='*', help="pastas a monitorar (com --add: arquivos a enfileirar)")
+    _add_profile_args(watch)
+    _add_rate_args(watch)
+    _add_thumbnail_args(watch)
+    watch.add_argument('-w', '--workers', type=int, help="processos simultâneos (padrão: automático)")
+    watch.add_argument('--settle', type=float, default=5.0,
+                       help="segundos sem mudanças antes de enfileirar um arquivo (padrão: 5)")
+    watch.add_argument('--poll', action='store_true', help="usar varredura periódica em vez de inotify")
+    watch.add_argument('--interval', type=float, default=2.0, help="intervalo da varredura em segundos")
+    watch.add_argument('--retries', type=int, default=3, help="tentativas por arquivo (padrão: 3)")
+    watch.add_argument('--queue', help="caminho da fila SQLite")
+    watch.add_argument('--add', action='store_true',
+                       help="só enfileirar os arquivos informados (o daemon em execução os converte)")
+    watch.add_argument('--priority', type=int, default=0, help="prioridade dos arquivos de --add")
+    watch.add_argument('--status', action='store_true', help="mostrar a fila e sair")
+    _add_admission_args(watch)
+    _add_metrics_args(watch)
+
+    coordinator = subparsers.add_parser('coordinator',
+                                        help="distribuir um lote entre workers em outras máquinas")
+    coordinator.add_argument('paths', nargs='+',
+                             help="arquivos ou pastas (no mesmo caminho em todas as máquinas)")
+    _add_profile_args(coordinator)
+    _add_rate_args(coordinator)
+    _add_thumbnail_args(coordinator)
+    coordinator.add_argument('--host', default='127.0.0.1',
+                             help="endereço de escuta (padrão: 127.0.0.1; 0.0.0.0 para a rede local)")
+    coordinator.add_argument('--port', type=int, default=8765, help="porta HTTP (padrão: 8765)")
+    coordinator.add_argument('--lease', type=float, default=30.0, metavar='SEGUNDOS',
+                             help="prazo para o worker renovar um job antes de ele ser reatribuído "
+                                  "(padrão: 30)")
+    coordinator.add_argument('--retries', type=int, default=3,
+                             help="entregas por arquivo quando workers param de responder (padrão: 3)")
+    coordinator.add_argument('--incremental', action='store_true',
+                             help="pular saídas já existentes e mais novas que a fonte")
+    coordinator.add_argument('--manifest', help="caminho do manifesto do lote")
+    _add_scan_args(coordinator)
+
+    worker = subparsers.add_parser('worker', help="converter os jobs de um coordenador")
+    worker.add_argument('url', help="endereço do coordenador, ex.: http://servidor:8765")
+    worker.add_argument('-w', '--workers', type=int,
+                        help="conversões simultâneas nesta máquina (padrão: automático)")
+    worker.add_argument('--id', help="nome do worker (padrão: máquina-pid)")
+    worker.add_argument('--timeout', type=float, metavar='SEGUNDOS', help="tempo limite de cada conversão")
+    _add_admission_args(worker)
+    _add_metrics_args(worker)
+
+    return parser
+
+def resolve_profile(args):
+    """Perfil escolhido por --profile, ou pelo formato e --gpu
+
+    Com vários perfis/formatos retorna a lista de perfis (multi-saída).
+    --target-size/--target-bitrate/--two-pass valem para as saídas com vídeo;
+    --thumbnails, para a primeira delas.
+    """
+    table = profiles.load_profiles(args.profiles_file)
+    names = args.profile or [profiles.profile_name_for_flags(fmt == 'mp3', fmt == 'ac3', args.gpu)
+                             for fmt in args.format]
+    targets = [profiles.get_profile(name, table) for name in names]
+    rate = {}
+    if getattr(args, 'target_size', None):
+        rate = {'target_size': args.target_size, 'target_bitrate': None}
+    elif getattr(args, 'target_bitrate', None):
+        rate = {'target_bitrate': args.target_bitrate, 'target_size': None}
+    if getattr(args, 'two_pass', False):
+        if not rate and not any(ratecontrol.has_target(t) for t in targets):
+            raise ValueError("--two-pass requer --target-size ou --target-bitrate")
+        rate['rate_control'] = ratecontrol.RATE_CONTROL_TWO_PASS
+    targets = [dict(t, **rate) if not profiles.is_audio_only(t) else t for t in targets]
+    if getattr(args, 'thumbnails', None):
+        # Miniaturas na primeira saída com vídeo
+        video = next((i for i, t in enumerate(targets) if not profiles.is_audio_only(t)), None)
+        if video is None:
+            raise ValueError("--thumbnails requer uma saída com vídeo")
+        options = {'thumbnails': max(1, args.thumbnails), 'thumbnail_format': args.thumbnail_format,
+                   'thumbnail_width': args.thumbnail_width, 'thumbnail_mode': args.thumbnail_mode,
+                   'sprite_columns': args.sprite_columns}
+        targets[video] = dict(targets[video], **{k: v for k, v in options.items() if v is not None})
+    formats = [target['format'] for target in targets]
+    if len(set(formats)) != len(formats):
+        raise ValueError(f"Dois perfis com o mesmo formato de saída: {', '.join(names)}")
+    return targets[0] if len(targets) == 1 else targets
+
+def _error(message):
+    print(f"❌ {message}", file=sys.stderr)
+    return 2
+
+def start_metrics(args):
+    """Caminho do arquivo de métricas (e endpoint HTTP, se pedido); None sem métricas"""
+    if not args.metrics and not args.metrics_port:
+        return None
+    import metrics
+    path = args.metrics or metrics.DEFAULT_METRICS_FILE
+    if args.metrics_port:
+        metrics.serve(args.metrics_port, path)
+    return path
+
+def admission_control(args):
+    """Controle de admissão com os limites de --max-memory/--min-free-disk"""
+    import admission
+    memory_limit = int(ratecontrol.parse_size(args.max_memory)) if args.max_memory else None
+    return admission.AdmissionController(memory_limit, int(ratecontrol.parse_size(args.min_free_disk)))
+
+def make_verifier(args, profile):
+    """Pool de verificação de --verify/--verify-decode (None sem verificação)"""
+    if not args.verify and not args.verify_decode:
+        return None
+    import verify
+    return verify.Verifier(profile, args.verify_decode, max(1, args.verify_workers), args.verify_tolerance)
+
+def cmd_convert(args):
+    if args.list_profiles:
+        for name, profile in sorted(profiles.load_profiles(args.profiles_file).items()):
+            print(f"  {name:12} {profiles.describe(profile)}")
+        return 0
+
+    if not core.check_ffmpeg():
+        return _error("FFmpeg não encontrado! Instale o FFmpeg: https://ffmpeg.org/download.html")
+
+    batch_manifest = manifest.BatchManifest(args.manifest)
+    if args.resume:
+        # Lotes do motor pipeline guardam as pastas de origem, não a lista de arquivos
+        sources = None
+        if batch_manifest.load():
+            sources = batch_manifest.files or batch_manifest.options.get('paths')
+        if not sources:
+            return _error("Nenhum lote anterior encontrado para continuar")
+        media_files = core.collect_media_files(sources) if args.engine != 'pipeline' else None
+        profile = batch_manifest.options['profile']
+        max_workers = args.workers or batch_manifest.options.get('max_workers')
+    else:
+        media_files = None
+        profile = resolve_profile(args)
+        if args.no_copy:
+            profile = [dict(target, copy=False) for target in profiles.as_list(profile)]
+            profile = profile[0] if len(profile) == 1 else profile
+        max_workers = args.workers
+    if max_workers is not None:
+        max_workers = max(1, max_workers)
+    if args.timeout is not None and (args.engine != 'async' or args.segments is not None):
+        return _error("--timeout requer o motor async (sem --segments)")
+    if args.segments is not None and isinstance(profile, list):
+        return _error("--segments aceita um único formato de saída")
+    if args.engine == 'pipeline' and args.segments is None:
+        return convert_pipeline(args, sources if args.resume else args.paths, profile, max_workers,
+                                batch_manifest)
+
+    if media_files is None:
+        media_files = core.collect_media_files(args.paths, args.include, args.exclude, not args.no_recursive)
+    if not media_files:
+        return _error("Nenhum arquivo AVI, MKV, MP4, WAV ou AC3 encontrado!")
+
+    duplicates = {}
+    if not args.no_dedup:
+        # Cópias idênticas em outras pastas: converter uma vez e ligar as saídas
+        media_files, duplicates = scanner.find_duplicates(media_files)
+        if duplicates:
+            print(f"🔗 {sum(len(c) for c in duplicates.values())} cópias idênticas serão ligadas "
+                  f"à conversão do original")
+    formats = [target['format'] for target in profiles.as_list(profile)]
+
+    if args.incremental or args.resume:
+        done = {f for f, state in batch_manifest.state.items() if state == 'done'} if args.resume else ()
+        media_files, skipped = core.filter_pending(media_files, formats, done)
+        if skipped:
+            print(f"⏭️  {len(skipped)} arquivos já convertidos foram pulados")
+        if not media_files:
+            if duplicates:
+                core.link_duplicate_outputs(duplicates, profile)
+            print("✅ Nada a fazer: todos os arquivos já estão atualizados")
+            return 0
+    metrics_path = start_metrics(args)
+    if not args.resume:
+        # As cópias idênticas ficam no lote para serem ligadas de novo no --resume
+        batch_manifest.start_batch(media_files + [c for group in duplicates.values() for c in group],
+                                   {'max_workers': max_workers, 'profile': profile})
+
+    try:
+        audio_files, audio_success, audio_failed, audio_time = [], [], [], 0.0
+        if args.segments is None and not args.no_audio_batch:
+            import audiobatch
+            if audiobatch.applies_to(media_files, profile):
+                # Clipes de áudio em grupos, vários por ffmpeg; o resto segue o motor escolhido
+                audio_files = [f for f in media_files if audiobatch.is_audio_input(f)]
+                media_files = [f for f in media_files if not audiobatch.is_audio_input(f)]
+                audio_success, audio_failed, audio_time = audiobatch.convert_audio_batch(
+                    audio_files, profile, max_workers, args.audio_batch_size, batch_manifest, metrics_path,
+                    admission_control(args), make_verifier(args, profile))
+        if not media_files:
+            success_files, failed_files, elapsed_time = [], [], 0.0
+        elif args.segments is not None:
+            success_files, failed_files, elapsed_time = convert_chunked(
+                media_files, args.segments, max_workers, profile, batch_manifest, not args.no_progress,
+                admission_control(args), metrics_path, make_verifier(args, profile))
+        elif args.engine == 'async':
+            import asyncengine
+            success_files, failed_files, elapsed_time = asyncengine.convert_files_async(
+                media_files, max_workers, show_progress=not args.no_progress,
+                schedule=not args.no_schedule, batch_manifest=batch_manifest, profile=profile,
+                timeout=args.timeout, metrics_path=metrics_path, admission_control=admission_control(args),
+                verifier=make_verifier(args, profile))
+        else:
+            success_files, failed_files, elapsed_time = core.convert_files_parallel(
+                media_files, max_workers, show_progress=not args.no_progress,
+                schedule=not args.no_schedule, batch_manifest=batch_manifest, profile=profile,
+                metrics_path=metrics_path, admission_control=admission_control(args),
+                verifier=make_verifier(args, profile))
+        media_files = audio_files + media_files
+        success_files = audio_success + success_files
+        failed_files = audio_failed + failed_files
+        elapsed_time += audio_time
+    finally:
+        batch_manifest.close()
+    if duplicates:
+        print(f"🔗 {core.link_duplicate_outputs(duplicates, profile)} saídas ligadas às cópias idênticas")
+
+    print(f"\n✅ Sucessos: {len(success_files)}/{len(media_files)} | ❌ Falhas: {len(failed_files)} "
+          f"| ⏱️  {elapsed_time:.1f}s")
+    for file in failed_files:
+        print(f"   • {file}")
+    return 1 if failed_files else 0
+
+def convert_pipeline(args, paths, profile, max_workers, batch_manifest):
+    """Motor em pipeline: a varredura, a sondagem e a conversão andam juntas"""
+    import pipeline
+    done = ()
+    if args.resume:
+        done = {f for f, state in batch_manifest.state.items() if state == 'done'}
+    else:
+        # Sem a lista de arquivos (ainda não varrida), o manifesto guarda as origens
+        batch_manifest.start_batch([], {'max_workers': max_workers, 'profile': profile,
+                                        'paths': [os.path.abspath(p) for p in paths]})
+    try:
+        success_files, failed_files, elapsed_time = pipeline.convert_files_pipeline(
+            paths, profile, max_workers, max(1, args.probe_workers), max(1, args.verify_workers),
+            args.include, args.exclude, not args.no_recursive, args.incremental or args.resume, done,
+            batch_manifest, start_metrics(args), admission_control(args), make_verifier(args, profile))
+    finally:
+        batch_manifest.close()
+
+    total = len(success_files) + len(failed_files)
+    if not total:
+        if args.incremental or args.resume:
+            print("✅ Nada a fazer: todos os arquivos já estão atualizados")
+            return 0
+        return _error("Nenhum arquivo AVI, MKV, MP4, WAV ou AC3 encontrado!")
+    print(f"\n✅ Sucessos: {len(success_files)}/{total} | ❌ Falhas: {len(failed_files)} "
+          f"| ⏱️  {elapsed_time:.1f}s")
+    for file in failed_files:
+        print(f"   • {file}")
+    return 1 if failed_files else 0
+
+def convert_chunked(media_files, segments, max_workers, profile, batch_manifest, show_progress,
+                    controller=None, metrics_path=None, verifier=None):
+    """Converte os arquivos um de cada vez, cada um dividido em segmentos paralelos
+
+    Com verifier (verify.Verifier), cada arquivo convertido é conferido
+    enquanto o próximo converte, como nos outros motores.
+    """
+    import admission
+    import chunked
+    import recovery
+    profile = recovery.resolve_encoders(profile)
+    success_files = []
+    failed_files = []
+    start_time = time.time()
+    for file in media_files:
+        if controller is not None:
+            # Um arquivo por vez: só é preciso recusar o que não cabe sozinho
+            reason = controller.check(admission.estimate_job(file, profile, core.job_outputs(file, profile)))
+            if reason:
+                print(f"❌ Não iniciado: {os.path.basename(file)} - {reason}")
+                failed_files.append(file)
+                batch_manifest.record('failed', file, error=reason)
+                continue
+        batch_manifest.record('start', file)
+        success, _, _ = chunked.convert_file_chunked(
+            file, segments or None, max_workers, profile, show_progress, metrics_path)
+        (success_files if success else failed_files).append(file)
+        batch_manifest.record('done' if success else 'failed', file)
+        if success and verifier is not None:
+            verifier.submit(file, core.job_outputs(file, profile))
+    verification = None
+    if verifier is not None:
+        verification = core.apply_verification(verifier, success_files, failed_files, batch_manifest)
+    elapsed_time = time.time() - start_time
+    core.print_batch_summary({}, None, elapsed_time, verification)
+    return success_files, failed_files, elapsed_time
+
+def _describe_stream(stream):
+    parts = [f"#{stream['index']} {stream['codec_type']}: {stream['codec_name']}"]
+    if stream.get('width'):
+        parts.append(f"{stream['width']}x{stream['height']}")
+    if stream.get('pix_fmt'):
+        parts.append(stream['pix_fmt'])
+    if stream.get('sample_rate'):
+        parts.append(f"{stream['sample_rate']} Hz")
+    if stream.get('channels'):
+        parts.append(f"{stream['channels']} canais")
+    if stream.get('bit_rate'):
+        parts.append(f"{stream['bit_rate'] // 1000} kb/s")
+    return ', '.join(parts)
+
+def cmd_probe(args):
+    files = scanner.scan(args.paths)
+    if not files:
+        return _error("Nenhum arquivo AVI, MKV, MP4, WAV ou AC3 encontrado!")
+
+    results = {}
+    for file in files:
+        results[file] = mediaprobe.probe_media(file, use_cache=not args.no_cache)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        for file, info in results.items():
+            print(f"🎬 {file}")
+            if info is None:
+                print("   ❌ Não foi possível ler o arquivo")
+                continue
+            duration = mediaprobe.format_time(info['duration']) if info['duration'] else "?"
+            bitrate = f"{info['bit_rate'] // 1000} kb/s" if info['bit_rate'] else "?"
+            print(f"   Duração: {duration} | Bitrate: {bitrate} | Formato: {info['format_name']}")
+            for stream in info['streams']:
+                print(f"   {_describe_stream(stream)}")
+    return 1 if any(info is None for info in results.values()) else 0
+
+def cmd_bench(args):
+    if not core.check_ffmpeg():
+        return _error("FFmpeg não encontrado! Instale o FFmpeg: https://ffmpeg.org/download.html")
+
+    if args.calibrate:
+        import tuning
+        files = core.collect_media_files(args.paths)
+        if not files:
+            return _error("Nenhum arquivo AVI, MKV, MP4, WAV ou AC3 encontrado!")
+        profile = resolve_profile(args)
+        if isinstance(profile, list):
+            return _error("--calibrate aceita um único formato de saída")
+        print(f"🔧 Calibrando com {os.path.basename(files[0])}...")
+        measurements = tuning.calibrate(files[0], profile, candidates=args.workers)
+        if not measurements:
+            return _error("A calibração falhou (verifique o arquivo e o perfil)")
+        workers, threads, throughput = max(measurements, key=lambda m: m[2])
+        print(f"✅ Melhor configuração: {workers} processos x {threads} threads "
+              f"({throughput:.2f}x tempo real), salva em {tuning.CALIBRATION_FILE}")
+        return 0
+
+    import bench
+    unknown = [m for m in args.modes or () if m not in bench.MODES]
+    if unknown:
+        return _error(f"Modos desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(bench.MODES)})")
+    if args.paths and not core.collect_media_files(args.paths):
+        return _error("Nenhum arquivo AVI, MKV, MP4, WAV ou AC3 encontrado!")
+
+    # Andamento no stderr: sem -o, o relatório JSON sai limpo no stdout
+    print("📊 Executando o benchmark" + ("" if args.paths else " com mídia sintética") + "...", file=sys.stderr)
+    report = bench.run_benchmark(args.paths, args.modes, args.workers, args.workdir)
+    if not report['inputs']:
+        return _error("Nenhuma entrada disponível para o benchmark")
+    bench.save_report(report, args.output)
+    return 1 if bench.failed(report) else 0
+
+def cmd_watch(args):
+    import watch
+    if args.status:
+        watch.print_status(args.queue)
+        return 0
+    profile = resolve_profile(args)
+
+    if args.add:
+        files = core.collect_media_files(args.paths)
+        if not files:
+            return _error("Nenhum arquivo AVI, MKV, MP4, WAV ou AC3 encontrado!")
+        queue = watch.JobQueue(args.queue)
+        try:
+            for file in files:
+                added = queue.enqueue(file, profile, args.priority)
+                print(("📥 Na fila: " if added else "⏭️  Já na fila ou convertido: ") + os.path.basename(file))
+        finally:
+            queue.close()
+        return 0
+
+    if not core.check_ffmpeg():
+        return _error("FFmpeg não encontrado! Instale o FFmpeg: https://ffmpeg.org/download.html")
+    directories = args.paths or ['.']
+    missing = [d for d in directories if not os.path.isdir(d)]
+    if missing:
+        return _error(f"Pastas não encontradas: {', '.join(missing)}")
+    watch.run_daemon(directories, profile, args.workers, args.settle, args.poll, args.interval,
+                     max(1, args.retries), args.queue, start_metrics(args), admission_control(args))
+    return 0
+
+def cmd_coordinator(args):
+    import distributed
+    profile = resolve_profile(args)
+    media_files = core.collect_media_files(args.paths, args.include, args.exclude, not args.no_recursive)
+    if not media_files:
+        return _error("Nenhum arquivo AVI, MKV, MP4, WAV ou AC3 encontrado!")
+    duplicates = {}
+    if not args.no_dedup:
+        media_files, duplicates = scanner.find_duplicates(media_files)
+    formats = [target['format'] for target in profiles.as_list(profile)]
+    if args.incremental:
+        media_files, skipped = core.filter_pending(media_files, formats)
+        if skipped:
+            print(f"⏭️  {len(skipped)} arquivos já convertidos foram pulados")
+        if not media_files:
+            print("✅ Nada a fazer: todos os arquivos já estão atualizados")
+            return 0
+
+    batch_manifest = manifest.BatchManifest(args.manifest)
+    batch_manifest.start_batch(media_files, {'max_workers': None, 'profile': profile})
+    try:
+        success_files, failed_files, elapsed_time = distributed.run_coordinator(
+            media_files, profile, args.host, args.port, args.lease, max(1, args.retries), batch_manifest)
+    finally:
+        batch_manifest.close()
+    if duplicates:
+        print(f"🔗 {core.link_duplicate_outputs(duplicates, profile)} saídas ligadas às cópias idênticas")
+
+    print(f"\n✅ Sucessos: {len(success_files)}/{len(media_files)} | ❌ Falhas: {len(failed_files)} "
+          f"| ⏱️  {elapsed_time:.1f}s")
+    for file in failed_files:
+        print(f"   • {file}")
+    return 1 if failed_files else 0
+
+def cmd_worker(args):
+    import distributed
+    if not core.check_ffmpeg():
+        return _error("FFmpeg não encontrado! Instale o FFmpeg: https://ffmpeg.org/download.html")
+    distributed.run_worker(args.url, max(1, args.workers) if args.workers else None, args.id,
+                           args.timeout, start_metrics(args), admission_control(args))
+    return 0
+
+COMMANDS = {
+    'convert': cmd_convert,
+    'probe': cmd_probe,
+    'bench': cmd_bench,
+    'watch': cmd_watch,
+    'coordinator': cmd_coordinator,
+    'worker': cmd_worker,
+}
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return COMMANDS[args.command](args)
+    except ValueError as e:
+        # Perfis inválidos ou desconhecidos
+        return _error(str(e))
+    except KeyboardInterrupt:
+        print("\n❌ Conversão cancelada", file=sys.stderr)
+        return 130
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+"""Conversor como biblioteca
+
+    import conversor
+
+    options = conversor.Options(profile='mp4,mp3', workers=2, incremental=True)
+    for result in conversor.convert(['aula1.mkv', 'aula2.avi'], options):
+        print(result.job.input, result.success, result.outputs, result.error)
+
+    info = conversor.probe('aula1.mkv')
+
+convert() gera os resultados à medida que os jobs terminam. Importar o
+pacote só carrega a sondagem e os perfis; o núcleo do conversor (e o
+ffmpeg) só entram na primeira chamada de convert(). O pacote usa os
+módulos da raiz do repositório: instale com 'pip install .' (ver
+pyproject.toml) ou rode a partir dela.
+"""
+from .api import Job, Options, Result, convert, probe
+
+__all__ = ['Job', 'Options', 'Result', 'convert', 'probe']
@@ -0,0 +1,7 @@
+"""python -m conversor: a mesma CLI de convertermoreperformace.py"""
+import sys
+
+import cli
+
+sys.argv[0] = 'python -m conversor'    # Nome mostrado no --help
+sys.exit(cli.main(sys.argv[1:]))
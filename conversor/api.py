@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Jobs, opções e resultados da biblioteca, e o iterador convert()
+
+convert() roda core.convert_file em threads (cada uma espera o seu ffmpeg)
+e entrega um Result assim que cada job termina, na ordem em que terminam.
+Nada é impresso: as mensagens de cada job vão para Result.log. Os módulos
+pesados (núcleo, tuning, verificação) só são importados na primeira
+chamada de convert().
+"""
+from __future__ import annotations
+
+import os
+import time
+
+import mediaprobe
+import profiles
+
+# As anotações não são avaliadas (ver o __future__ acima): typing só é
+# importado pelos verificadores de tipo (mypy, pyright), não no import do pacote
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+    # Perfil: nome (ou nomes separados por vírgula), perfil ou lista deles
+    ProfileSpec = Union[str, Dict[str, Any], Sequence[Union[str, Dict[str, Any]]]]
+    PathLike = Union[str, os.PathLike]
+
+DEFAULT_PROFILE = 'mp4'
+# Jobs submetidos de uma vez, por conversão simultânea (o iterável de jobs
+# é consumido aos poucos, então pode ser um gerador sobre um acervo enorme)
+QUEUE_DEPTH = 2
+
+class Job:
+    """Um arquivo a converter; profile (nome, perfil ou lista) substitui o de Options"""
+
+    __slots__ = ('input', 'profile')
+
+    def __init__(self, input: PathLike, profile: Optional[ProfileSpec] = None) -> None:
+        self.input: str = os.fspath(input)
+        self.profile: Optional[ProfileSpec] = profile
+
+    def __repr__(self) -> str:
+        return f"Job({self.input!r}, profile={self.profile!r})"
+
+class Options:
+    """Opções do lote
+
+    profile é o nome de um perfil (ver profiles.py), um perfil ou uma lista
+    deles (multi-saída). workers/threads vazios seguem tuning.recommend.
+    Com incremental, arquivos com as saídas atualizadas são pulados; com
+    verify (e verify_decode), as saídas são conferidas como em verify.py.
+    max_memory e min_free_disk (bytes ou '8G') são os limites do controle
+    de admissão, como --max-memory/--min-free-disk (ver admission.py).
+    """
+
+    __slots__ = ('profile', 'workers', 'threads', 'incremental', 'verify', 'verify_decode',
+                 'metrics_path', 'profiles_file', 'max_memory', 'min_free_disk')
+
+    def __init__(self, profile: ProfileSpec = DEFAULT_PROFILE, workers: Optional[int] = None,
+                 threads: Optional[int] = None, incremental: bool = False, verify: bool = False,
+                 verify_decode: bool = False, metrics_path: Optional[str] = None,
+                 profiles_file: Optional[str] = None, max_memory: Optional[Union[int, str]] = None,
+                 min_free_disk: Optional[Union[int, str]] = None) -> None:
+        self.profile: ProfileSpec = profile
+        self.workers: Optional[int] = workers
+        self.threads: Optional[int] = threads
+        self.incremental: bool = incremental
+        self.verify: bool = verify
+        self.verify_decode: bool = verify_decode
+        self.metrics_path: Optional[str] = metrics_path
+        self.profiles_file: Optional[str] = profiles_file
+        self.max_memory: Optional[Union[int, str]] = max_memory
+        self.min_free_disk: Optional[Union[int, str]] = min_free_disk
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"Options({fields})"
+
+class Result:
+    """Resultado de um job
+
+    outputs são os arquivos finais; size é a soma dos tamanhos deles e
+    seconds o tempo do job (com novas tentativas e verificação). error
+    traz o motivo da falha e log as mensagens que o conversor imprimiria.
+    """
+
+    __slots__ = ('job', 'success', 'skipped', 'outputs', 'conversion_path', 'seconds', 'size',
+                 'error', 'log')
+
+    def __init__(self, job: Job, success: bool, skipped: bool = False, outputs: Iterable[str] = (),
+                 conversion_path: Optional[str] = None, seconds: float = 0.0, size: int = 0,
+                 error: Optional[str] = None, log: Iterable[str] = ()) -> None:
+        self.job: Job = job
+        self.success: bool = success
+        self.skipped: bool = skipped
+        self.outputs: List[str] = list(outputs)
+        self.conversion_path: Optional[str] = conversion_path
+        self.seconds: float = seconds
+        self.size: int = size
+        self.error: Optional[str] = error
+        self.log: List[str] = list(log)
+
+    def __repr__(self) -> str:
+        state = 'pulado' if self.skipped else 'ok' if self.success else f"erro: {self.error}"
+        return f"Result({self.job.input!r}, {state}, {self.seconds:.1f}s)"
+
+class _Events:
+    """Recebe os eventos de core.convert_file no lugar da fila do painel"""
+
+    def __init__(self) -> None:
+        self.log: List[str] = []
+
+    def put(self, event: Optional[Dict[str, Any]]) -> None:
+        if event and event.get('type') == 'log':
+            self.log.append(event['message'])
+
+def probe(input_file: PathLike, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+    """Resumo do ffprobe de um arquivo (ver mediaprobe.probe_media)"""
+    return mediaprobe.probe_media(os.fspath(input_file), use_cache=use_cache)
+
+def _resolve_profile(profile, table):
+    """Nome, perfil ou lista (de nomes ou perfis) → perfil ou lista de perfis"""
+    if isinstance(profile, str):
+        names = [name.strip() for name in profile.split(',') if name.strip()]
+        if len(names) == 1:
+            return profiles.get_profile(names[0], table)
+        profile = names
+    if isinstance(profile, (list, tuple)):
+        return [_resolve_profile(item, table) for item in profile]
+    return profile
+
+def _admit(admission, core, job, profile, controller, closed):
+    """Espera o job caber na memória e no disco; retorna (estimativa, motivo da recusa)"""
+    estimate = admission.estimate_job(job.input, profile, core.job_outputs(job.input, profile))
+    reason = controller.check(estimate)
+    if reason:
+        return None, f"não iniciado: {reason}"
+    while not controller.try_admit(estimate):
+        if closed.wait(admission.ADMISSION_POLL):
+            return None, "cancelado"
+    return estimate, None
+
+def _run_job(core, job, profile, slots, options, threads, controller, closed):
+    """Converte (e verifica) um job em uma thread; nunca levanta exceção
+
+    O job espera a vez no controle de admissão (controller) antes de
+    começar; closed encerra essa espera quando a iteração é interrompida.
+    slots tem os números livres das mensagens ([P1]...[Pn], n = workers);
+    o job pega o menor ao começar e o devolve ao terminar.
+    """
+    import admission
+
+    start_time = time.time()
+    events = _Events()
+    outputs = [final_file for final_file, _ in core.job_outputs(job.input, profile)]
+    try:
+        estimate, error = _admit(admission, core, job, profile, controller, closed)
+    except Exception as e:
+        estimate, error = None, str(e)
+    if error:
+        return Result(job, False, outputs=outputs, seconds=time.time() - start_time, error=error)
+    slot = slots.get()
+    try:
+        success, _, conversion_path = core.convert_file(
+            job.input, slot, progress_queue=events, profile=profile, threads=threads,
+            metrics_path=options.metrics_path, submitted_at=start_time)
+        if not success:
+            errors = [message for message in events.log if '❌' in message]
+            error = errors[-1].strip() if errors else "conversão falhou"
+        elif options.verify or options.verify_decode:
+            import verify
+            report = verify.verify_job(job.input, core.job_outputs(job.input, profile), profile,
+                                       decode=options.verify_decode)
+            if not report['ok']:
+                success = False
+                error = "verificação: " + '; '.join(report['problems'])
+    except Exception as e:
+        success, conversion_path, error = False, None, str(e)
+    finally:
+        slots.put(slot)
+        controller.release(estimate)
+    size = sum(os.path.getsize(f) for f in outputs if os.path.exists(f)) if success else 0
+    return Result(job, success, outputs=outputs, conversion_path=conversion_path,
+                  seconds=time.time() - start_time, size=size, error=error, log=events.log)
+
+def convert(jobs: Iterable[Union[Job, PathLike]], options: Optional[Options] = None) -> Iterator[Result]:
+    """Converte os jobs e gera um Result para cada um, na ordem em que terminam
+
+    jobs é um iterável de Job ou de caminhos; options, um Options (padrão:
+    perfil 'mp4'). Interromper a iteração cancela os jobs ainda não
+    iniciados e espera os que já estão rodando.
+
+        for result in conversor.convert(['a.mkv', 'b.avi'], conversor.Options('web')):
+            print(result.job.input, result.success, result.outputs)
+    """
+    import queue
+    import threading
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    import admission
+    import convertermoreperformace as core
+    import manifest
+    import ratecontrol
+    import recovery
+    import tuning
+
+    options = options or Options()
+    table = profiles.load_profiles(options.profiles_file)
+    default = recovery.resolve_encoders(_resolve_profile(options.profile, table), log=None)
+    kind = tuning.heaviest({tuning.job_type(target) for target in profiles.as_list(default)})
+    if options.workers:
+        workers = options.workers
+        threads = options.threads or tuning.threads_for(workers, kind)
+    else:
+        workers, threads = tuning.recommend(kind)
+        threads = options.threads or threads
+
+    # Memória e disco, como nos outros motores (ver admission.py)
+    memory_limit = int(ratecontrol.parse_size(options.max_memory)) if options.max_memory else None
+    disk_reserve = (admission.DEFAULT_DISK_RESERVE if options.min_free_disk is None
+                    else int(ratecontrol.parse_size(options.min_free_disk)))
+    controller = admission.AdmissionController(memory_limit, disk_reserve)
+    closed = threading.Event()
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='conversor')
+    running = set()
+    # Uma thread por conversão: sempre há um número livre quando um job começa
+    slots = queue.PriorityQueue()
+    for slot in range(1, workers + 1):
+        slots.put(slot)
+    jobs = iter(jobs)
+    exhausted = False
+    try:
+        while True:
+            # Mantém a fila cheia sem consumir o iterável inteiro
+            while not exhausted and len(running) < workers * QUEUE_DEPTH:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                if not isinstance(job, Job):
+                    job = Job(job)
+                profile = default if job.profile is None else recovery.resolve_encoders(
+                    _resolve_profile(job.profile, table), log=None)
+                if options.incremental:
+                    outputs = [final_file for final_file, _ in core.job_outputs(job.input, profile)]
+                    if all(manifest.is_up_to_date(job.input, f) for f in outputs):
+                        yield Result(job, True, skipped=True, outputs=outputs)
+                        continue
+                running.add(executor.submit(_run_job, core, job, profile, slots, options, threads,
+                                            controller, closed))
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                running.discard(future)
+                yield future.result()
+    finally:
+        closed.set()
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -2,8 +2,14 @@
 import subprocess
 import os
 import sys
+import argparse
 from pathlib import Path
 
+import profiles
+import scanner
+
+VIDEO_EXTENSIONS = ('.avi', '.mkv', '.mp4')
+
 def check_ffmpeg():
     """Verifica se o FFmpeg está instalado"""
     try:
@@ -12,8 +18,10 @@ def check_ffmpeg():
     except (subprocess.CalledProcessError, FileNotFoundError):
         return False
 
-def convert_file(input_file, to_mp3=False):
-    """Converte um único arquivo"""
+def convert_file(input_file, to_mp3=False, profile=None):
+    """Converte um único arquivo (profile substitui to_mp3, ver profiles.py)"""
+    if profile is None:
+        profile = profiles.profile_for_flags(to_mp3)
     print(f"🔄 Convertendo: {os.path.basename(input_file)}")
     
     # Criar pasta de saída
@@ -23,36 +31,10 @@ def convert_file(input_file, to_mp3=False):
     
     # Definir arquivo de saída
     input_name = Path(input_file).stem
-    output_ext = "mp3" if to_mp3 else "mp4"
-    output_file = os.path.join(output_dir, f"{input_name}.{output_ext}")
+    output_file = os.path.join(output_dir, f"{input_name}.{profile['format']}")
     
     # Comando ffmpeg para conversão
-    if to_mp3:
-        # Conversão para MP3 (apenas áudio)
-        cmd = [
-            'ffmpeg',
-            '-i', input_file,
-            '-vn',              # Sem vídeo
-            '-acodec', 'mp3',   # Codec MP3
-            '-ab', '192k',      # Bitrate audio
-            '-ar', '44100',     # Sample rate
-            '-y',               # Sobrescrever se existir
-            output_file
-        ]
-    else:
-        # Conversão para MP4 (vídeo)
-        cmd = [
-            'ffmpeg',
-            '-i', input_file,
-            '-c:v', 'libx264',      # Codec H264
-            '-crf', '18',           # Alta qualidade
-            '-preset', 'medium',    # Velocidade balanceada
-            '-c:a', 'aac',          # Audio AAC
-            '-b:a', '192k',         # Bitrate audio
-            '-movflags', '+faststart',  # Otimização
-            '-y',                   # Sobrescrever se existir
-            output_file
-        ]
+    cmd = profiles.build_command(input_file, output_file, profile)
     
     try:
         # Executar conversão (mostra output do ffmpeg)
@@ -69,7 +51,24 @@ def convert_file(input_file, to_mp3=False):
         print(f"❌ Erro: {str(e)}")
         return False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Conversor AVI/MKV/MP4 → MP4/MP3")
+    parser.add_argument('files', nargs='*', help="arquivos a converter (arrastar e soltar)")
+    parser.add_argument('-f', '--format', choices=['mp4', 'mp3'],
+                        help="formato de saída; informado, nada é perguntado")
+    parser.add_argument('-p', '--profile', help="perfil de codificação nomeado (ver profiles.py)")
+    parser.add_argument('--profiles-file', help="arquivo TOML/JSON com perfis extras")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    # Com --format ou --profile o programa roda sem perguntas (cron, scripts)
+    interactive = not (args.format or args.profile)
+    
+    def pause():
+        if interactive:
+            input("\nPressione Enter para sair...")
+    
     print("=" * 60)
     print("    CONVERSOR AVI/MKV/MP4 → MP4/MP3")
     print("=" * 60)
@@ -78,13 +77,16 @@ def main():
     if not check_ffmpeg():
         print("❌ FFmpeg não encontrado!")
         print("   Instale o FFmpeg: https://ffmpeg.org/download.html")
-        input("\nPressione Enter para sair...")
+        pause()
         sys.exit(1)
     
     # Verificar argumentos da linha de comando
-    if len(sys.argv) > 1:
+    if args.files:
         # Arquivos passados como argumentos (arrastar e soltar)
-        files = sys.argv[1:]
+        files = args.files
+    elif not interactive:
+        print("❌ Nenhum arquivo informado")
+        sys.exit(2)
     else:
         # Modo interativo
         print("\n📁 MODO INTERATIVO")
@@ -103,47 +105,57 @@ def main():
                 files.append(path)
                 print(f"✅ Adicionado: {os.path.basename(path)}")
             elif os.path.isdir(path):
-                # Buscar arquivos AVI, MKV e MP4 na pasta
-                for ext in ['*.avi', '*.mkv', '*.mp4']:
-                    found = list(Path(path).glob(ext))
-                    files.extend([str(f) for f in found])
-                print(f"✅ Pasta adicionada: {len(list(Path(path).glob('*.avi')) + list(Path(path).glob('*.mkv')) + list(Path(path).glob('*.mp4')))} arquivos")
+                # Buscar arquivos AVI, MKV e MP4 na pasta e subpastas
+                found = scanner.scan([path], VIDEO_EXTENSIONS)
+                files.extend(found)
+                print(f"✅ Pasta adicionada: {len(found)} arquivos")
             else:
                 print(f"❌ Não encontrado: {path}")
     
     # Filtrar apenas arquivos AVI, MKV e MP4
-    video_files = [f for f in files if f.lower().endswith(('.avi', '.mkv', '.mp4')) and os.path.isfile(f)]
+    video_files = scanner.scan(files, VIDEO_EXTENSIONS)
     
     if not video_files:
         print("❌ Nenhum arquivo AVI, MKV ou MP4 encontrado!")
-        input("\nPressione Enter para sair...")
+        pause()
         sys.exit(1)
     
     print(f"\n🎬 Encontrados {len(video_files)} arquivos para converter:")
     for i, file in enumerate(video_files, 1):
         print(f"  {i}. {os.path.basename(file)}")
     
-    # Escolher tipo de conversão
-    print(f"\n📋 Escolha o tipo de conversão:")
-    print("  1. Converter para MP4 (vídeo)")
-    print("  2. Converter para MP3 (apenas áudio)")
+    if args.profile:
+        try:
+            profile = profiles.get_profile(args.profile, profiles.load_profiles(args.profiles_file))
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(2)
+    elif args.format:
+        profile = profiles.profile_for_flags(to_mp3=(args.format == 'mp3'))
+    else:
+        # Escolher tipo de conversão
+        print(f"\n📋 Escolha o tipo de conversão:")
+        print("  1. Converter para MP4 (vídeo)")
+        print("  2. Converter para MP3 (apenas áudio)")
+    
+        conv_type = input("\nEscolha (1/2): ").strip()
     
-    conv_type = input("\nEscolha (1/2): ").strip()
+        if conv_type not in ['1', '2']:
+            print("❌ Opção inválida")
+            sys.exit(0)
     
-    if conv_type not in ['1', '2']:
-        print("❌ Opção inválida")
-        sys.exit(0)
+        to_mp3 = (conv_type == '2')
+        output_format = "MP3" if to_mp3 else "MP4"
     
-    to_mp3 = (conv_type == '2')
-    output_format = "MP3" if to_mp3 else "MP4"
+        # Confirmar conversão
+        print(f"\n🚀 Converter {len(video_files)} arquivos para {output_format}?")
+        choice = input("(s/n): ").lower()
     
-    # Confirmar conversão
-    print(f"\n🚀 Converter {len(video_files)} arquivos para {output_format}?")
-    choice = input("(s/n): ").lower()
+        if choice != 's':
+            print("❌ Conversão cancelada")
+            sys.exit(0)
     
-    if choice != 's':
-        print("❌ Conversão cancelada")
-        sys.exit(0)
+        profile = profiles.profile_for_flags(to_mp3)
     
     # Converter arquivos
     print(f"\n{'='*60}")
@@ -153,7 +165,7 @@ def main():
     success_count = 0
     for i, file in enumerate(video_files, 1):
         print(f"\n[{i}/{len(video_files)}] ", end="")
-        if convert_file(file, to_mp3):
+        if convert_file(file, profile=profile):
             success_count += 1
     
     # Resultado final
@@ -163,7 +175,9 @@ def main():
     print(f"✅ Sucessos: {success_count}/{len(video_files)}")
     print(f"📁 Arquivos salvos na pasta 'convertida'")
     
-    input("\nPressione Enter para sair...")
+    pause()
+    if success_count < len(video_files):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
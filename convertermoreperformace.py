@@ -1,13 +1,41 @@
 #!/usr/bin/env python3
+import sys
+
+# Subcomandos (convert, probe, bench...) rodam sem nenhuma pergunta. A CLI
+# é chamada antes das importações abaixo, que ela só faz quando precisa
+# (probe e --help não usam o núcleo), e sem carregar este arquivo duas vezes
+SUBCOMMANDS = ('convert', 'probe', 'bench', 'watch', 'coordinator', 'worker', '-h', '--help')
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+    import cli
+    sys.exit(cli.main(sys.argv[1:]))
+
 import subprocess
 import os
-import sys
-from pathlib import Path
-import multiprocessing
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import shutil
 import time
 import re
-from datetime import timedelta
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+# multiprocessing e concurrent.futures são importados dentro das funções que
+# os usam: probe, --help e a biblioteca (pacote conversor) iniciam mais rápido
+
+import admission
+import manifest
+import mediaprobe
+import metrics
+import planner
+import profiles
+import ratecontrol
+import recovery
+import scanner
+import scheduler
+import thumbnails
+import tuning
+
+MEDIA_EXTENSIONS = scanner.MEDIA_EXTENSIONS
+# Intervalo (s) em que run_ffmpeg confere o pedido de parada
+STOP_POLL = 0.5
 
 def check_ffmpeg():
     """Verifica se o FFmpeg está instalado"""
@@ -18,25 +46,31 @@ def check_ffmpeg():
         return False
 
 def get_video_duration(input_file):
-    """Obtém a duração do vídeo em segundos usando ffprobe"""
-    try:
-        cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            input_file
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            duration_str = result.stdout.strip()
-            # Verificar se não é N/A ou vazio
-            if duration_str and duration_str != 'N/A':
-                return float(duration_str)
-    except:
-        pass
+    """Obtém a duração do vídeo em segundos usando ffprobe (com cache)"""
+    info = mediaprobe.probe_media(input_file)
+    if info:
+        return info['duration']
     return None
 
+def get_video_info(input_file):
+    """Obtém duração e resolução do primeiro stream de vídeo (com cache)"""
+    info = mediaprobe.probe_media(input_file)
+    video = mediaprobe.first_stream(info, 'video')
+    return {
+        'duration': info['duration'] if info else None,
+        'width': video['width'] if video else None,
+        'height': video['height'] if video else None,
+    }
+
+def probe_files(files, max_workers=8, streams=None):
+    """Sonda vários arquivos em paralelo (ffprobe é I/O); retorna os resumos do mediaprobe
+    
+    streams limita os streams sondados (ver mediaprobe.probe_media).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda f: mediaprobe.probe_media(f, streams=streams), files))
+
 def parse_time(time_str):
     """Converte string de tempo HH:MM:SS.ms para segundos"""
     try:
@@ -48,21 +82,8 @@ def parse_time(time_str):
     except:
         return 0
 
-def format_time(seconds):
-    """Formata segundos para string legível"""
-    if seconds < 0:
-        return "calculando..."
-    
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    
-    if hours > 0:
-        return f"{hours}h {minutes}m {secs}s"
-    elif minutes > 0:
-        return f"{minutes}m {secs}s"
-    else:
-        return f"{secs}s"
+# Também usado pelo probe da CLI, que não importa este módulo
+format_time = mediaprobe.format_time
 
 def format_size(bytes):
     """Formata bytes para tamanho legível"""
@@ -72,240 +93,760 @@ def format_size(bytes):
         bytes /= 1024.0
     return f"{bytes:.1f} TB"
 
-def convert_file(input_file, process_id=1, to_mp3=False, to_ac3=False, use_gpu=False):
-    """Converte um único arquivo"""
-    filename = os.path.basename(input_file)
-    print(f"🔄 [P{process_id}] Convertendo: {filename}")
+def find_media_files(directory, recursive=True):
+    """Arquivos AVI, MKV, MP4, WAV e AC3 de uma pasta (e subpastas)"""
+    return scanner.scan([directory], MEDIA_EXTENSIONS, recursive)
+
+def collect_media_files(paths, include=(), exclude=(), recursive=True):
+    """Expande pastas e mantém apenas arquivos de mídia existentes (ver scanner.scan)"""
+    return scanner.scan(paths, MEDIA_EXTENSIONS, recursive, include, exclude)
+
+def link_duplicate_outputs(duplicates, profile):
+    """Aponta as saídas das cópias idênticas para as saídas já convertidas do original
     
-    # Criar pasta de saída
+    duplicates vem de scanner.find_duplicates. Tudo o que o perfil gera é
+    ligado (ver job_artifacts), inclusive as miniaturas e o sprite.
+    Retorna quantas saídas foram ligadas.
+    """
+    linked = 0
+    for original, copies in duplicates.items():
+        sources = job_artifacts(original, profile)
+        for copy in copies:
+            for source, target in zip(sources, job_artifacts(copy, profile)):
+                if not manifest.is_up_to_date(original, source):
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    if os.path.isdir(source):
+                        scanner.link_tree(source, target)
+                    else:
+                        scanner.link_file(source, target)
+                    linked += 1
+                except OSError as e:
+                    print(f"⚠️  Não foi possível ligar {target}: {e}")
+    return linked
+
+def get_output_path(input_file, fmt='mp4'):
+    """Caminho do arquivo convertido na pasta "convertida" ao lado da fonte"""
     input_dir = os.path.dirname(input_file)
     output_dir = os.path.join(input_dir, "convertida")
-    os.makedirs(output_dir, exist_ok=True)
+    input_name = os.path.splitext(os.path.basename(input_file))[0]
+    return os.path.join(output_dir, f"{input_name}.{fmt}")
+
+def get_partial_path(output_file, tag=None):
+    """Nome temporário (oculto) usado durante a conversão; mantém a extensão
     
-    # Definir arquivo de saída
-    input_name = Path(input_file).stem
-    if to_mp3:
-        output_ext = "mp3"
-    elif to_ac3:
-        output_ext = "ac3"
-    else:
-        output_ext = "mp4"
-    output_file = os.path.join(output_dir, f"{input_name}.{output_ext}")
+    tag separa conversões do mesmo arquivo que podem coexistir (no modo
+    distribuído, um worker atrasado e o que recebeu o job depois dele).
+    """
+    output_dir, name = os.path.split(output_file)
+    stem, ext = os.path.splitext(name)
+    tag = f".{tag}" if tag else ''
+    return os.path.join(output_dir, f".{stem}{tag}.partial{ext}")
+
+def job_outputs(input_file, profile):
+    """(arquivo final, arquivo temporário) de cada saída do perfil (ou lista de perfis)"""
+    outputs = []
+    for target in profiles.as_list(profile):
+        final_file = get_output_path(input_file, target['format'])
+        outputs.append((final_file, get_partial_path(final_file)))
+    return outputs
+
+def job_artifacts(input_file, profile):
+    """Arquivos finais de um job: as saídas e, com miniaturas, a pasta delas e o sprite"""
+    artifacts = [final_file for final_file, _ in job_outputs(input_file, profile)]
+    for target in profiles.as_list(profile):
+        # Como em prepare_conversion, só a primeira saída com miniaturas as gera
+        if target.get('thumbnails'):
+            final_file = get_output_path(input_file, target['format'])
+            artifacts += thumbnails.output_names(final_file, target.get('thumbnail_format', 'jpg'))
+            break
+    return artifacts
+
+def filter_pending(files, fmt='mp4', done=()):
+    """Separa os arquivos que ainda precisam ser convertidos dos já atualizados
     
-    # Comando ffmpeg para conversão
-    if to_mp3:
-        # Conversão para MP3 (apenas áudio)
-        if use_gpu:
-            # Usar aceleração por GPU para MP3
-            cmd = [
-                'ffmpeg',
-                '-i', input_file,
-                '-vn',              # Sem vídeo
-                '-acodec', 'mp3',   # Codec MP3
-                '-ab', '192k',      # Bitrate audio
-                '-ar', '44100',     # Sample rate
-                '-y',               # Sobrescrever se existir
-                output_file
-            ]
+    Um arquivo é pulado se já consta como concluído no manifesto (done) ou
+    se a saída existe e é mais nova que a fonte. fmt pode ser uma lista de
+    formatos (multi-saída): todas as saídas precisam estar atualizadas.
+    """
+    formats = [fmt] if isinstance(fmt, str) else fmt
+    pending = []
+    skipped = []
+    for file in files:
+        if file in done or all(manifest.is_up_to_date(file, get_output_path(file, f)) for f in formats):
+            skipped.append(file)
         else:
-            # Usar CPU
-            cmd = [
-                'ffmpeg',
-                '-i', input_file,
-                '-vn',              # Sem vídeo
-                '-acodec', 'mp3',   # Codec MP3
-                '-ab', '192k',      # Bitrate audio
-                '-ar', '44100',     # Sample rate
-                '-y',               # Sobrescrever se existir
-                output_file
-            ]
-    elif to_ac3:
-        # Conversão para AC3 (apenas áudio)
-        if use_gpu:
-            # Usar aceleração por GPU para AC3
-            cmd = [
-                'ffmpeg',
-                '-i', input_file,
-                '-vn',              # Sem vídeo
-                '-acodec', 'ac3',   # Codec AC3
-                '-ab', '640k',      # Bitrate audio (AC3 padrão)
-                '-ar', '48000',     # Sample rate (AC3 padrão)
-                '-y',               # Sobrescrever se existir
-                output_file
-            ]
-        else:
-            # Usar CPU
-            cmd = [
-                'ffmpeg',
-                '-i', input_file,
-                '-vn',              # Sem vídeo
-                '-acodec', 'ac3',   # Codec AC3
-                '-ab', '640k',      # Bitrate audio (AC3 padrão)
-                '-ar', '48000',     # Sample rate (AC3 padrão)
-                '-y',               # Sobrescrever se existir
-                output_file
-            ]
-    else:
-        # Conversão para MP4 (vídeo)
-        if use_gpu:
-            # Usar aceleração por GPU com VideoToolbox no macOS
-            cmd = [
-                'ffmpeg',
-                '-i', input_file,
-                '-c:v', 'h264_videotoolbox',   # Codec H264 com VideoToolbox
-                '-b:v', '1500k',                # Bitrate de vídeo para GPU
-                '-c:a', 'aac',                  # Audio AAC
-                '-b:a', '128k', 
-                '-realtime', '1',                # real time
-                '-movflags', '+faststart',      # Otimização
-                '-y',                           # Sobrescrever se existir
-                output_file
-            ]
-        else:
-            # Usar CPU com libx264
-            cmd = [
-                'ffmpeg',
-                '-i', input_file,
-                '-c:v', 'libx264',      # Codec H264
-                '-crf', '18',           # Alta qualidade
-                '-preset', 'medium',    # Velocidade balanceada
-                '-c:a', 'aac',          # Audio AAC
-                '-b:a', '192k',         # Bitrate audio
-                '-movflags', '+faststart',  # Otimização
-                '-y',                   # Sobrescrever se existir
-                output_file
-            ]
+            pending.append(file)
+    return pending, skipped
+
+def prepare_conversion(input_file, profile, threads=None, partial_tag=None, info=None):
+    """Planeja a conversão de um arquivo sem executá-la
+    
+    Cria a pasta de saída, escolhe copiar/converter cada stream e monta o
+    comando (uma saída por perfil, com nomes temporários). Retorna um dict
+    com 'input', 'filename', 'duration', 'path', 'cmd' e 'outputs' (lista
+    de (arquivo final, arquivo temporário)), usado por finalize_conversion.
+    Com tamanho/bitrate alvo (ver ratecontrol.py), 'pre_cmds' traz a
+    primeira passada, executada antes de 'cmd', e 'notes' o CRF escolhido.
+    Com miniaturas (ver thumbnails.py), 'extras' traz a pasta das imagens e
+    o sprite, gravados pelo próprio 'cmd' ou por 'post_cmds'. partial_tag
+    entra nos nomes temporários (ver get_partial_path). info é a sondagem,
+    se quem chama já a tem (o pipeline sonda numa etapa própria).
+    """
+    probe_start = time.time()
+    if info is None:
+        info = mediaprobe.probe_media(input_file)
+    probe_seconds = time.time() - probe_start
+    outputs = []
+    plans = []
+    pre_cmds = []
+    post_cmds = []
+    thumbnail_args = []
+    extras = []
+    notes = []
+    work_dirs = []
+    for target in profiles.as_list(profile):
+        # Definir arquivo de saída (criando a pasta "convertida")
+        final_file = get_output_path(input_file, target['format'])
+        os.makedirs(os.path.dirname(final_file), exist_ok=True)
+        
+        # Gravar em um nome temporário e renomear só no fim: uma conversão
+        # interrompida nunca deixa um arquivo final truncado
+        output_file = get_partial_path(final_file, partial_tag)
+        
+        # Escolher, por stream, entre copiar e converter
+        plan = planner.plan_conversion(info, target)
+        if ratecontrol.has_target(target) and plan['video'] == 'encode':
+            # Tamanho/bitrate alvo: CRF escolhido por amostras ou duas passadas
+            target, commands, work_dir, note = ratecontrol.apply(input_file, target, info, plan, threads)
+            pre_cmds += commands
+            notes.append(note)
+            if work_dir:
+                work_dirs.append(work_dir)
+        if target.get('thumbnails') and not extras:
+            # Miniaturas e sprite, também com nomes temporários até o fim
+            thumbs_dir, sprite_file = thumbnails.output_names(final_file, target.get('thumbnail_format', 'jpg'))
+            extras = [(thumbs_dir, get_partial_path(thumbs_dir, partial_tag)),
+                      (sprite_file, get_partial_path(sprite_file, partial_tag))]
+            args, command, note = thumbnails.prepare(input_file, target, info, plan, extras[0][1], extras[1][1])
+            thumbnail_args += args
+            post_cmds += [command] if command else []
+            notes.append(note)
+            if not args and not command:
+                extras = []
+        outputs.append((final_file, output_file))
+        plans.append((output_file, target, plan))
     
+    return {
+        'input': input_file,
+        'filename': os.path.basename(input_file),
+        'duration': info['duration'] if info else None,
+        'path': '+'.join(plan['path'] for _, _, plan in plans),
+        # Comando ffmpeg para conversão (todas as saídas na mesma execução)
+        'cmd': profiles.build_multi_command(input_file, plans, threads) + thumbnail_args,
+        'outputs': outputs,
+        'extras': extras,
+        'probe_seconds': probe_seconds,
+        'pre_cmds': pre_cmds,
+        'post_cmds': post_cmds,
+        'notes': notes,
+        'work_dirs': work_dirs,
+    }
+
+def finalize_conversion(job, success):
+    """Publica as saídas (renomeação atômica) ou apaga os temporários
+    
+    Retorna o tamanho total das saídas publicadas (0 em caso de falha).
+    """
+    for work_dir in job.get('work_dirs', []):
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if success:
+        for final_file, output_file in job['outputs']:
+            os.replace(output_file, final_file)
+        for final_file, output_file in job.get('extras', []):
+            if os.path.isdir(final_file):
+                # Miniaturas de uma conversão anterior
+                shutil.rmtree(final_file)
+            os.replace(output_file, final_file)
+        return sum(os.path.getsize(final_file) for final_file, _ in job['outputs'])
+    for _, output_file in job['outputs']:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+    for _, output_file in job.get('extras', []):
+        if os.path.isdir(output_file):
+            shutil.rmtree(output_file, ignore_errors=True)
+        elif os.path.exists(output_file):
+            os.remove(output_file)
+    return 0
+
+def _run_attempt(input_file, profile, threads, process_id, progress_queue, job_id, info=None, stop=None):
+    """Uma tentativa de conversão
+    
+    Retorna (sucesso, job, código de saída, stderr, tempo, tamanho, uso de
+    CPU/memória). Uma exceção do Python durante a conversão conta como
+    código de saída 1, com a mensagem no stderr. Sem sucesso (inclusive
+    quando stop interrompe o ffmpeg), os temporários são apagados.
+    """
+    job = prepare_conversion(input_file, profile, threads, info=info)
+    filename = job['filename']
+    success = False
+    returncode, stderr_tail, total_time, actual_size = None, '', 0.0, 0
+    stats = {}
     try:
-        # Executar conversão silenciosamente para não misturar outputs
+        # Executar conversão lendo o progresso do ffmpeg (sem misturar outputs)
+        if progress_queue is not None:
+            progress_queue.put({'type': 'start', 'job': job_id, 'pid': os.getpid(),
+                                'filename': filename, 'duration': job['duration']})
+        for note in job['notes']:
+            _log(progress_queue, f"   [P{process_id}] {note}")
         start_time = time.time()
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        returncode = 0
+        for cmd in job['pre_cmds'] + [job['cmd']] + job['post_cmds']:
+            returncode, stderr_tail = run_ffmpeg(cmd, progress_queue, job_id, stats, stop)
+            if returncode != 0:
+                break
         total_time = time.time() - start_time
         
-        if result.returncode == 0:
-            # Obter tamanho real do arquivo
-            actual_size = os.path.getsize(output_file)
-            print(f"✅ [P{process_id}] Sucesso: {filename} | Tempo: {format_time(total_time)} | Tamanho: {format_size(actual_size)}")
-            return True, filename
-        else:
-            print(f"❌ [P{process_id}] Erro: {filename}")
-            return False, filename
+        if returncode == 0:
+            # Obter tamanho real dos arquivos
+            actual_size = finalize_conversion(job, True)
+            success = True
+            _log(progress_queue, f"✅ [P{process_id}] Sucesso: {filename} | Tempo: {format_time(total_time)} | Tamanho: {format_size(actual_size)} | {job['path']}")
             
     except Exception as e:
-        print(f"❌ [P{process_id}] Erro: {filename} - {str(e)}")
-        return False, filename
-
-def get_optimal_workers():
-    """Calcula número ideal de processos simultâneos"""
-    cpu_count = multiprocessing.cpu_count()
-    # Conversão de vídeo é pesada, então usar menos workers que CPUs
-    if cpu_count >= 8:
-        return 4  # Máximo 4 processos para sistemas potentes
-    elif cpu_count >= 4:
-        return 3  # 3 processos para sistemas médios
-    else:
-        return 2  # 2 processos para sistemas básicos
+        stderr_tail += str(e)
+        returncode = returncode or 1
+    
+    if not success:
+        finalize_conversion(job, False)
+    return success, job, returncode, stderr_tail, total_time, actual_size, stats
 
-def convert_files_parallel(video_files, max_workers=None, to_mp3=False, to_ac3=False, use_gpu=False):
-    """Converte múltiplos arquivos simultaneamente"""
-    if max_workers is None:
-        max_workers = get_optimal_workers()
+def convert_file(input_file, process_id=1, to_mp3=False, to_ac3=False, use_gpu=False,
+                 progress_queue=None, job_id=None, profile=None, threads=None,
+                 metrics_path=None, submitted_at=None, info=None, stop=None):
+    """Converte um único arquivo
     
-    print(f"🚀 Processando {len(video_files)} arquivos com {max_workers} processos simultâneos")
-    print(f"{'='*60}")
-    print(f"💡 Dica: A barra de progresso mostra o progresso individual de cada arquivo")
+    profile (ver profiles.py) define a saída; sem ele, o perfil padrão é
+    escolhido por to_mp3/to_ac3/use_gpu. Uma lista de perfis gera todas as
+    saídas com um único ffmpeg, decodificando a entrada uma só vez.
+    threads limita as threads do encoder de vídeo. Com metrics_path, uma
+    linha de métricas (ver metrics.py) é gravada a cada tentativa;
+    submitted_at (time.time() da submissão) mede a espera na fila. info é
+    a sondagem, se quem chama já a tem. stop (threading.Event) interrompe
+    o ffmpeg e as novas tentativas quando é acionado (Ctrl+C no pipeline).
     
-    success_files = []
-    failed_files = []
-    start_time = time.time()
+    Falhas são classificadas pelo stderr (ver recovery.py): conforme a
+    categoria, o job é repetido com espera crescente, passa para o próximo
+    encoder da cadeia ou desiste na hora.
+    """
+    if profile is None:
+        profile = profiles.profile_for_flags(to_mp3, to_ac3, use_gpu)
+    filename = os.path.basename(input_file)
+    _log(progress_queue, f"🔄 [P{process_id}] Convertendo: {filename}")
     
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        # Submeter todos os jobs
-        future_to_file = {
-            executor.submit(convert_file, file, i % max_workers + 1, to_mp3, to_ac3, use_gpu): file 
-            for i, file in enumerate(video_files)
-        }
+    started_at = time.time()
+    chain = recovery.fallback_chain(profile)
+    step = 0
+    retries = 0
+    attempt = 0
+    while True:
+        attempt += 1
+        success, job, returncode, stderr_tail, total_time, actual_size, stats = _run_attempt(
+            input_file, chain[step], threads, process_id, progress_queue, job_id, info, stop)
+        category = None if success else recovery.classify(returncode, stderr_tail)
+        if metrics_path:
+            queue_wait = started_at - submitted_at if submitted_at and attempt == 1 else None
+            metrics.append_record(metrics_path, metrics.build_record(
+                job, returncode, stderr_tail, total_time, actual_size, stats, queue_wait, 'process',
+                category, attempt))
+        if success or (stop is not None and stop.is_set()):
+            break
         
-        # Processar resultados conforme completam
-        completed = 0
-        for future in as_completed(future_to_file):
-            completed += 1
-            try:
-                success, filename = future.result()
-                if success:
-                    success_files.append(filename)
-                else:
-                    failed_files.append(filename)
-                
-                # Mostrar progresso
-                print(f"📊 Progresso: {completed}/{len(video_files)} concluídos")
-                
-            except Exception as e:
-                filename = os.path.basename(future_to_file[future])
-                failed_files.append(filename)
-                print(f"❌ Erro no processo: {filename} - {str(e)}")
+        action, delay = recovery.decide(category, retries, step + 1 < len(chain))
+        if action == recovery.FALLBACK:
+            step += 1
+        elif action == recovery.RETRY:
+            retries += 1
+        log_failure(progress_queue, process_id, filename, category, stderr_tail, action, delay, chain[step])
+        if action == recovery.GIVE_UP:
+            break
+        if stop is None:
+            time.sleep(delay)
+        elif stop.wait(delay):
+            break
     
-    elapsed_time = time.time() - start_time
-    return success_files, failed_files, elapsed_time
-def main():
-    print("=" * 60)
-    print("    CONVERSOR PARALELO AVI/MKV/MP4/WAV → MP4/MP3/AC3")
-    print("=" * 60)
+    if progress_queue is not None:
+        progress_queue.put({'type': 'end', 'job': job_id, 'success': success})
+    return success, filename, job['path']
+
+def log_failure(progress_queue, process_id, filename, category, stderr_tail, action, delay=0.0, profile=None):
+    """Motivo da falha e o que será feito (nova tentativa, outro encoder ou desistir)"""
+    detail = recovery.reason(stderr_tail)
+    _log(progress_queue, f"❌ [P{process_id}] Erro: {filename} - {recovery.LABELS[category]}"
+                         + (f": {detail}" if detail else ""))
+    if action == recovery.FALLBACK:
+        codecs = ', '.join(t['video_codec'] for t in profiles.as_list(profile) if t.get('video_codec'))
+        _log(progress_queue, f"↪️  [P{process_id}] Tentando de novo com {codecs}: {filename}")
+    elif action == recovery.RETRY:
+        _log(progress_queue, f"🔁 [P{process_id}] Nova tentativa em {format_time(delay)}: {filename}")
+
+def _log(progress_queue, message):
+    """Imprime a mensagem, ou a envia ao painel quando ele estiver ativo"""
+    if progress_queue is not None:
+        progress_queue.put({'type': 'log', 'message': message})
+    else:
+        print(message)
+
+def parse_progress_block(fields):
+    """Converte um bloco de -progress (chave=valor) em segundos, velocidade e fps"""
+    out_time = fields.get('out_time', '')
+    position = parse_time(out_time) if out_time and out_time != 'N/A' else None
     
-    # Verificar FFmpeg
-    if not check_ffmpeg():
-        print("❌ FFmpeg não encontrado!")
-        print("   Instale o FFmpeg: https://ffmpeg.org/download.html")
-        input("\nPressione Enter para sair...")
-        sys.exit(1)
+    speed = None
+    speed_str = fields.get('speed', '').rstrip('x').strip()
+    if speed_str and speed_str != 'N/A':
+        try:
+            speed = float(speed_str)
+        except ValueError:
+            pass
     
-    # Verificar argumentos da linha de comando
-    if len(sys.argv) > 1:
-        # Arquivos passados como argumentos (arrastar e soltar)
-        files = sys.argv[1:]
-    else:
-        # Modo interativo
-        print("\n📁 MODO INTERATIVO")
-        print("Digite os caminhos dos arquivos ou pasta:")
-        print("(ou arraste os arquivos para este programa)")
-        print()
+    fps = None
+    try:
+        fps = float(fields.get('fps', ''))
+    except ValueError:
+        pass
+    
+    return position, speed, fps
+
+def run_ffmpeg(cmd, progress_queue=None, job_id=None, stats=None, stop=None):
+    """Executa o ffmpeg com -progress pipe:1 e repassa o progresso para a fila
+    
+    Retorna (código de saída, últimas linhas do stderr). Se stats (dict)
+    for informado, recebe CPU user/sys e pico de memória do ffmpeg. Se stop
+    (threading.Event) for acionado, o ffmpeg é encerrado.
+    """
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + cmd[1:]
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, errors='replace')
+    
+    # Ler o stderr em paralelo para o ffmpeg nunca travar com o pipe cheio
+    stderr_tail = deque(maxlen=40)
+    stderr_thread = threading.Thread(target=stderr_tail.extend, args=(process.stderr,), daemon=True)
+    stderr_thread.start()
+    
+    finished = threading.Event()
+    if stop is not None:
+        def cancel():
+            while not finished.wait(STOP_POLL):
+                if stop.is_set():
+                    process.terminate()
+                    return
+        threading.Thread(target=cancel, daemon=True).start()
+    
+    fields = {}
+    for line in process.stdout:
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            continue
+        fields[key] = value
+        if key == 'progress':
+            # Fim de um bloco de progresso
+            if progress_queue is not None:
+                position, speed, fps = parse_progress_block(fields)
+                progress_queue.put({'type': 'progress', 'job': job_id, 'time': position,
+                                    'speed': speed, 'fps': fps})
+            fields = {}
+    # Sem saída: o ffmpeg está terminando (e ainda não foi aguardado, então
+    # o terminate() acima nunca atinge outro processo com o mesmo pid)
+    finished.set()
+    
+    if stats is not None and hasattr(os, 'wait4'):
+        # wait4 devolve o uso de recursos só deste filho
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = metrics.exit_code(status)
+        stats.update(metrics.usage_from_rusage(usage))
+    returncode = process.wait()
+    stderr_thread.join()
+    return returncode, ''.join(stderr_tail)
+
+class ProgressDashboard:
+    """Painel ao vivo com percentual, velocidade e fps de cada worker e ETA do lote"""
+    
+    STALL_SECONDS = 30
+    BAR_WIDTH = 20
+    
+    def __init__(self, total_jobs, stream=None, refresh=1.0, durations=None):
+        self.total_jobs = total_jobs
+        self.stream = stream or sys.stdout
+        self.interactive = self.stream.isatty()
+        self.refresh = refresh if self.interactive else 10.0
+        self.jobs = {}          # job -> estado do arquivo em conversão
+        self.durations = []     # durações conhecidas (para estimar os pendentes)
+        self.planned = dict(enumerate(durations)) if durations else {}  # job -> duração sondada
+        self.slots = {}         # pid do worker -> número exibido
+        self.completed = 0
+        self.lines_drawn = 0
+        self.last_render = 0.0
+        if os.name == 'nt':
+            os.system('')  # Habilita sequências ANSI no console do Windows
+    
+    def handle(self, event):
+        kind = event['type']
+        now = time.time()
+        if kind == 'log':
+            self.log(event['message'])
+        elif kind == 'start':
+            slot = self.slots.setdefault(event['pid'], len(self.slots) + 1)
+            self.jobs[event['job']] = {
+                'filename': event['filename'], 'slot': slot, 'duration': event['duration'],
+                'time': 0.0, 'speed': None, 'fps': None, 'updated': now,
+            }
+            if event['duration'] and not self.planned:
+                self.durations.append(event['duration'])
+            self.planned.pop(event['job'], None)
+        elif kind == 'progress':
+            job = self.jobs.get(event['job'])
+            if job is not None:
+                if event['time'] is not None:
+                    job['time'] = event['time']
+                job['speed'] = event['speed']
+                job['fps'] = event['fps']
+                job['updated'] = now
+        elif kind == 'end':
+            self.jobs.pop(event['job'], None)
+            # Jobs recusados pelo controle de admissão terminam sem 'start'
+            self.planned.pop(event['job'], None)
+            self.completed += 1
+    
+    def log(self, message):
+        """Imprime uma linha acima do painel"""
+        self._clear()
+        print(message, file=self.stream)
+        if self.interactive:
+            self.last_render = 0.0  # Redesenhar o painel logo abaixo da mensagem
+    
+    def eta(self):
+        """Estima o tempo restante do lote a partir da velocidade agregada"""
+        now = time.time()
+        remaining = 0.0
+        total_speed = 0.0
+        for job in self.jobs.values():
+            if job['duration']:
+                remaining += max(job['duration'] - job['time'], 0.0)
+            if job['speed'] and now - job['updated'] < self.STALL_SECONDS:
+                total_speed += job['speed']
         
-        files = []
+        # Jobs ainda não iniciados: duração sondada ou média das conhecidas
+        known = [d for d in self.planned.values() if d]
+        remaining += sum(known)
+        pending = self.total_jobs - self.completed - len(self.jobs) - len(known)
+        samples = self.durations or known
+        if pending > 0 and samples:
+            remaining += pending * sum(samples) / len(samples)
+        
+        if total_speed <= 0:
+            return -1
+        return remaining / total_speed
+    
+    def _clear(self):
+        if self.interactive and self.lines_drawn:
+            self.stream.write(f"\x1b[{self.lines_drawn}F\x1b[J")
+            self.lines_drawn = 0
+    
+    def render(self, force=False):
+        now = time.time()
+        if not force and now - self.last_render < self.refresh:
+            return
+        self.last_render = now
+        
+        lines = []
+        for job in sorted(self.jobs.values(), key=lambda j: j['slot']):
+            if job['duration']:
+                percent = min(job['time'] / job['duration'], 1.0)
+                filled = int(percent * self.BAR_WIDTH)
+                bar = f"[{'█' * filled}{'░' * (self.BAR_WIDTH - filled)}] {percent * 100:5.1f}%"
+            else:
+                bar = f"[{format_time(job['time']):^{self.BAR_WIDTH}}]   ?  %"
+            speed = f"{job['speed']:.2f}x" if job['speed'] is not None else "  ?  "
+            fps = f"{job['fps']:.1f} fps" if job['fps'] is not None else "? fps"
+            line = f"  P{job['slot']} {bar} | {speed} | {fps} | {job['filename']}"
+            stalled = now - job['updated']
+            if stalled >= self.STALL_SECONDS:
+                line += f" | ⚠️  sem progresso há {format_time(stalled)}"
+            lines.append(line)
+        lines.append(f"📊 Progresso: {self.completed}/{self.total_jobs} concluídos | ETA do lote: {format_time(self.eta())}")
+        
+        self._clear()
+        self.stream.write('\n'.join(lines) + '\n')
+        self.stream.flush()
+        if self.interactive:
+            self.lines_drawn = len(lines)
+    
+    def run(self, progress_queue):
+        """Consome eventos da fila até receber None"""
+        import queue
         while True:
-            path = input("Arquivo/Pasta (ou 'fim' para começar): ").strip().strip('"\'')
-            
-            if path.lower() == 'fim':
+            try:
+                event = progress_queue.get(timeout=self.refresh)
+            except queue.Empty:
+                self.render()
+                continue
+            if event is None:
                 break
+            self.handle(event)
+            self.render()
+        self.render(force=True)
+
+@contextmanager
+def progress_dashboard(total_jobs, durations=None, enabled=True):
+    """Inicia o painel em uma thread e fornece a fila (None se desativado)
+    
+    A fila vem de um Manager para poder ser enviada aos processos do pool.
+    """
+    if not enabled:
+        yield None
+        return
+    import multiprocessing
+    manager = multiprocessing.Manager()
+    progress_queue = manager.Queue()
+    dashboard = ProgressDashboard(total_jobs, durations=durations)
+    dashboard_thread = threading.Thread(target=dashboard.run, args=(progress_queue,), daemon=True)
+    dashboard_thread.start()
+    try:
+        yield progress_queue
+    finally:
+        progress_queue.put(None)
+        dashboard_thread.join()
+        manager.shutdown()
+
+def get_optimal_workers(profile=None):
+    """Calcula número ideal de processos simultâneos para o tipo de job"""
+    # Vídeo divide as CPUs entre processos; áudio e remux rodam um por CPU
+    if profile is None:
+        profile = profiles.profile_for_flags()
+    kinds = {tuning.job_type(target) for target in profiles.as_list(profile)}
+    workers, threads = tuning.recommend(tuning.heaviest(kinds))
+    return workers
+
+def plan_batch(video_files, profile, max_workers=None, schedule=True):
+    """Sonda, escolhe processos/threads e ordena um lote (comum aos motores)
+    
+    Retorna um dict com 'files' (na ordem de execução), 'durations',
+    'max_workers', 'threads', 'kind' e 'predicted_makespan'.
+    """
+    targets = profiles.as_list(profile)
+    
+    # Sondar os arquivos (duração, resolução e codecs) para o escalonador
+    # e para escolher processos/threads conforme o tipo real dos jobs
+    infos = None
+    plans = None
+    if schedule and len(video_files) > 1:
+        print(f"🔎 Analisando {len(video_files)} arquivos (duração e resolução)...")
+        infos = probe_files(video_files)
+        plans = [[planner.plan_conversion(info, target) for target in targets] for info in infos]
+    
+    if plans:
+        kinds = {tuning.job_type(target, plan)
+                 for file_plans in plans for target, plan in zip(targets, file_plans)}
+    else:
+        kinds = {tuning.job_type(target) for target in targets}
+    # Em lotes mistos vale o tipo mais pesado
+    kind = tuning.heaviest(kinds)
+    if max_workers is None:
+        max_workers, threads = tuning.recommend(kind)
+    else:
+        threads = tuning.threads_for(max_workers, kind)
+    
+    # Ordenar os jobs pelo custo estimado (maior primeiro) para não deixar
+    # um arquivo longo começando por último com os outros workers ociosos
+    durations = None
+    predicted_makespan = None
+    if infos is not None:
+        costs = [sum(scheduler.estimate_cost(info, target, plan) for target, plan in zip(targets, file_plans))
+                 for info, file_plans in zip(infos, plans)]
+        order, predicted_makespan = scheduler.schedule_longest_first(costs, max_workers)
+        video_files = [video_files[i] for i in order]
+        durations = [infos[i]['duration'] if infos[i] else None for i in order]
+    
+    return {
+        'files': video_files,
+        'durations': durations,
+        'max_workers': max_workers,
+        'threads': threads,
+        'kind': kind,
+        'predicted_makespan': predicted_makespan,
+    }
+
+def apply_verification(verifier, success_files, failed_files, batch_manifest=None):
+    """Espera as verificações (ver verify.py) e move os reprovados para as falhas
+    
+    success_files e failed_files são listas de caminhos de entrada (não de
+    nomes: arquivos de pastas diferentes podem ter o mesmo nome). Retorna
+    {entrada: resultado}, para print_batch_summary.
+    """
+    results = verifier.results()
+    for input_file, result in results.items():
+        if result['ok']:
+            continue
+        if input_file in success_files:
+            success_files.remove(input_file)
+            failed_files.append(input_file)
+        if batch_manifest is not None:
+            batch_manifest.record('failed', input_file, error="verificação: " + '; '.join(result['problems']))
+    return results
+
+def display_names(files):
+    """Nome de cada arquivo para as mensagens; o caminho inteiro quando o nome se repete"""
+    counts = Counter(os.path.basename(f) for f in files)
+    return {f: os.path.basename(f) if counts[os.path.basename(f)] == 1 else f for f in files}
+
+def print_batch_summary(conversion_paths, predicted_makespan, elapsed_time, verification=None):
+    """Caminho escolhido para cada arquivo, verificação das saídas e makespan previsto x real
+    
+    conversion_paths e verification são indexados pelo caminho de entrada.
+    """
+    names = display_names(set(conversion_paths) | set(verification or ()))
+    if conversion_paths:
+        print(f"\n🧭 Caminho de conversão por arquivo:")
+        for input_file, conversion_path in conversion_paths.items():
+            print(f"   • {names[input_file]}: {planner.describe_path(conversion_path)}")
+    
+    if verification:
+        rejected = {f: r for f, r in verification.items() if not r['ok']}
+        seconds = sum(r['seconds'] for r in verification.values())
+        print(f"\n🔍 Verificação: {len(verification) - len(rejected)} ok, {len(rejected)} com problemas "
+              f"({format_time(seconds)} de verificação)")
+        for input_file, result in rejected.items():
+            for problem in result['problems']:
+                print(f"   • {names[input_file]}: {problem}")
+    
+    if predicted_makespan:
+        # Comparação para calibrar o modelo de custo do escalonador
+        print(f"⏱️  Makespan previsto: {format_time(predicted_makespan)} | real: {format_time(elapsed_time)} "
+              f"(real/previsto = {elapsed_time / predicted_makespan:.2f})")
+
+def convert_files_parallel(video_files, max_workers=None, to_mp3=False, to_ac3=False, use_gpu=False,
+                           show_progress=True, schedule=True, batch_manifest=None, profile=None,
+                           metrics_path=None, admission_control=None, verifier=None):
+    """Converte múltiplos arquivos simultaneamente
+    
+    profile (ver profiles.py) substitui to_mp3/to_ac3/use_gpu quando informado;
+    uma lista de perfis gera todas as saídas de cada arquivo numa única
+    decodificação.
+    
+    Se batch_manifest (manifest.BatchManifest) for informado, cada job é
+    registrado no diário ao ser submetido e ao terminar, para --resume.
+    metrics_path recebe uma linha de métricas por job (ver metrics.py).
+    admission_control (admission.AdmissionController) retém jobs que não
+    caberiam na memória ou no disco e falha na hora os que não cabem nem
+    sozinhos; sem ele, os limites padrão da máquina são usados.
+    verifier (verify.Verifier) confere as saídas de cada job concluído
+    enquanto o lote continua; os reprovados passam a contar como falhas.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    
+    if profile is None:
+        profile = profiles.profile_for_flags(to_mp3, to_ac3, use_gpu)
+    # Encoders que este ffmpeg não tem são trocados uma vez, antes do lote
+    profile = recovery.resolve_encoders(profile)
+    controller = admission_control or admission.AdmissionController()
+    batch = plan_batch(video_files, profile, max_workers, schedule)
+    video_files = batch['files']
+    max_workers = batch['max_workers']
+    threads = batch['threads']
+    kind = batch['kind']
+    durations = batch['durations']
+    predicted_makespan = batch['predicted_makespan']
+    
+    print(f"🚀 Processando {len(video_files)} arquivos com {max_workers} processos simultâneos"
+          + (f" ({threads} threads cada)" if kind == tuning.JOB_VIDEO else ""))
+    print(f"{'='*60}")
+    if show_progress:
+        print(f"💡 Dica: A barra de progresso mostra o progresso individual de cada arquivo")
+    
+    success_files = []
+    failed_files = []
+    conversion_paths = {}
+    start_time = time.time()
+    
+    # Fila compartilhada entre os workers e o painel de progresso
+    with progress_dashboard(len(video_files), durations, show_progress) as progress_queue:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            future_to_file = {}
+            pending = deque(enumerate(video_files))
+            completed = 0
             
-            # Remover barras invertidas de escape (quando copia do terminal)
-            path = path.replace('\\', '')
+            def record_result(file, success, conversion_path, error=None):
+                nonlocal completed
+                completed += 1
+                if conversion_path:
+                    conversion_paths[file] = conversion_path
+                (success_files if success else failed_files).append(file)
+                if batch_manifest is not None:
+                    batch_manifest.record('done' if success else 'failed', file,
+                                          **({'error': error} if error else {}))
+                if success and verifier is not None:
+                    verifier.submit(file, job_outputs(file, profile))
+                # Mostrar progresso (o painel já exibe a contagem)
+                if not show_progress:
+                    print(f"📊 Progresso: {completed}/{len(video_files)} concluídos")
             
-            if os.path.isfile(path):
-                files.append(path)
-                print(f"✅ Adicionado: {os.path.basename(path)}")
-            elif os.path.isdir(path):
-                # Buscar arquivos AVI, MKV, MP4, WAV e AC3 na pasta
-                for ext in ['*.avi', '*.mkv', '*.mp4', '*.wav', '*.ac3']:
-                    found = list(Path(path).glob(ext))
-                    files.extend([str(f) for f in found])
-                print(f"✅ Pasta adicionada: {len(list(Path(path).glob('*.avi')) + list(Path(path).glob('*.mkv')) + list(Path(path).glob('*.mp4')) + list(Path(path).glob('*.wav')) + list(Path(path).glob('*.ac3')))} arquivos")
-            else:
-                print(f"❌ Não encontrado: {path}")
-    
-    # Filtrar apenas arquivos AVI, MKV, MP4, WAV e AC3
-    media_files = [f for f in files if f.lower().endswith(('.avi', '.mkv', '.mp4', '.wav', '.ac3')) and os.path.isfile(f)]
+            while pending or future_to_file:
+                # Submeter os próximos jobs enquanto couberem na memória e no disco
+                while pending and len(future_to_file) < max_workers:
+                    i, file = pending[0]
+                    filename = os.path.basename(file)
+                    estimate = admission.estimate_job(file, profile, job_outputs(file, profile))
+                    reason = controller.check(estimate)
+                    if reason:
+                        pending.popleft()
+                        _log(progress_queue, f"❌ Não iniciado: {filename} - {reason}")
+                        if progress_queue is not None:
+                            progress_queue.put({'type': 'end', 'job': i, 'success': False})
+                        record_result(file, False, None, reason)
+                        continue
+                    if not controller.try_admit(estimate):
+                        break
+                    pending.popleft()
+                    if batch_manifest is not None:
+                        batch_manifest.record('start', file)
+                    future = executor.submit(convert_file, file, i % max_workers + 1, to_mp3, to_ac3, use_gpu,
+                                             progress_queue, i, profile, threads, metrics_path, time.time())
+                    future_to_file[future] = (file, estimate)
+                if not future_to_file:
+                    continue
+                
+                # Processar resultados conforme completam (reavaliando os
+                # jobs retidos de tempos em tempos: o espaço livre muda)
+                done, _ = wait(future_to_file, timeout=admission.ADMISSION_POLL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file, estimate = future_to_file.pop(future)
+                    controller.release(estimate)
+                    try:
+                        success, _, conversion_path = future.result()
+                        record_result(file, success, conversion_path)
+                    except Exception as e:
+                        filename = os.path.basename(file)
+                        record_result(file, False, None, str(e))
+                        _log(progress_queue, f"❌ Erro no processo: {filename} - {str(e)}")
     
-    if not media_files:
-        print("❌ Nenhum arquivo AVI, MKV, MP4, WAV ou AC3 encontrado!")
-        input("\nPressione Enter para sair...")
-        sys.exit(1)
+    verification = None
+    if verifier is not None:
+        verification = apply_verification(verifier, success_files, failed_files, batch_manifest)
+    elapsed_time = time.time() - start_time
     
-    print(f"\n🎬 Encontrados {len(media_files)} arquivos para converter:")
-    for i, file in enumerate(media_files, 1):
-        print(f"  {i}. {os.path.basename(file)}")
+    # Caminho escolhido pelo planner para cada arquivo
+    print_batch_summary(conversion_paths, predicted_makespan, elapsed_time, verification)
     
-    # Configurar número de processos
+    return success_files, failed_files, elapsed_time
+
+def ask_options(media_files):
+    """Pergunta processos, formato e GPU; retorna (max_workers, to_mp3, to_ac3, use_gpu)"""
+    # Configurar número de processos (até 2 por CPU; o padrão depende do hardware)
+    import multiprocessing
     optimal_workers = get_optimal_workers()
+    max_allowed = max(8, multiprocessing.cpu_count() * 2)
     print(f"\n⚙️  Configuração:")
     print(f"   • CPUs detectadas: {multiprocessing.cpu_count()}")
     print(f"   • Processos recomendados: {optimal_workers}")
@@ -314,12 +855,12 @@ def main():
     
     if worker_choice.lower() == 'n':
         try:
-            max_workers = int(input("Quantos processos simultâneos? (1-8): "))
-            max_workers = max(1, min(8, max_workers))
+            max_workers = int(input(f"Quantos processos simultâneos? (1-{max_allowed}): "))
+            max_workers = max(1, min(max_allowed, max_workers))
         except ValueError:
             max_workers = optimal_workers
     elif worker_choice.isdigit():
-        max_workers = max(1, min(8, int(worker_choice)))
+        max_workers = max(1, min(max_allowed, int(worker_choice)))
     else:
         max_workers = optimal_workers
     
@@ -377,12 +918,132 @@ def main():
         print("❌ Conversão cancelada")
         sys.exit(0)
     
+    return max_workers, to_mp3, to_ac3, use_gpu
+
+def main():
+    # Sem subcomando, o assistente interativo abaixo é usado
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+    
+    print("=" * 60)
+    print("    CONVERSOR PARALELO AVI/MKV/MP4/WAV → MP4/MP3/AC3")
+    print("=" * 60)
+    
+    # Verificar FFmpeg
+    if not check_ffmpeg():
+        print("❌ FFmpeg não encontrado!")
+        print("   Instale o FFmpeg: https://ffmpeg.org/download.html")
+        input("\nPressione Enter para sair...")
+        sys.exit(1)
+    
+    # Opções de lote: --incremental pula saídas atualizadas,
+    # --resume continua o último lote a partir do manifesto
+    args = sys.argv[1:]
+    manifest_path = None
+    if '--manifest' in args:
+        index = args.index('--manifest')
+        manifest_path = args[index + 1] if index + 1 < len(args) else None
+        del args[index:index + 2]
+    incremental = '--incremental' in args
+    resume = '--resume' in args
+    args = [a for a in args if a not in ('--incremental', '--resume')]
+    
+    batch_manifest = manifest.BatchManifest(manifest_path)
+    resumed = resume and batch_manifest.load() and bool(batch_manifest.files)
+    if resume and not resumed:
+        print("❌ Nenhum lote anterior encontrado para continuar")
+        input("\nPressione Enter para sair...")
+        sys.exit(1)
+    
+    # Verificar argumentos da linha de comando
+    if resumed:
+        files = batch_manifest.files
+        print(f"\n♻️  Continuando lote anterior: {len(batch_manifest.pending())}/{len(files)} arquivos pendentes")
+    elif args:
+        # Arquivos passados como argumentos (arrastar e soltar)
+        files = args
+    else:
+        # Modo interativo
+        print("\n📁 MODO INTERATIVO")
+        print("Digite os caminhos dos arquivos ou pasta:")
+        print("(ou arraste os arquivos para este programa)")
+        print()
+        
+        files = []
+        while True:
+            path = input("Arquivo/Pasta (ou 'fim' para começar): ").strip().strip('"\'')
+            
+            if path.lower() == 'fim':
+                break
+            
+            # Remover barras invertidas de escape (quando copia do terminal)
+            path = path.replace('\\', '')
+            
+            if os.path.isfile(path):
+                files.append(path)
+                print(f"✅ Adicionado: {os.path.basename(path)}")
+            elif os.path.isdir(path):
+                # Buscar arquivos AVI, MKV, MP4, WAV e AC3 na pasta
+                found = find_media_files(path)
+                files.extend(found)
+                print(f"✅ Pasta adicionada: {len(found)} arquivos")
+            else:
+                print(f"❌ Não encontrado: {path}")
+    
+    # Filtrar apenas arquivos AVI, MKV, MP4, WAV e AC3
+    media_files = collect_media_files(files)
+    
+    if not media_files:
+        print("❌ Nenhum arquivo AVI, MKV, MP4, WAV ou AC3 encontrado!")
+        input("\nPressione Enter para sair...")
+        sys.exit(1)
+    
+    # Cópias idênticas em outras pastas: converter uma vez e ligar as saídas
+    media_files, duplicates = scanner.find_duplicates(media_files)
+    if duplicates:
+        copies = sum(len(c) for c in duplicates.values())
+        print(f"\n🔗 {copies} cópias idênticas serão ligadas à conversão do original")
+    
+    print(f"\n🎬 Encontrados {len(media_files)} arquivos para converter:")
+    for i, file in enumerate(media_files, 1):
+        print(f"  {i}. {os.path.basename(file)}")
+    
+    # Arquivos e opções: do manifesto (--resume) ou perguntados ao usuário
+    if resumed:
+        max_workers = batch_manifest.options.get('max_workers') or get_optimal_workers()
+        profile = batch_manifest.options['profile']
+    else:
+        max_workers, to_mp3, to_ac3, use_gpu = ask_options(media_files)
+        profile = profiles.profile_for_flags(to_mp3, to_ac3, use_gpu)
+    
+    # Pular arquivos já concluídos neste lote ou com saída atualizada
+    if incremental or resumed:
+        done = {f for f, state in batch_manifest.state.items() if state == 'done'} if resumed else ()
+        # O perfil do manifesto pode ser uma lista (lote multi-saída da CLI)
+        formats = [target['format'] for target in profiles.as_list(profile)]
+        media_files, skipped = filter_pending(media_files, formats, done)
+        if skipped:
+            print(f"\n⏭️  {len(skipped)} arquivos já convertidos foram pulados")
+        if not media_files:
+            print("✅ Nada a fazer: todos os arquivos já estão atualizados")
+            input("\nPressione Enter para sair...")
+            sys.exit(0)
+    if not resumed:
+        # As cópias idênticas ficam no lote para serem ligadas de novo no --resume
+        batch_manifest.start_batch(media_files + [c for group in duplicates.values() for c in group],
+                                   {'max_workers': max_workers, 'profile': profile})
+    
     # Converter arquivos em paralelo
     print(f"\n{'='*60}")
     print("🔄 INICIANDO CONVERSÕES PARALELAS")
     print(f"{'='*60}")
     
-    success_files, failed_files, elapsed_time = convert_files_parallel(media_files, max_workers, to_mp3, to_ac3, use_gpu)
+    success_files, failed_files, elapsed_time = convert_files_parallel(
+        media_files, max_workers, batch_manifest=batch_manifest, profile=profile)
+    batch_manifest.close()
+    if duplicates:
+        print(f"🔗 {link_duplicate_outputs(duplicates, profile)} saídas ligadas às cópias idênticas")
     
     # Resultado final
     print(f"\n{'='*60}")
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""Modo distribuído: um coordenador e workers em várias máquinas com armazenamento compartilhado
+
+O coordenador guarda a lista de jobs e responde, em JSON sobre HTTP, aos
+workers: /claim entrega o próximo arquivo com um lease (prazo), /heartbeat
+renova o lease enquanto o ffmpeg roda e /result registra o resultado. Um
+job cujo lease vence (worker travado, desligado ou sem rede) volta para a
+fila e é entregue a outro worker. O worker cancela o próprio ffmpeg quando
+o lease não é confirmado até um prazo local (que não depende das
+requisições HTTP, que podem ficar presas), antes de ele vencer no
+coordenador. Cada entrega grava em temporários com o nome do worker e o
+número da tentativa, então um worker atrasado nunca grava nem apaga o
+temporário de quem recebeu o job depois dele. Os caminhos precisam ser os
+mesmos em todas as máquinas (ex.: o NAS montado em /mnt/acervo em todas elas).
+"""
+import asyncio
+import glob
+import json
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import admission
+import asyncengine
+import convertermoreperformace as core
+import recovery
+import tuning
+
+DEFAULT_PORT = 8765
+DEFAULT_LEASE_SECONDS = 30.0
+DEFAULT_MAX_ATTEMPTS = 3
+# O worker renova o lease três vezes por prazo e desiste antes de ele vencer
+HEARTBEAT_FRACTION = 1 / 3
+SELF_CANCEL_FRACTION = 0.9
+# Intervalo do prazo local (ver _watchdog)
+WATCHDOG_SECONDS = 0.5
+POLL_SECONDS = 2.0
+# Depois do último job, o coordenador ainda responde "fim" aos workers por um tempo
+LINGER_SECONDS = 2 * POLL_SECONDS
+REQUEST_TIMEOUT = 10.0
+
+STATE_PENDING = 'pending'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+class Coordinator:
+    """Jobs do lote, leases e resultados (em memória, protegidos por um lock)"""
+
+    def __init__(self, files, profile, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 batch_manifest=None):
+        self.profile = profile
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.batch_manifest = batch_manifest
+        self.jobs = [{'id': i, 'path': os.path.abspath(f), 'state': STATE_PENDING, 'worker': None,
+                      'lease_until': 0.0, 'attempts': 0, 'error': None, 'conversion_path': None}
+                     for i, f in enumerate(files)]
+        self.workers = {}
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def _expire_leases(self, now):
+        for job in self.jobs:
+            if job['state'] == STATE_RUNNING and job['lease_until'] < now:
+                filename = os.path.basename(job['path'])
+                if job['attempts'] >= self.max_attempts:
+                    job['state'] = STATE_FAILED
+                    job['error'] = f"lease vencido em {job['worker']} após {job['attempts']} tentativas"
+                    print(f"❌ {filename}: {job['error']}")
+                    self._record(job)
+                else:
+                    job['state'] = STATE_PENDING
+                    print(f"♻️  {filename}: {job['worker']} parou de responder; job volta para a fila")
+                job['worker'] = None
+        self._check_finished(now)
+
+    def _check_finished(self, now):
+        if self.finished_at is None and all(j['state'] in (STATE_DONE, STATE_FAILED) for j in self.jobs):
+            self.finished_at = now
+
+    def _record(self, job):
+        if self.batch_manifest is not None:
+            extra = {'error': job['error']} if job['error'] else {}
+            self.batch_manifest.record(job['state'], job['path'], **extra)
+
+    def claim(self, worker):
+        """Próximo job pendente para o worker, ou None; 'done' indica o fim do lote"""
+        now = time.time()
+        with self._lock:
+            self.workers[worker] = now
+            self._expire_leases(now)
+            for job in self.jobs:
+                if job['state'] == STATE_PENDING:
+                    job.update(state=STATE_RUNNING, worker=worker, lease_until=now + self.lease_seconds)
+                    job['attempts'] += 1
+                    if self.batch_manifest is not None:
+                        self.batch_manifest.record('start', job['path'])
+                    print(f"📤 {os.path.basename(job['path'])} → {worker}")
+                    return {'job': {'id': job['id'], 'path': job['path'], 'profile': self.profile,
+                                    'attempt': job['attempts']},
+                            'lease_seconds': self.lease_seconds, 'done': False}
+            return {'job': None, 'lease_seconds': self.lease_seconds, 'done': self.finished_at is not None}
+
+    def heartbeat(self, worker, job_ids):
+        """Renova os leases do worker; retorna os ids que ele ainda detém"""
+        now = time.time()
+        with self._lock:
+            self.workers[worker] = now
+            owned = []
+            for job_id in job_ids:
+                job = self.jobs[job_id] if 0 <= job_id < len(self.jobs) else None
+                if job is not None and job['state'] == STATE_RUNNING and job['worker'] == worker:
+                    job['lease_until'] = now + self.lease_seconds
+                    owned.append(job_id)
+            return {'owned': owned}
+
+    def result(self, worker, job_id, success, conversion_path=None, error=None):
+        """Resultado de um job; ignorado se o lease já foi passado a outro worker"""
+        with self._lock:
+            self.workers[worker] = time.time()
+            job = self.jobs[job_id] if 0 <= job_id < len(self.jobs) else None
+            if job is None or job['state'] != STATE_RUNNING or job['worker'] != worker:
+                return {'accepted': False}
+            job.update(state=STATE_DONE if success else STATE_FAILED, worker=worker,
+                       conversion_path=conversion_path, error=None if success else error)
+            self._record(job)
+            finished = sum(1 for j in self.jobs if j['state'] in (STATE_DONE, STATE_FAILED))
+            print(f"{'✅' if success else '❌'} {os.path.basename(job['path'])} ({worker}) | "
+                  f"📊 Progresso: {finished}/{len(self.jobs)} concluídos")
+            self._check_finished(time.time())
+            return {'accepted': True}
+
+    def status(self):
+        with self._lock:
+            self._expire_leases(time.time())
+            counts = {}
+            for job in self.jobs:
+                counts[job['state']] = counts.get(job['state'], 0) + 1
+            return {'jobs': counts, 'workers': sorted(self.workers), 'done': self.finished_at is not None}
+
+def serve(coordinator, host='127.0.0.1', port=DEFAULT_PORT):
+    """Inicia o servidor HTTP do coordenador em uma thread; retorna o servidor"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, payload, status=200):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/status':
+                self.send_error(404)
+                return
+            self._reply(coordinator.status())
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length) or b'{}')
+                worker = str(request['worker'])
+                route = self.path.split('?')[0]
+                if route == '/claim':
+                    self._reply(coordinator.claim(worker))
+                elif route == '/heartbeat':
+                    self._reply(coordinator.heartbeat(worker, [int(i) for i in request.get('jobs', [])]))
+                elif route == '/result':
+                    self._reply(coordinator.result(worker, int(request['job']), bool(request['success']),
+                                                   request.get('conversion_path'), request.get('error')))
+                else:
+                    self.send_error(404)
+            except (ValueError, KeyError, TypeError) as e:
+                self._reply({'error': str(e)}, 400)
+
+        def log_message(self, format, *args):
+            pass    # Sem log de cada requisição no terminal
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_coordinator(files, profile, host='127.0.0.1', port=DEFAULT_PORT, lease_seconds=DEFAULT_LEASE_SECONDS,
+                    max_attempts=DEFAULT_MAX_ATTEMPTS, batch_manifest=None):
+    """Distribui o lote aos workers e espera todos os jobs terminarem
+
+    Retorna (sucessos, falhas, tempo total), como core.convert_files_parallel.
+    """
+    # Mesma ordem do motor local: os jobs mais caros saem primeiro
+    files = core.plan_batch(files, profile)['files']
+    coordinator = Coordinator(files, profile, lease_seconds, max_attempts, batch_manifest)
+    server = serve(coordinator, host, port)
+    address = f"http://{socket.gethostname() if host in ('0.0.0.0', '') else host}:{server.server_address[1]}"
+    print(f"🛰️  Coordenador em {address} com {len(files)} arquivos (lease de {lease_seconds:g}s)")
+    print(f"   Inicie os workers com: python convertermoreperformace.py worker {address}")
+    print(f"{'='*60}")
+
+    start_time = time.time()
+    try:
+        while True:
+            time.sleep(POLL_SECONDS / 2)
+            status = coordinator.status()
+            if status['done'] and time.time() - coordinator.finished_at >= LINGER_SECONDS:
+                break
+    finally:
+        server.shutdown()
+        server.server_close()
+    elapsed_time = time.time() - start_time
+
+    success_files = []
+    failed_files = []
+    conversion_paths = {}
+    for job in coordinator.jobs:
+        (success_files if job['state'] == STATE_DONE else failed_files).append(job['path'])
+        if job['conversion_path']:
+            conversion_paths[job['path']] = job['conversion_path']
+    core.print_batch_summary(conversion_paths, None, elapsed_time)
+    return success_files, failed_files, elapsed_time
+
+def _post(url, route, payload, timeout=REQUEST_TIMEOUT):
+    request = urllib.request.Request(url.rstrip('/') + route, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def partial_tag(worker, attempt):
+    """Marca dos temporários de uma entrega (worker + tentativa), segura para nomes de arquivo"""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', f"{worker}-{attempt}")
+
+def remove_stale_partials(path, profile):
+    """Apaga temporários de entregas anteriores do job (workers que caíram no meio)
+
+    Chamado depois que o job foi publicado: os donos desses temporários
+    perderam o lease há tempo e já pararam (ou foram desligados).
+    """
+    for final_file in core.job_artifacts(path, profile):
+        directory, name = os.path.split(final_file)
+        stem, ext = os.path.splitext(name)
+        pattern = os.path.join(glob.escape(directory), f".{glob.escape(stem)}.*.partial{glob.escape(ext)}")
+        own = re.compile(rf"\.{re.escape(stem)}\.[A-Za-z0-9_-]+-\d+\.partial{re.escape(ext)}")
+        for stale in glob.glob(pattern):
+            if not own.fullmatch(os.path.basename(stale)):
+                continue    # Temporário de outro arquivo (ex.: 'a.b.mp4' para 'a.mp4')
+            if os.path.isdir(stale):
+                shutil.rmtree(stale, ignore_errors=True)
+            else:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+async def _heartbeats(url, worker, running, last_ack, lease):
+    """Renova os leases; cancela os jobs que o coordenador já não reconhece"""
+    while True:
+        await asyncio.sleep(lease * HEARTBEAT_FRACTION)
+        sent = [job_id for job_id, task in running.items() if not task.done()]
+        if not sent:
+            continue
+        now = time.time()
+        try:
+            reply = await asyncengine.in_thread(_post, url, '/heartbeat', {'worker': worker, 'jobs': sent},
+                                                min(REQUEST_TIMEOUT, lease * HEARTBEAT_FRACTION))
+            owned = set(reply['owned'])
+        except (OSError, ValueError, KeyError):
+            continue    # Sem resposta: o prazo local segue contando (ver _watchdog)
+        for job_id in sent:
+            task = running.get(job_id)
+            if task is None or task.done():
+                continue
+            if job_id in owned:
+                # Vale a hora do envio: o coordenador renovou depois dela
+                last_ack[job_id] = max(last_ack[job_id], now)
+            else:
+                print(f"⚠️  Lease perdido: cancelando o job {job_id}")
+                task.cancel()
+
+async def _watchdog(running, last_ack, lease):
+    """Prazo local: cancela o job cujo lease não foi confirmado a tempo
+
+    Roda separado dos heartbeats, cuja requisição pode ficar presa até o
+    timeout; assim o ffmpeg para antes de o lease vencer no coordenador,
+    mesmo com a rede caída.
+    """
+    while True:
+        await asyncio.sleep(WATCHDOG_SECONDS)
+        now = time.time()
+        for job_id, task in list(running.items()):
+            if not task.done() and now - last_ack[job_id] > lease * SELF_CANCEL_FRACTION:
+                print(f"⚠️  Lease sem confirmação: cancelando o job {job_id}")
+                task.cancel()
+
+async def _worker_loop(url, worker, slots, threads, timeout, metrics_path, controller):
+    semaphore = asyncio.Semaphore(slots)
+    free_slots = list(range(1, slots + 1))
+    running = {}
+    last_ack = {}
+    jobs = {}
+    lease = DEFAULT_LEASE_SECONDS
+    heartbeats = None
+    watchdog = None
+    unreachable_since = None
+    try:
+        while True:
+            reply = None
+            if len(running) < slots:
+                # O lease começa a contar no coordenador depois deste instante
+                requested_at = time.time()
+                try:
+                    reply = await asyncengine.in_thread(_post, url, '/claim', {'worker': worker})
+                    unreachable_since = None
+                except (OSError, ValueError) as e:
+                    unreachable_since = unreachable_since or time.time()
+                    if not running and time.time() - unreachable_since > lease:
+                        print(f"🔌 Coordenador inacessível ({e}); encerrando o worker")
+                        return
+                if reply is not None:
+                    lease = reply['lease_seconds']
+                    if heartbeats is None:
+                        heartbeats = asyncio.create_task(_heartbeats(url, worker, running, last_ack, lease))
+                        watchdog = asyncio.create_task(_watchdog(running, last_ack, lease))
+                    job = reply['job']
+                    if job is not None:
+                        # Cada host troca os encoders que o seu ffmpeg não tem
+                        job_profile = recovery.resolve_encoders(job['profile'], log=None)
+                        last_ack[job['id']] = requested_at
+                        jobs[job['id']] = (job['path'], job_profile)
+                        running[job['id']] = asyncio.create_task(asyncengine.convert_job(
+                            job['path'], job['id'], job_profile, threads, semaphore, free_slots,
+                            None, timeout, metrics_path, controller,
+                            partial_tag(worker, job.get('attempt', 1))))
+                        continue
+                    if reply['done'] and not running:
+                        print("🏁 Lote concluído no coordenador")
+                        return
+            if running:
+                await asyncio.wait(running.values(), timeout=POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(POLL_SECONDS)
+            for job_id, task in list(running.items()):
+                if not task.done():
+                    continue
+                del running[job_id]
+                last_ack.pop(job_id, None)
+                path, job_profile = jobs.pop(job_id)
+                if task.cancelled():
+                    continue    # Lease perdido: o coordenador já reatribuiu o job
+                try:
+                    success, _, conversion_path = task.result()
+                    error = None if success else "conversão falhou"
+                except Exception as e:
+                    success, conversion_path, error = False, None, str(e)
+                if success:
+                    remove_stale_partials(path, job_profile)
+                try:
+                    await asyncengine.in_thread(_post, url, '/result', {
+                        'worker': worker, 'job': job_id, 'success': success,
+                        'conversion_path': conversion_path, 'error': error})
+                except (OSError, ValueError) as e:
+                    print(f"⚠️  Resultado do job {job_id} não foi entregue ({e}); o lease vai vencer")
+    finally:
+        if heartbeats is not None:
+            heartbeats.cancel()
+            watchdog.cancel()
+        for task in running.values():
+            task.cancel()
+        await asyncio.gather(*running.values(), return_exceptions=True)
+
+def run_worker(url, slots=None, worker=None, timeout=None, metrics_path=None, admission_control=None):
+    """Pede jobs ao coordenador até o fim do lote (Ctrl+C encerra)
+
+    slots é o número de conversões simultâneas neste host (padrão:
+    automático para vídeo); os jobs interrompidos voltam para a fila quando
+    o lease vence.
+    """
+    worker = worker or default_worker_id()
+    kind = tuning.JOB_VIDEO
+    if slots is None:
+        slots, threads = tuning.recommend(kind)
+    else:
+        threads = tuning.threads_for(slots, kind)
+    print(f"🛠️  Worker {worker} → {url} | {slots} conversões simultâneas ({threads} threads cada)")
+    asyncio.run(_worker_loop(url, worker, slots, threads, timeout, metrics_path,
+                             admission_control or admission.AdmissionController()))
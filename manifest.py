@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Manifesto do lote: diário (JSON Lines) de jobs iniciados, concluídos e com falha
+
+Cada linha é um evento. O primeiro evento ('batch') guarda a lista de
+arquivos e as opções da conversão, permitindo que --resume continue o lote
+exatamente de onde parou: jobs 'done' são pulados, jobs 'failed' ou ainda
+'start' (interrompidos no meio) são refeitos.
+"""
+import json
+import os
+import time
+
+import mediaprobe
+
+DEFAULT_MANIFEST = os.path.join(mediaprobe.default_cache_dir(), 'batch-manifest.jsonl')
+
+class BatchManifest:
+    """Diário append-only de um lote de conversões"""
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_MANIFEST
+        self.files = []
+        self.options = {}
+        self.state = {}     # caminho absoluto da entrada -> 'start' | 'done' | 'failed'
+        self._file = None
+
+    def load(self):
+        """Reconstrói o estado a partir do diário; retorna False se não existir"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # Última linha truncada por uma queda no meio da escrita
+                    continue
+                if event.get('event') == 'batch':
+                    self.files = event['files']
+                    self.options = event.get('options', {})
+                    self.state = {}
+                elif 'input' in event:
+                    self.state[event['input']] = event['event']
+        return True
+
+    def start_batch(self, files, options):
+        """Inicia um novo diário (descartando o anterior)"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.close()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self.files = [os.path.abspath(f) for f in files]
+        self.options = dict(options)
+        self.state = {}
+        self._write({'event': 'batch', 'files': self.files, 'options': self.options})
+
+    def record(self, event, input_file, **extra):
+        """Registra 'start', 'done' ou 'failed' para um arquivo"""
+        input_file = os.path.abspath(input_file)
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self.state[input_file] = event
+        self._write(dict(extra, event=event, input=input_file))
+
+    def pending(self):
+        """Arquivos do lote que ainda não foram concluídos"""
+        return [f for f in self.files if self.state.get(f) != 'done']
+
+    def _write(self, event):
+        event['time'] = time.time()
+        self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def is_up_to_date(input_file, output_file):
+    """A saída existe, não está vazia e é mais nova que a fonte"""
+    try:
+        output_stat = os.stat(output_file)
+        return output_stat.st_size > 0 and output_stat.st_mtime_ns >= os.stat(input_file).st_mtime_ns
+    except OSError:
+        return False
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Sondagem de mídia com ffprobe e cache persistente dos resultados
+
+O cache fica em um banco SQLite no diretório de cache do usuário e é
+indexado por (caminho, tamanho, mtime_ns): qualquer alteração no arquivo
+invalida a entrada. As entradas menos usadas são descartadas (LRU) quando
+o limite é atingido.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 20000
+
+def default_cache_dir():
+    """Diretório de cache do usuário (pode ser trocado com CONVERSOR_CACHE_DIR)"""
+    base = os.environ.get('CONVERSOR_CACHE_DIR')
+    if base:
+        return base
+    if os.name == 'nt':
+        root = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(root, 'conversorpython', 'Cache')
+    if sys.platform == 'darwin':
+        return os.path.expanduser('~/Library/Caches/conversorpython')
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(root, 'conversorpython')
+
+def format_time(seconds):
+    """Formata segundos para string legível"""
+    if seconds < 0:
+        return "calculando..."
+
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+
+    if hours > 0:
+        return f"{hours}h {minutes}m {secs}s"
+    elif minutes > 0:
+        return f"{minutes}m {secs}s"
+    else:
+        return f"{secs}s"
+
+class ProbeCache:
+    """Cache LRU de resultados do ffprobe em SQLite (seguro entre processos)"""
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(default_cache_dir(), 'probe-cache.sqlite3')
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS probes ('
+                ' path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,'
+                ' data TEXT, last_used REAL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS probes_last_used ON probes(last_used)')
+
+    def get(self, path, size, mtime_ns):
+        """Retorna os dados em cache ou None se ausentes/desatualizados"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT data FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?',
+                (path, size, mtime_ns)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE probes SET last_used = ? WHERE path = ?', (time.time(), path))
+        return json.loads(row[0])
+
+    def put(self, path, size, mtime_ns, data):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO probes (path, size, mtime_ns, data, last_used) VALUES (?, ?, ?, ?, ?)',
+                (path, size, mtime_ns, json.dumps(data), time.time())
+            )
+            count = self._conn.execute('SELECT COUNT(*) FROM probes').fetchone()[0]
+            if count > self.max_entries:
+                # Descartar as entradas usadas há mais tempo
+                self._conn.execute(
+                    'DELETE FROM probes WHERE path IN '
+                    '(SELECT path FROM probes ORDER BY last_used ASC LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM probes')
+
+_default_cache = None
+_default_cache_failed = False
+
+def get_cache():
+    """Cache padrão do processo (None se desativado ou indisponível)"""
+    global _default_cache, _default_cache_failed
+    if _default_cache is None and not _default_cache_failed:
+        if os.environ.get('CONVERSOR_PROBE_CACHE', '1') == '0':
+            _default_cache_failed = True
+            return None
+        try:
+            _default_cache = ProbeCache()
+        except (OSError, sqlite3.Error):
+            # Sem cache (ex.: diretório somente leitura), apenas sondar
+            _default_cache_failed = True
+    return _default_cache
+
+def _to_float(value):
+    try:
+        return float(value) if value not in (None, '', 'N/A') else None
+    except (TypeError, ValueError):
+        return None
+
+def _to_int(value):
+    number = _to_float(value)
+    return int(number) if number is not None else None
+
+def summarize(data):
+    """Reduz a saída JSON do ffprobe aos campos usados pelo conversor"""
+    fmt = data.get('format', {})
+    streams = []
+    for stream in data.get('streams', []):
+        streams.append({
+            'index': stream.get('index'),
+            'codec_type': stream.get('codec_type'),
+            'codec_name': stream.get('codec_name'),
+            'profile': stream.get('profile'),
+            'width': _to_int(stream.get('width')),
+            'height': _to_int(stream.get('height')),
+            'pix_fmt': stream.get('pix_fmt'),
+            'sample_rate': _to_int(stream.get('sample_rate')),
+            'channels': _to_int(stream.get('channels')),
+            'bit_rate': _to_int(stream.get('bit_rate')),
+            'attached_pic': bool(stream.get('disposition', {}).get('attached_pic')),
+        })
+    return {
+        'duration': _to_float(fmt.get('duration')),
+        'bit_rate': _to_int(fmt.get('bit_rate')),
+        'format_name': fmt.get('format_name'),
+        'size': _to_int(fmt.get('size')),
+        'streams': streams,
+    }
+
+def run_ffprobe(input_file, streams=None):
+    """Executa o ffprobe e retorna o resumo (ou None em caso de erro)
+
+    streams (ex.: 'a') limita os streams listados, como -select_streams.
+    """
+    import subprocess    # Com o cache, a maioria das sondagens não chega aqui
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-print_format', 'json',
+        '-show_format',
+        '-show_streams',
+    ]
+    if streams:
+        cmd += ['-select_streams', streams]
+    cmd.append(input_file)
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, errors='replace')
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        return summarize(json.loads(result.stdout))
+    except ValueError:
+        return None
+
+def probe_media(input_file, cache=None, use_cache=True, streams=None):
+    """Sonda um arquivo usando o cache persistente quando possível
+
+    Com streams (ex.: 'a'), só esses streams são listados. A sondagem
+    completa em cache também serve; a parcial fica numa entrada própria,
+    para não esconder os outros streams de quem pede a completa.
+    """
+    if use_cache and cache is None:
+        cache = get_cache()
+    try:
+        stat = os.stat(input_file)
+    except OSError:
+        return None
+    key = os.path.abspath(input_file)
+    keys = [key, f"{key}#streams={streams}"] if streams else [key]
+
+    if use_cache and cache is not None:
+        for cached_key in keys:
+            try:
+                cached = cache.get(cached_key, stat.st_size, stat.st_mtime_ns)
+            except sqlite3.Error:
+                cached = None
+            if cached is not None:
+                return cached
+        key = keys[-1]
+
+    info = run_ffprobe(input_file, streams)
+    if info is not None and use_cache and cache is not None:
+        try:
+            cache.put(key, stat.st_size, stat.st_mtime_ns, info)
+        except sqlite3.Error:
+            pass
+    return info
+
+def first_stream(info, codec_type):
+    """Primeiro stream do tipo pedido ('video' ignora capas de álbum)"""
+    for stream in (info or {}).get('streams', []):
+        if stream['codec_type'] == codec_type and not stream.get('attached_pic'):
+            return stream
+    return None
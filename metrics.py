@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Métricas por job em JSON Lines e endpoint opcional no formato do Prometheus
+
+Cada conversão grava uma linha com sondagem, espera na fila, tempo de
+encode, fator de tempo real, CPU (user/sys) e pico de memória do ffmpeg,
+bytes de entrada/saída, código de saída e o final do stderr. As linhas são
+gravadas com uma única escrita em modo append, então vários processos do
+pool podem usar o mesmo arquivo. O endpoint HTTP agrega as linhas novas do
+arquivo a cada coleta.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import mediaprobe
+
+DEFAULT_METRICS_FILE = os.path.join(mediaprobe.default_cache_dir(), 'metrics.jsonl')
+STDERR_TAIL_CHARS = 2000
+
+def usage_from_rusage(usage):
+    """CPU e pico de memória de um filho a partir do resultado de os.wait4"""
+    # ru_maxrss: KB no Linux, bytes no macOS
+    peak_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return {'cpu_user': usage.ru_utime, 'cpu_system': usage.ru_stime, 'peak_rss_bytes': peak_rss}
+
+def exit_code(status):
+    """Código de saída a partir do status de os.wait4 (negativo = sinal, como no subprocess)
+
+    os.waitstatus_to_exitcode só existe a partir do Python 3.9.
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def sample_process(pid):
+    """CPU e pico de memória de um processo ainda vivo (/proc, só Linux)
+
+    Usado quando o processo é aguardado por outra parte do código (asyncio)
+    e os.wait4 não está disponível; retorna None fora do Linux.
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            # Campos após o nome do comando (que pode conter espaços)
+            fields = f.read().rsplit(b')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        usage = {'cpu_user': int(fields[11]) / ticks, 'cpu_system': int(fields[12]) / ticks,
+                 'peak_rss_bytes': None}
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    usage['peak_rss_bytes'] = int(line.split()[1]) * 1024
+        return usage
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _round(value):
+    return round(value, 6) if value is not None else None
+
+def build_record(job, returncode, stderr_tail, encode_seconds, output_bytes=0, usage=None,
+                 queue_wait=None, engine=None, failure=None, attempt=1):
+    """Linha de métricas de uma tentativa de um job preparado por core.prepare_conversion
+
+    failure é a categoria da falha (ver recovery.py) e attempt o número da
+    tentativa.
+    """
+    usage = usage or {}
+    try:
+        input_bytes = os.path.getsize(job['input'])
+    except OSError:
+        input_bytes = None
+    duration = job.get('duration')
+    return {
+        'timestamp': time.time(),
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'engine': engine,
+        'input': os.path.abspath(job['input']),
+        'path': job['path'],
+        'formats': [os.path.splitext(final)[1].lstrip('.') for final, _ in job['outputs']],
+        'media_seconds': duration,
+        'probe_seconds': round(job.get('probe_seconds') or 0.0, 6),
+        'queue_wait_seconds': _round(queue_wait),
+        'encode_seconds': round(encode_seconds, 6),
+        'realtime_factor': (round(duration / encode_seconds, 3)
+                            if returncode == 0 and duration and encode_seconds else None),
+        'cpu_user_seconds': _round(usage.get('cpu_user')),
+        'cpu_system_seconds': _round(usage.get('cpu_system')),
+        'peak_rss_bytes': usage.get('peak_rss_bytes'),
+        'input_bytes': input_bytes,
+        'output_bytes': output_bytes,
+        'exit_code': returncode,
+        'success': returncode == 0,
+        'failure': failure,
+        'attempt': attempt,
+        'stderr_tail': stderr_tail[-STDERR_TAIL_CHARS:] if returncode != 0 else '',
+    }
+
+def append_record(path, record):
+    """Acrescenta uma linha ao arquivo (uma única escrita, segura entre processos)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+class MetricsAggregator:
+    """Soma as linhas novas do arquivo de métricas para o endpoint do Prometheus"""
+
+    COUNTERS = (
+        ('media_seconds', 'conversor_media_seconds_total', "Segundos de mídia processados"),
+        ('encode_seconds', 'conversor_encode_seconds_total', "Tempo de parede do ffmpeg"),
+        ('probe_seconds', 'conversor_probe_seconds_total', "Tempo de sondagem"),
+        ('queue_wait_seconds', 'conversor_queue_wait_seconds_total', "Tempo de espera na fila"),
+        ('input_bytes', 'conversor_input_bytes_total', "Bytes lidos"),
+        ('output_bytes', 'conversor_output_bytes_total', "Bytes gravados"),
+    )
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self._offset = 0
+        if not from_start and os.path.exists(path):
+            self._offset = os.path.getsize(path)
+        self._lock = threading.Lock()
+        self.jobs = {'success': 0, 'failure': 0}
+        self.failures = {}
+        self.totals = {key: 0.0 for key, _, _ in self.COUNTERS}
+        self.cpu = {'user': 0.0, 'system': 0.0}
+        self.peak_rss = 0
+        self.last_realtime_factor = None
+
+    def update(self):
+        with self._lock:
+            try:
+                with open(self.path, 'rb') as f:
+                    f.seek(self._offset)
+                    data = f.read()
+            except OSError:
+                return
+            # Só linhas completas; uma linha pela metade fica para a próxima coleta
+            end = data.rfind(b'\n') + 1
+            self._offset += end
+            for line in data[:end].splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.jobs['success' if record.get('success') else 'failure'] += 1
+                if record.get('failure'):
+                    self.failures[record['failure']] = self.failures.get(record['failure'], 0) + 1
+                for key, _, _ in self.COUNTERS:
+                    self.totals[key] += record.get(key) or 0
+                self.cpu['user'] += record.get('cpu_user_seconds') or 0
+                self.cpu['system'] += record.get('cpu_system_seconds') or 0
+                self.peak_rss = max(self.peak_rss, record.get('peak_rss_bytes') or 0)
+                if record.get('realtime_factor') is not None:
+                    self.last_realtime_factor = record['realtime_factor']
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus"""
+        self.update()
+        lines = [
+            "# HELP conversor_jobs_total Tentativas de conversão concluídas por resultado",
+            "# TYPE conversor_jobs_total counter",
+        ]
+        for status, count in self.jobs.items():
+            lines.append(f'conversor_jobs_total{{status="{status}"}} {count}')
+        lines += ["# HELP conversor_failures_total Tentativas que falharam por categoria",
+                  "# TYPE conversor_failures_total counter"]
+        for category, count in sorted(self.failures.items()):
+            lines.append(f'conversor_failures_total{{category="{category}"}} {count}')
+        for key, name, help_text in self.COUNTERS:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter",
+                      f"{name} {self.totals[key]}"]
+        lines += ["# HELP conversor_cpu_seconds_total CPU usada pelos ffmpeg",
+                  "# TYPE conversor_cpu_seconds_total counter"]
+        for mode, value in self.cpu.items():
+            lines.append(f'conversor_cpu_seconds_total{{mode="{mode}"}} {value}')
+        lines += ["# HELP conversor_peak_rss_bytes Maior pico de memória de um ffmpeg",
+                  "# TYPE conversor_peak_rss_bytes gauge",
+                  f"conversor_peak_rss_bytes {self.peak_rss}"]
+        if self.last_realtime_factor is not None:
+            lines += ["# HELP conversor_last_realtime_factor Fator de tempo real do último job",
+                      "# TYPE conversor_last_realtime_factor gauge",
+                      f"conversor_last_realtime_factor {self.last_realtime_factor}"]
+        return '\n'.join(lines) + '\n'
+
+def serve(port, path, host='127.0.0.1'):
+    """Inicia o endpoint /metrics em uma thread; retorna o servidor"""
+    # Só quem expõe o endpoint paga a importação do servidor HTTP
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    aggregator = MetricsAggregator(path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = aggregator.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass    # Sem log de cada coleta no terminal
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Métricas em http://{host}:{server.server_address[1]}/metrics")
+    return server
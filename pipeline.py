@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""Motor em pipeline: descoberta → sondagem → planejamento → conversão → verificação
+
+Cada etapa tem suas próprias threads e entrega os arquivos à seguinte por
+uma fila limitada. A varredura das pastas é preguiçosa (scanner.iter_scan)
+e para quando a fila da sondagem enche, então uma árvore enorme nunca fica
+inteira na memória, e a primeira conversão começa assim que o primeiro
+arquivo é sondado. Em troca, não há a ordenação do lote pelo custo (que
+precisa de todas as sondagens antes de começar) nem a detecção de cópias
+idênticas.
+"""
+import os
+import queue
+import threading
+import time
+
+import admission
+import convertermoreperformace as core
+import manifest
+import mediaprobe
+import profiles
+import recovery
+import scanner
+import tuning
+
+DEFAULT_PROBE_WORKERS = 4
+DEFAULT_VERIFY_WORKERS = 1
+# Arquivos à espera em cada fila, por thread da etapa seguinte
+QUEUE_DEPTH = 2
+
+# Marca o fim de uma fila; cada thread que a recebe a devolve para as demais
+_END = object()
+
+class _Stage:
+    """Threads que consomem uma fila e alimentam a próxima
+
+    func(item, slot) retorna o item da próxima etapa, ou None para
+    descartá-lo. Itens que já falharam (success=False) passam direto até o
+    resultado. A última thread a terminar fecha a fila de saída.
+    """
+
+    def __init__(self, name, func, workers, inbox, outbox, stop):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop = stop
+        self._remaining = workers
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._run, args=(slot,), name=f"{name}-{slot}", daemon=True)
+                        for slot in range(1, workers + 1)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self, slot):
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is _END:
+                    self.inbox.put(_END)
+                    break
+                if self.stop.is_set():
+                    continue    # Cancelado: só esvaziar a fila
+                if item.get('success') is False:
+                    self.outbox.put(item)
+                    continue
+                try:
+                    result = self.func(item, slot)
+                except Exception as e:
+                    core._log(None, f"❌ Erro na etapa {self.name}: {os.path.basename(item['input'])} - {e}")
+                    result = dict(item, success=False, error=str(e))
+                if result is not None:
+                    self.outbox.put(result)
+        finally:
+            with self._lock:
+                self._remaining -= 1
+                last = self._remaining == 0
+            if last:
+                self.outbox.put(_END)
+
+def verify_outputs(outputs):
+    """Motivo pelo qual as saídas publicadas não valem (None se estiverem ok)"""
+    for final_file, _ in outputs:
+        try:
+            if os.path.getsize(final_file) == 0:
+                return f"saída vazia: {os.path.basename(final_file)}"
+        except OSError:
+            return f"saída ausente: {os.path.basename(final_file)}"
+    return None
+
+def convert_files_pipeline(paths, profile, max_workers=None, probe_workers=DEFAULT_PROBE_WORKERS,
+                           verify_workers=DEFAULT_VERIFY_WORKERS, include=(), exclude=(), recursive=True,
+                           incremental=False, done=(), batch_manifest=None, metrics_path=None,
+                           admission_control=None, verifier=None):
+    """Varre, sonda e converte em etapas simultâneas
+
+    paths são pastas ou arquivos (varridos como em core.collect_media_files);
+    max_workers é o número de conversões simultâneas e probe_workers /
+    verify_workers as threads das outras etapas. Com incremental, saídas
+    atualizadas (e os arquivos em done) são puladas já na descoberta.
+    Sem verifier (verify.Verifier), a etapa de verificação só confere se as
+    saídas existem e não estão vazias.
+    Retorna (sucessos, falhas, tempo total), como core.convert_files_parallel.
+    """
+    profile = recovery.resolve_encoders(profile)
+    controller = admission_control or admission.AdmissionController()
+    targets = profiles.as_list(profile)
+    formats = [target['format'] for target in targets]
+    # Sem sondar o lote inteiro, vale o tipo de job do perfil
+    kind = tuning.heaviest({tuning.job_type(target) for target in targets})
+    if max_workers is None:
+        max_workers, threads = tuning.recommend(kind)
+    else:
+        threads = tuning.threads_for(max_workers, kind)
+    done = {os.path.abspath(f) for f in done}
+
+    print(f"🚰 Pipeline: {probe_workers} sondagens, {max_workers} conversões simultâneas"
+          + (f" ({threads} threads cada)" if kind == tuning.JOB_VIDEO else "")
+          + f" e {verify_workers} verificações")
+    print(f"{'='*60}")
+
+    stop = threading.Event()
+    manifest_lock = threading.Lock()
+    counts = {'discovered': 0, 'skipped': 0}
+
+    def record(event, file, **extra):
+        if batch_manifest is not None:
+            with manifest_lock:
+                batch_manifest.record(event, file, **extra)
+
+    to_probe = queue.Queue(maxsize=probe_workers * QUEUE_DEPTH)
+    to_plan = queue.Queue(maxsize=QUEUE_DEPTH)
+    to_encode = queue.Queue(maxsize=max_workers * QUEUE_DEPTH)
+    to_verify = queue.Queue(maxsize=verify_workers * QUEUE_DEPTH)
+    results = queue.Queue()
+
+    def discover():
+        try:
+            for file in scanner.iter_scan(paths, core.MEDIA_EXTENSIONS, recursive, include, exclude):
+                if stop.is_set():
+                    break
+                if incremental and (os.path.abspath(file) in done or all(
+                        manifest.is_up_to_date(file, core.get_output_path(file, fmt)) for fmt in formats)):
+                    counts['skipped'] += 1
+                    continue
+                counts['discovered'] += 1
+                to_probe.put({'input': file})
+        finally:
+            to_probe.put(_END)
+
+    def probe(item, slot):
+        item['info'] = mediaprobe.probe_media(item['input'])
+        return item
+
+    def plan(item, slot):
+        # A estimativa usa a sondagem da etapa anterior e planeja cada saída
+        file = item['input']
+        estimate = admission.estimate_job(file, profile, core.job_outputs(file, profile), item['info'])
+        reason = controller.check(estimate)
+        if reason:
+            core._log(None, f"❌ Não iniciado: {os.path.basename(file)} - {reason}")
+            return dict(item, success=False, error=reason)
+        item['estimate'] = estimate
+        item['queued_at'] = time.time()
+        return item
+
+    def encode(item, slot):
+        file = item['input']
+        while not controller.try_admit(item['estimate']):
+            if stop.wait(admission.ADMISSION_POLL):
+                return None
+        try:
+            record('start', file)
+            success, _, conversion_path = core.convert_file(
+                file, slot, profile=profile, threads=threads, metrics_path=metrics_path,
+                submitted_at=item['queued_at'], info=item['info'], stop=stop)
+        finally:
+            controller.release(item['estimate'])
+        if stop.is_set():
+            return None    # Cancelado: os temporários já foram apagados
+        return dict(item, success=success, conversion_path=conversion_path,
+                    error=None if success else "conversão falhou")
+
+    def verify(item, slot):
+        if not item['success']:
+            return item
+        outputs = core.job_outputs(item['input'], profile)
+        if verifier is not None:
+            item['verification'] = verifier.verify(item['input'], outputs)
+            problems = item['verification']['problems']
+            reason = "verificação: " + '; '.join(problems) if problems else None
+        else:
+            reason = verify_outputs(outputs)
+        if reason:
+            core._log(None, f"❌ Verificação: {os.path.basename(item['input'])} - {reason}")
+            item.update(success=False, error=reason)
+        return item
+
+    stages = [
+        _Stage('sondagem', probe, probe_workers, to_probe, to_plan, stop),
+        _Stage('planejamento', plan, 1, to_plan, to_encode, stop),
+        _Stage('conversão', encode, max_workers, to_encode, to_verify, stop),
+        _Stage('verificação', verify, verify_workers, to_verify, results, stop),
+    ]
+    discoverer = threading.Thread(target=discover, name='descoberta', daemon=True)
+
+    success_files = []
+    failed_files = []
+    conversion_paths = {}
+    verification = {} if verifier is not None else None
+    start_time = time.time()
+    discoverer.start()
+    for stage in stages:
+        stage.start()
+    try:
+        while True:
+            try:
+                item = results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if item is _END:
+                break
+            (success_files if item['success'] else failed_files).append(item['input'])
+            if item.get('conversion_path'):
+                conversion_paths[item['input']] = item['conversion_path']
+            if 'verification' in item:
+                verification[item['input']] = item['verification']
+            record('done' if item['success'] else 'failed', item['input'],
+                   **({'error': item['error']} if item.get('error') else {}))
+            finished = len(success_files) + len(failed_files)
+            pending = '' if not discoverer.is_alive() else '+'
+            print(f"📊 Progresso: {finished}/{counts['discovered']}{pending} concluídos")
+    except KeyboardInterrupt:
+        # As etapas esvaziam as filas e as conversões encerram o ffmpeg;
+        # esperar por elas para que nenhum temporário fique para trás
+        stop.set()
+        for thread in stages[2].threads:
+            thread.join()
+        raise
+    elapsed_time = time.time() - start_time
+
+    if counts['skipped']:
+        print(f"⏭️  {counts['skipped']} arquivos já convertidos foram pulados")
+    core.print_batch_summary(conversion_paths, None, elapsed_time, verification)
+    return success_files, failed_files, elapsed_time
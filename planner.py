@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Planejamento por stream: copiar (remux) o que já está no formato de destino
+
+Para cada stream de vídeo e áudio o planner decide, de forma independente,
+entre copiar ('copy') ou converter ('encode'), escolhendo o caminho mais
+barato que ainda gera uma saída válida.
+"""
+import mediaprobe
+import profiles
+
+# Formatos de pixel que o libx264 também geraria (saída compatível com players)
+COPYABLE_PIX_FMTS = (None, 'yuv420p', 'yuvj420p')
+
+PATH_REMUX = 'remux'
+PATH_COPY_VIDEO = 'copy-video'
+PATH_COPY_AUDIO = 'copy-audio'
+PATH_TRANSCODE = 'transcode'
+
+PATH_LABELS = {
+    PATH_REMUX: "remux (cópia sem reconversão)",
+    PATH_COPY_VIDEO: "vídeo copiado + áudio convertido",
+    PATH_COPY_AUDIO: "vídeo convertido + áudio copiado",
+    PATH_TRANSCODE: "conversão completa",
+}
+
+def describe_path(path):
+    """Rótulo do caminho; jobs multi-saída juntam os caminhos com '+'"""
+    return ' + '.join(PATH_LABELS[p] for p in path.split('+'))
+
+def _can_copy_video(stream, profile):
+    if profile.get('target_size') or profile.get('target_bitrate'):
+        return False    # Um tamanho alvo só é atingido reconvertendo
+    target = profiles.ENCODER_CODECS.get(profile['video_codec'])
+    return (target is not None and stream['codec_name'] == target
+            and stream.get('pix_fmt') in COPYABLE_PIX_FMTS)
+
+def _can_copy_audio(stream, profile):
+    target = profiles.ENCODER_CODECS.get(profile['audio_codec'])
+    if target is None or stream['codec_name'] != target:
+        return False
+    return not profile.get('sample_rate') or stream.get('sample_rate') == profile['sample_rate']
+
+def plan_conversion(info, profile):
+    """Decide copiar/converter cada stream a partir do resultado do ffprobe
+
+    Retorna {'video': 'copy'|'encode'|None, 'audio': 'copy'|'encode'|None,
+    'path': PATH_*}. Sem informações de sondagem, ou com 'copy': false no
+    perfil, tudo é convertido.
+    """
+    wants_video = not profiles.is_audio_only(profile)
+    wants_audio = bool(profile.get('audio_codec'))
+    if not info or not profile.get('copy', True):
+        return {'video': 'encode' if wants_video else None,
+                'audio': 'encode' if wants_audio else None, 'path': PATH_TRANSCODE}
+
+    video = mediaprobe.first_stream(info, 'video') if wants_video else None
+    audio = mediaprobe.first_stream(info, 'audio') if wants_audio else None
+
+    video_action = None
+    if video is not None:
+        video_action = 'copy' if _can_copy_video(video, profile) else 'encode'
+    audio_action = None
+    if audio is not None:
+        audio_action = 'copy' if _can_copy_audio(audio, profile) else 'encode'
+
+    actions = [a for a in (video_action, audio_action) if a]
+    if actions and all(a == 'copy' for a in actions):
+        path = PATH_REMUX
+    elif video_action == 'copy':
+        path = PATH_COPY_VIDEO
+    elif audio_action == 'copy' and video_action == 'encode':
+        path = PATH_COPY_AUDIO
+    else:
+        path = PATH_TRANSCODE
+    return {'video': video_action, 'audio': audio_action, 'path': path}
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Perfis de codificação e montagem do comando ffmpeg
+
+Um perfil descreve uma saída: formato (extensão), codecs, CRF, preset,
+bitrates e sample rate. Os perfis padrão reproduzem as conversões originais
+(MP4 com libx264 CRF 18, MP4 com VideoToolbox, MP3 e AC3); outros podem ser
+carregados de um arquivo TOML ou JSON:
+
+    [profiles.web]
+    base = "mp4"          # herda os campos de outro perfil
+    crf = 23
+    preset = "fast"
+
+    [profiles.whatsapp]
+    base = "mp4"
+    target_size = "64M"   # ou target_bitrate = "1500k" (ver ratecontrol.py)
+    rate_control = "crf"  # "two-pass" para o tamanho exato
+
+    [profiles.catalogo]
+    base = "mp4"
+    thumbnails = 12             # miniaturas + sprite (ver thumbnails.py)
+    thumbnail_format = "webp"
+"""
+import copy
+import json
+import os
+
+PROFILE_FIELDS = {
+    'format', 'description', 'video_codec', 'crf', 'preset', 'video_bitrate', 'video_args',
+    'audio_codec', 'audio_bitrate', 'sample_rate', 'extra_args', 'copy',
+    'target_size', 'target_bitrate', 'rate_control', 'samples',
+    'thumbnails', 'thumbnail_format', 'thumbnail_width', 'thumbnail_mode', 'sprite_columns',
+}
+
+DEFAULT_PROFILES = {
+    'mp4': {
+        'format': 'mp4',
+        'description': "MP4 H.264 (libx264 CRF 18, preset medium) + AAC 192k",
+        'video_codec': 'libx264',
+        'crf': 18,
+        'preset': 'medium',
+        'audio_codec': 'aac',
+        'audio_bitrate': '192k',
+    },
+    'mp4-gpu': {
+        'format': 'mp4',
+        'description': "MP4 H.264 por GPU (VideoToolbox 1500k) + AAC 128k",
+        'video_codec': 'h264_videotoolbox',
+        'video_bitrate': '1500k',
+        'video_args': ['-realtime', '1'],
+        'audio_codec': 'aac',
+        'audio_bitrate': '128k',
+    },
+    'mp3': {
+        'format': 'mp3',
+        'description': "MP3 192k 44.1 kHz (apenas áudio)",
+        'audio_codec': 'mp3',
+        'audio_bitrate': '192k',
+        'sample_rate': 44100,
+    },
+    'ac3': {
+        'format': 'ac3',
+        'description': "AC3 640k 48 kHz (apenas áudio)",
+        'audio_codec': 'ac3',
+        'audio_bitrate': '640k',
+        'sample_rate': 48000,
+    },
+}
+
+# Codec gerado por cada encoder (para decidir se a fonte pode ser copiada)
+ENCODER_CODECS = {
+    'libx264': 'h264', 'h264_videotoolbox': 'h264', 'h264_nvenc': 'h264',
+    'h264_qsv': 'h264', 'h264_amf': 'h264', 'h264_vaapi': 'h264',
+    'libx265': 'hevc', 'hevc_videotoolbox': 'hevc', 'hevc_nvenc': 'hevc', 'hevc_qsv': 'hevc',
+    'aac': 'aac', 'libfdk_aac': 'aac', 'mp3': 'mp3', 'libmp3lame': 'mp3',
+    'ac3': 'ac3', 'libopus': 'opus', 'flac': 'flac',
+}
+
+FASTSTART_FORMATS = ('mp4', 'm4a', 'mov')
+
+def default_config_dir():
+    """Diretório de configuração do usuário"""
+    if os.name == 'nt':
+        root = os.environ.get('APPDATA') or os.path.expanduser('~')
+        return os.path.join(root, 'conversorpython')
+    root = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(root, 'conversorpython')
+
+def default_profiles_file():
+    """Arquivo de perfis do usuário (CONVERSOR_PROFILES ou profiles.toml/json)"""
+    path = os.environ.get('CONVERSOR_PROFILES')
+    if path:
+        return path
+    for name in ('profiles.toml', 'profiles.json'):
+        candidate = os.path.join(default_config_dir(), name)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def _read_profiles_file(path):
+    if path.lower().endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("arquivos TOML exigem Python 3.11+ (use JSON)")
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    return data.get('profiles', data)
+
+def validate_profile(name, profile):
+    unknown = set(profile) - PROFILE_FIELDS
+    if unknown:
+        raise ValueError(f"perfil '{name}': campos desconhecidos: {', '.join(sorted(unknown))}")
+    if not profile.get('format'):
+        raise ValueError(f"perfil '{name}': 'format' é obrigatório")
+    if not profile.get('audio_codec') and not profile.get('video_codec'):
+        raise ValueError(f"perfil '{name}': informe 'video_codec' e/ou 'audio_codec'")
+    if profile.get('rate_control', 'crf') not in ('crf', 'two-pass'):
+        raise ValueError(f"perfil '{name}': 'rate_control' deve ser 'crf' ou 'two-pass'")
+    if profile.get('thumbnail_format', 'jpg') not in ('jpg', 'webp'):
+        raise ValueError(f"perfil '{name}': 'thumbnail_format' deve ser 'jpg' ou 'webp'")
+    if profile.get('thumbnail_mode', 'auto') not in ('auto', 'same-pass', 'keyframes'):
+        raise ValueError(f"perfil '{name}': 'thumbnail_mode' deve ser 'auto', 'same-pass' ou 'keyframes'")
+    if profile.get('thumbnails') and is_audio_only(profile):
+        raise ValueError(f"perfil '{name}': miniaturas exigem uma saída com vídeo")
+
+def load_profiles(path=None):
+    """Perfis padrão mais os do arquivo (que podem herdar com 'base')"""
+    profiles = copy.deepcopy(DEFAULT_PROFILES)
+    path = path or default_profiles_file()
+    if not path:
+        return profiles
+
+    custom = _read_profiles_file(path)
+    pending = dict(custom)
+    while pending:
+        progressed = False
+        for name, fields in list(pending.items()):
+            fields = dict(fields)
+            base = fields.pop('base', None)
+            if base is not None and base not in profiles:
+                if base not in pending:
+                    raise ValueError(f"perfil '{name}': base desconhecida '{base}'")
+                continue
+            profile = copy.deepcopy(profiles[base]) if base else {}
+            profile.update(fields)
+            validate_profile(name, profile)
+            profiles[name] = profile
+            del pending[name]
+            progressed = True
+        if not progressed:
+            raise ValueError(f"herança circular entre perfis: {', '.join(sorted(pending))}")
+    return profiles
+
+def get_profile(name, profiles=None):
+    profiles = profiles if profiles is not None else load_profiles()
+    try:
+        return profiles[name]
+    except KeyError:
+        raise ValueError(f"perfil desconhecido: '{name}' (disponíveis: {', '.join(sorted(profiles))})")
+
+def profile_name_for_flags(to_mp3=False, to_ac3=False, use_gpu=False):
+    """Perfil equivalente às opções to_mp3/to_ac3/use_gpu originais"""
+    if to_mp3:
+        return 'mp3'
+    if to_ac3:
+        return 'ac3'
+    return 'mp4-gpu' if use_gpu else 'mp4'
+
+def profile_for_flags(to_mp3=False, to_ac3=False, use_gpu=False):
+    return copy.deepcopy(DEFAULT_PROFILES[profile_name_for_flags(to_mp3, to_ac3, use_gpu)])
+
+def is_audio_only(profile):
+    return not profile.get('video_codec')
+
+def as_list(profile):
+    """Lista de perfis de um job: um perfil ou vários (multi-saída)"""
+    return list(profile) if isinstance(profile, (list, tuple)) else [profile]
+
+def output_args(profile, plan=None, threads=None):
+    """Opções de uma saída do ffmpeg (tudo entre a entrada e o arquivo de saída)
+
+    Com um plano (planner.plan_conversion), streams que já estão no codec
+    de destino são copiados em vez de reconvertidos. threads limita as
+    threads do encoder de vídeo (divisão das CPUs entre processos).
+    """
+    video_action = plan['video'] if plan else 'encode'
+    audio_action = plan['audio'] if plan else 'encode'
+
+    args = []
+    if is_audio_only(profile):
+        args += ['-vn']                                 # Sem vídeo
+    elif video_action == 'copy':
+        args += ['-c:v', 'copy']                        # Já está no codec de destino
+    else:
+        args += ['-c:v', profile['video_codec']]
+        if profile.get('crf') is not None:
+            args += ['-crf', str(profile['crf'])]       # Qualidade constante
+        if profile.get('preset'):
+            args += ['-preset', profile['preset']]      # Velocidade x compressão
+        if profile.get('video_bitrate'):
+            args += ['-b:v', str(profile['video_bitrate'])]
+        args += [str(arg) for arg in profile.get('video_args', [])]
+        if threads:
+            args += ['-threads', str(threads)]
+
+    if profile.get('audio_codec'):
+        if audio_action == 'copy':
+            args += ['-c:a', 'copy']
+        else:
+            args += ['-c:a', profile['audio_codec']]
+            if profile.get('audio_bitrate'):
+                args += ['-b:a', str(profile['audio_bitrate'])]
+            if profile.get('sample_rate'):
+                args += ['-ar', str(profile['sample_rate'])]
+    else:
+        args += ['-an']                                 # Sem áudio
+
+    if profile['format'] in FASTSTART_FORMATS:
+        args += ['-movflags', '+faststart']             # Otimização
+    args += [str(arg) for arg in profile.get('extra_args', [])]
+    args += ['-y']                                      # Sobrescrever se existir
+    return args
+
+def build_command(input_file, output_file, profile, plan=None, threads=None):
+    """Monta o comando ffmpeg de um perfil (ver output_args)"""
+    return ['ffmpeg', '-i', input_file] + output_args(profile, plan, threads) + [output_file]
+
+def build_multi_command(input_file, outputs, threads=None):
+    """Um único ffmpeg que decodifica a entrada uma vez e grava várias saídas
+
+    outputs é uma lista de (arquivo de saída, perfil, plano); cada saída
+    tem seus próprios codecs e seleção de streams.
+    """
+    cmd = ['ffmpeg', '-i', input_file]
+    for output_file, profile, plan in outputs:
+        cmd += output_args(profile, plan, threads) + [output_file]
+    return cmd
+
+def describe(profile):
+    """Resumo de uma linha do perfil"""
+    target = profile.get('target_size') or profile.get('target_bitrate')
+    suffix = f" (alvo {target}{', duas passadas' if profile.get('rate_control') == 'two-pass' else ''})" if target else ''
+    if profile.get('thumbnails'):
+        suffix += f" + {profile['thumbnails']} miniaturas e sprite"
+    if profile.get('description'):
+        return profile['description'] + suffix
+    parts = [profile['format'].upper()]
+    if profile.get('video_codec'):
+        parts.append(profile['video_codec'])
+    if profile.get('audio_codec'):
+        parts.append(profile['audio_codec'])
+    return ' '.join(parts) + suffix
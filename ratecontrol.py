@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Controle de taxa por tamanho ou bitrate alvo
+
+Com 'target_size' (ex.: "700M") ou 'target_bitrate' (ex.: "2500k") no
+perfil, o orçamento de bits do vídeo é calculado pela duração, descontando
+o áudio. No modo 'crf' (padrão) alguns trechos curtos espalhados pelo
+arquivo são convertidos em paralelo para prever o tamanho final de cada
+CRF, e o menor CRF que cabe no orçamento é escolhido, sem conversões
+completas de teste. No modo 'two-pass' o libx264/libx265 faz duas
+passadas com o bitrate exato. Encoders de hardware recebem o bitrate
+diretamente.
+"""
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+import mediaprobe
+import profiles
+
+RATE_CONTROL_CRF = 'crf'
+RATE_CONTROL_TWO_PASS = 'two-pass'
+RATE_CONTROL_MODES = (RATE_CONTROL_CRF, RATE_CONTROL_TWO_PASS)
+
+SOFTWARE_ENCODERS = ('libx264', 'libx265')
+DEFAULT_SAMPLES = 5
+SAMPLE_SECONDS = 4.0
+DEFAULT_START_CRF = 23
+MIN_CRF = 0
+MAX_CRF = 51
+# No x264/x265, cada +6 no CRF reduz o bitrate mais ou menos pela metade
+CRF_DOUBLING = 6.0
+MAX_SEARCH_STEPS = 4
+TOLERANCE = 0.05
+CONTAINER_OVERHEAD = 0.01
+DEFAULT_AUDIO_BITRATE = 128000
+MIN_VIDEO_BITRATE = 100000
+
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+_RATE_UNITS = {'': 1, 'K': 1000, 'M': 1000 ** 2, 'G': 1000 ** 3}
+
+def _parse(value, units, what):
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([kKmMgGtT]?)(?:i?[bB])?\s*', str(value))
+    if not match or match.group(2).upper() not in units:
+        raise ValueError(f"{what} inválido: '{value}'")
+    return float(match.group(1)) * units[match.group(2).upper()]
+
+def parse_size(value):
+    """'700M', '1.4G', 500000 -> bytes (K/M/G em base 1024)"""
+    return _parse(value, _SIZE_UNITS, "tamanho")
+
+def parse_bitrate(value):
+    """'2500k', '2.5M', 2500000 -> bits/s (k/M em base 1000, como no ffmpeg)"""
+    return _parse(value, _RATE_UNITS, "bitrate")
+
+def has_target(profile):
+    return bool(profile.get('target_size') or profile.get('target_bitrate'))
+
+def _audio_bitrate(profile, info, plan):
+    if not profile.get('audio_codec') or (plan and not plan['audio']):
+        return 0.0
+    if plan and plan['audio'] == 'copy':
+        stream = mediaprobe.first_stream(info, 'audio')
+        return float(stream.get('bit_rate') or DEFAULT_AUDIO_BITRATE) if stream else 0.0
+    if profile.get('audio_bitrate'):
+        return parse_bitrate(profile['audio_bitrate'])
+    return DEFAULT_AUDIO_BITRATE
+
+def video_bitrate_budget(profile, info, plan=None):
+    """Bits por segundo disponíveis para o vídeo (None sem duração para um tamanho alvo)"""
+    duration = info['duration'] if info else None
+    if profile.get('target_bitrate'):
+        total = parse_bitrate(profile['target_bitrate'])
+    elif duration:
+        total = parse_size(profile['target_size']) * 8 / duration
+    else:
+        return None
+    video = total * (1 - CONTAINER_OVERHEAD) - _audio_bitrate(profile, info, plan)
+    if video < MIN_VIDEO_BITRATE:
+        raise ValueError(f"alvo pequeno demais: sobram {video / 1000:.0f} kb/s para o vídeo")
+    return video
+
+def sample_starts(duration, count=DEFAULT_SAMPLES, length=SAMPLE_SECONDS):
+    """Início dos trechos de amostra, espalhados pelo arquivo"""
+    if duration <= count * length * 2:
+        # Arquivo curto: poucas amostras cobrindo boa parte dele
+        count = max(1, int(duration // (length * 2)))
+        if duration <= length:
+            return [0.0]
+    return [(duration - length) * (i + 0.5) / count for i in range(count)]
+
+def _sample_command(input_file, start, length, output_file, profile, crf, threads):
+    cmd = ['ffmpeg', '-v', 'error', '-ss', f"{start:.3f}", '-i', input_file, '-t', f"{length:.3f}",
+           '-map', '0:v:0', '-an', '-sn', '-c:v', profile['video_codec'], '-crf', str(crf)]
+    if profile.get('preset'):
+        cmd += ['-preset', profile['preset']]
+    cmd += [str(arg) for arg in profile.get('video_args', [])]
+    if threads:
+        cmd += ['-threads', str(threads)]
+    cmd += ['-y', output_file]
+    return cmd
+
+def predict_bitrate(input_file, profile, crf, starts, length, work_dir, threads=None):
+    """Converte as amostras em paralelo e retorna o bitrate de vídeo previsto (bits/s)"""
+    sample_threads = max(1, threads // len(starts)) if threads else None
+    outputs = [os.path.join(work_dir, f"amostra_{crf}_{i}.mkv") for i in range(len(starts))]
+
+    def encode(i):
+        cmd = _sample_command(input_file, starts[i], length, outputs[i], profile, crf, sample_threads)
+        return subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True).returncode
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=len(starts)) as executor:
+        if any(executor.map(encode, range(len(starts)))):
+            return None
+    total_bytes = sum(os.path.getsize(output) for output in outputs)
+    return total_bytes * 8 / (length * len(starts))
+
+def choose_crf(input_file, profile, budget, duration, threads=None):
+    """Busca o menor CRF cuja previsão cabe no orçamento
+
+    Retorna (crf, bitrate previsto) ou None se as amostras falharem.
+    """
+    length = min(SAMPLE_SECONDS, duration)
+    starts = sample_starts(duration, profile.get('samples', DEFAULT_SAMPLES), length)
+    work_dir = tempfile.mkdtemp(prefix='conversor-amostras-')
+    try:
+        crf = int(profile['crf']) if profile.get('crf') is not None else DEFAULT_START_CRF
+        points = {}
+        for _ in range(MAX_SEARCH_STEPS):
+            bitrate = predict_bitrate(input_file, profile, crf, starts, length, work_dir, threads)
+            if bitrate is None:
+                return None
+            points[crf] = bitrate
+            if abs(bitrate - budget) / budget <= TOLERANCE:
+                break
+            # Próximo CRF pela relação log2(bitrate) x CRF, medida com os
+            # dois pontos mais próximos do alvo (ou a regra dos 6 CRF)
+            slope = -CRF_DOUBLING
+            nearest = sorted(points.items(), key=lambda p: abs(math.log2(p[1] / budget)))[:2]
+            if len(nearest) == 2 and nearest[0][1] != nearest[1][1]:
+                measured = (nearest[0][0] - nearest[1][0]) / math.log2(nearest[0][1] / nearest[1][1])
+                if measured < 0:
+                    slope = measured
+            next_crf = round(crf + slope * math.log2(budget / bitrate))
+            next_crf = max(MIN_CRF, min(MAX_CRF, next_crf))
+            if next_crf in points:
+                break
+            crf = next_crf
+
+        fitting = [(c, b) for c, b in points.items() if b <= budget * (1 + TOLERANCE)]
+        if fitting:
+            return min(fitting)
+        return max(points.items())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def two_pass(input_file, profile, budget, threads=None):
+    """Comando da 1ª passada e o perfil da 2ª (bitrate exato)
+
+    Retorna (comando da passada 1, perfil da passada 2, pasta de trabalho).
+    """
+    work_dir = tempfile.mkdtemp(prefix='conversor-2pass-')
+    log_file = os.path.join(work_dir, 'passlog')
+    rate = dict(profile, crf=None, video_bitrate=str(int(budget)))
+    video_args = [str(arg) for arg in profile.get('video_args', [])]
+    first = dict(rate, format='null', audio_codec=None, extra_args=[],
+                 video_args=video_args + ['-pass', '1', '-passlogfile', log_file])
+    first_pass = (['ffmpeg', '-i', input_file] + profiles.output_args(first, None, threads)
+                  + ['-f', 'null', os.devnull])
+    second = dict(rate, video_args=video_args + ['-pass', '2', '-passlogfile', log_file])
+    return first_pass, second, work_dir
+
+def apply(input_file, profile, info, plan=None, threads=None):
+    """Ajusta o perfil ao alvo de tamanho/bitrate
+
+    Retorna (perfil ajustado, comandos a executar antes, pasta de trabalho
+    ou None, mensagem para o log).
+    """
+    filename = os.path.basename(input_file)
+    budget = video_bitrate_budget(profile, info, plan)
+    if budget is None:
+        return profile, [], None, f"⚠️  {filename}: duração desconhecida, alvo de tamanho ignorado"
+    kbps = budget / 1000
+    codec = profile['video_codec']
+    target = {key: value for key, value in profile.items()
+              if key not in ('target_size', 'target_bitrate', 'rate_control', 'samples')}
+
+    if codec not in SOFTWARE_ENCODERS:
+        # Hardware: sem CRF comparável, o próprio encoder segue o bitrate
+        adjusted = dict(target, crf=None, video_bitrate=str(int(budget)))
+        return adjusted, [], None, f"🎯 {filename}: {codec} a {kbps:.0f} kb/s"
+
+    if profile.get('rate_control') == RATE_CONTROL_TWO_PASS:
+        first_pass, adjusted, work_dir = two_pass(input_file, target, budget, threads)
+        return adjusted, [first_pass], work_dir, f"🎯 {filename}: duas passadas a {kbps:.0f} kb/s"
+
+    duration = info['duration'] if info else None
+    chosen = choose_crf(input_file, target, budget, duration, threads) if duration else None
+    if chosen is None:
+        # Amostras falharam: garantir o tamanho com bitrate médio
+        adjusted = dict(target, crf=None, video_bitrate=str(int(budget)))
+        return adjusted, [], None, f"🎯 {filename}: amostras falharam, usando {kbps:.0f} kb/s"
+    crf, predicted = chosen
+    return (dict(target, crf=crf), [], None,
+            f"🎯 {filename}: CRF {crf} (previsto {predicted / 1000:.0f} kb/s para {kbps:.0f} kb/s de orçamento)")
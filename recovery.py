@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Classificação de falhas do ffmpeg, novas tentativas e cadeia de encoders
+
+O final do stderr de uma conversão que falhou é classificado em uma
+categoria (entrada corrompida, codec sem suporte, encoder indisponível,
+disco cheio, processo encerrado, tempo limite). Cada categoria tem uma
+política: tentar de novo com espera crescente, passar para o próximo
+encoder da cadeia (hardware → libx264 veryfast → libx264 medium) ou
+desistir na hora. Os encoders do ffmpeg instalado são consultados uma vez,
+no início do lote, para não iniciar um ffmpeg fadado a falhar por arquivo.
+"""
+import re
+import subprocess
+
+import profiles
+import scheduler
+
+CORRUPT_INPUT = 'corrupt-input'
+UNSUPPORTED_CODEC = 'unsupported-codec'
+ENCODER_UNAVAILABLE = 'encoder-unavailable'
+DISK_FULL = 'disk-full'
+KILLED = 'killed'
+TIMEOUT = 'timeout'
+UNKNOWN = 'unknown'
+
+LABELS = {
+    CORRUPT_INPUT: "entrada corrompida",
+    UNSUPPORTED_CODEC: "codec sem suporte",
+    ENCODER_UNAVAILABLE: "encoder indisponível",
+    DISK_FULL: "disco cheio",
+    KILLED: "processo encerrado",
+    TIMEOUT: "tempo limite excedido",
+    UNKNOWN: "erro desconhecido",
+}
+
+RETRY = 'retry'
+FALLBACK = 'fallback'
+GIVE_UP = 'give-up'
+
+# Repetir só ajuda quando a causa pode ser passageira (ex.: o OOM killer
+# encerrou o ffmpeg com outros jobs ocupando a memória)
+POLICIES = {
+    CORRUPT_INPUT: GIVE_UP,
+    UNSUPPORTED_CODEC: GIVE_UP,
+    ENCODER_UNAVAILABLE: FALLBACK,
+    DISK_FULL: GIVE_UP,
+    KILLED: RETRY,
+    TIMEOUT: GIVE_UP,
+    UNKNOWN: RETRY,
+}
+MAX_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 5.0
+
+SOFTWARE_FALLBACK_PRESETS = ('veryfast', 'medium')
+SOFTWARE_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265'}
+
+# A ordem importa: a primeira categoria que casar vence
+_PATTERNS = [
+    (DISK_FULL, re.compile(r'No space left on device|Disk quota exceeded|File too large', re.I)),
+    (ENCODER_UNAVAILABLE, re.compile(
+        r"Unknown encoder|Encoder \S+ not found|Error selecting an encoder|Error while opening encoder"
+        r"|Could not open encoder|Cannot load \S+|No capable devices found|Device creation failed"
+        r"|Failed to (?:create|open|initiali[sz]e) \S+ (?:device|session|encoder)", re.I)),
+    (UNSUPPORTED_CODEC, re.compile(
+        r"Decoder \(codec \S+\) not found|no decoder found|Unsupported codec|not currently supported in container"
+        r"|Could not find codec parameters|Invalid encoder type", re.I)),
+    (CORRUPT_INPUT, re.compile(
+        r"Invalid data found when processing input|moov atom not found|EBML header parsing failed"
+        r"|Invalid NAL unit|corrupt (?:input|decoded frame)|Header missing|Invalid frame dimensions"
+        r"|Error while decoding stream|Truncating packet", re.I)),
+]
+
+_available_encoders = None
+
+def classify(returncode, stderr_tail):
+    """Categoria da falha a partir do código de saída e do final do stderr
+
+    returncode None indica tempo limite (motor async); negativo, que o
+    ffmpeg foi encerrado por um sinal.
+    """
+    if returncode is None:
+        return TIMEOUT
+    if returncode < 0 or returncode in (128 + 9, 128 + 15):
+        return KILLED
+    for category, pattern in _PATTERNS:
+        if pattern.search(stderr_tail or ''):
+            return category
+    return UNKNOWN
+
+def reason(stderr_tail):
+    """Última linha relevante do stderr, para o log"""
+    lines = [line.strip() for line in (stderr_tail or '').splitlines() if line.strip()]
+    for line in reversed(lines):
+        if any(pattern.search(line) for _, pattern in _PATTERNS):
+            return line
+    return lines[-1] if lines else ''
+
+def decide(category, retries, has_fallback):
+    """Próximo passo após uma falha: (RETRY|FALLBACK|GIVE_UP, espera em segundos)
+
+    retries é quantas novas tentativas o job já fez.
+    """
+    policy = POLICIES.get(category, GIVE_UP)
+    if policy == FALLBACK and has_fallback:
+        return FALLBACK, 0.0
+    if policy == RETRY and retries < MAX_RETRIES:
+        return RETRY, RETRY_BACKOFF_SECONDS * 2 ** retries
+    return GIVE_UP, 0.0
+
+def encoder_chain(profile):
+    """Perfis a tentar, em ordem, para uma saída
+
+    Encoders de hardware ganham as alternativas por software; os demais
+    perfis não têm alternativa.
+    """
+    codec = profile.get('video_codec')
+    if not scheduler.is_hardware_encoder(codec):
+        return [profile]
+    software = SOFTWARE_ENCODERS.get(profiles.ENCODER_CODECS.get(codec), 'libx264')
+    # Bitrate e opções do encoder de hardware não valem para o x264
+    base = {key: value for key, value in profile.items()
+            if key not in ('video_bitrate', 'video_args', 'description')}
+    base.update(video_codec=software, crf=profile.get('crf', profiles.DEFAULT_PROFILES['mp4']['crf']))
+    return [profile] + [dict(base, preset=preset) for preset in SOFTWARE_FALLBACK_PRESETS]
+
+def fallback_chain(profile):
+    """Perfis do job a tentar, em ordem (aceita uma lista de perfis, multi-saída)
+
+    No passo N cada saída usa o N-ésimo encoder da sua cadeia (ou o último).
+    """
+    chains = [encoder_chain(target) for target in profiles.as_list(profile)]
+    steps = []
+    for step in range(max(len(chain) for chain in chains)):
+        targets = [chain[min(step, len(chain) - 1)] for chain in chains]
+        steps.append(targets if isinstance(profile, (list, tuple)) else targets[0])
+    return steps
+
+def available_encoders():
+    """Nomes dos encoders do ffmpeg instalado (consultado uma vez por processo)
+
+    Retorna None se a lista não puder ser obtida.
+    """
+    global _available_encoders
+    if _available_encoders is None:
+        try:
+            result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                    capture_output=True, text=True, errors='replace')
+        except OSError:
+            return None
+        names = set()
+        started = False
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if not started:
+                # A legenda termina na linha " ------"
+                started = bool(parts) and set(parts[0]) == {'-'}
+                continue
+            if len(parts) >= 2:
+                names.add(parts[1])
+        if not names:
+            return None
+        _available_encoders = names
+    return _available_encoders
+
+def resolve_encoders(profile, log=print):
+    """Troca encoders que o ffmpeg instalado não tem pelo próximo da cadeia
+
+    Chamado uma vez no início do lote; o perfil resultante mantém a forma
+    recebida (um perfil ou uma lista). log=None não avisa a troca.
+    """
+    available = available_encoders()
+    if available is None:
+        return profile
+    resolved = []
+    for target in profiles.as_list(profile):
+        chain = encoder_chain(target)
+        usable = [p for p in chain if not p.get('video_codec') or p['video_codec'] in available]
+        choice = usable[0] if usable else target
+        if choice is not target and log is not None:
+            log(f"⚙️  Encoder {target['video_codec']} indisponível neste ffmpeg; "
+                f"usando {choice['video_codec']} (preset {choice.get('preset')})")
+        resolved.append(choice)
+    return resolved if isinstance(profile, (list, tuple)) else resolved[0]
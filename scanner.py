@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Descoberta de arquivos de entrada: varredura recursiva e duplicatas
+
+A varredura usa os.scandir em uma única passada (o tipo da entrada vem do
+próprio diretório, sem um stat por arquivo), compara as extensões sem
+diferenciar maiúsculas e aplica padrões de inclusão/exclusão. Arquivos
+idênticos em pastas diferentes são detectados pelo tamanho e por um hash
+parcial (primeiro e último MB), para converter só uma cópia.
+"""
+import fnmatch
+import os
+
+MEDIA_EXTENSIONS = ('.avi', '.mkv', '.mp4', '.wav', '.ac3')
+HASH_CHUNK = 1024 * 1024
+
+# Pastas do próprio conversor (saídas e segmentos temporários)
+SKIPPED_DIRS = ('convertida',)
+
+def _matches(patterns, name, relpath):
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(relpath, p) for p in patterns)
+
+def _walk(root, extensions, recursive, include, exclude):
+    """Arquivos de mídia de uma pasta, gerados conforme a varredura avança
+
+    Cada pasta é lida uma vez e processada em ordem alfabética (arquivos e
+    depois subpastas); só a pasta atual e a pilha de pastas pendentes ficam
+    na memória.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        files = []
+        subdirs = []
+        with entries:
+            for entry in entries:
+                relpath = os.path.relpath(entry.path, root)
+                if entry.name.startswith('.') or (exclude and _matches(exclude, entry.name, relpath)):
+                    continue
+                try:
+                    if entry.is_dir():
+                        if recursive and entry.name not in SKIPPED_DIRS:
+                            subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if not entry.name.lower().endswith(extensions):
+                    continue
+                if include and not _matches(include, entry.name, relpath):
+                    continue
+                files.append(entry.path)
+        yield from sorted(files)
+        stack.extend(sorted(subdirs, reverse=True))
+
+def iter_scan(paths, extensions=MEDIA_EXTENSIONS, recursive=True, include=(), exclude=()):
+    """Versão preguiçosa de scan: gera os arquivos sem montar a lista inteira
+
+    Para árvores enormes (o motor em pipeline começa a converter enquanto a
+    varredura continua). Só com várias origens os caminhos já vistos são
+    guardados, para não repetir arquivos de pastas sobrepostas.
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    seen = set() if len(paths) > 1 else None
+    for root in paths:
+        if os.path.isdir(root):
+            found = _walk(root, extensions, recursive, include, exclude)
+        elif root.lower().endswith(extensions) and os.path.isfile(root):
+            found = [root]
+        else:
+            continue
+        for path in found:
+            if seen is not None:
+                key = os.path.realpath(path)
+                if key in seen:
+                    continue
+                seen.add(key)
+            yield path
+
+def scan(paths, extensions=MEDIA_EXTENSIONS, recursive=True, include=(), exclude=()):
+    """Arquivos de mídia das pastas e arquivos informados, sem repetições
+
+    include/exclude são padrões glob (ex.: '*.mkv', 'extras/*') comparados
+    com o nome e com o caminho relativo à pasta informada; exclude também
+    poda pastas inteiras. Arquivos passados diretamente só são filtrados
+    pela extensão. Pastas ocultas e as pastas "convertida" são ignoradas.
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    files = []
+    seen = set()
+
+    def add(path):
+        key = os.path.realpath(path)
+        if key not in seen:
+            seen.add(key)
+            files.append(path)
+
+    for root in paths:
+        if not os.path.isdir(root):
+            if root.lower().endswith(extensions) and os.path.isfile(root):
+                add(root)
+            continue
+        for path in sorted(_walk(root, extensions, recursive, include, exclude)):
+            add(path)
+    return files
+
+def partial_hash(path, chunk=HASH_CHUNK):
+    """Hash do tamanho, do primeiro e do último bloco do arquivo"""
+    import hashlib    # Só a detecção de duplicatas precisa (importação lenta)
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(chunk))
+        if size > chunk:
+            f.seek(max(chunk, size - chunk))
+            digest.update(f.read(chunk))
+    return digest.hexdigest()
+
+def find_duplicates(files):
+    """Separa as fontes únicas das cópias idênticas
+
+    Só arquivos com o mesmo tamanho têm o hash parcial calculado. Retorna
+    (arquivos únicos, {original: [cópias]}), mantendo a ordem de entrada.
+    """
+    by_size = {}
+    for file in files:
+        try:
+            by_size.setdefault(os.path.getsize(file), []).append(file)
+        except OSError:
+            by_size.setdefault(None, []).append(file)
+
+    originals = {}
+    duplicates = {}
+    for size, group in by_size.items():
+        if size is None or len(group) < 2:
+            continue
+        for file in group:
+            try:
+                key = (size, partial_hash(file))
+            except OSError:
+                continue
+            if key in originals:
+                duplicates.setdefault(originals[key], []).append(file)
+            else:
+                originals[key] = file
+
+    copies = {copy for group in duplicates.values() for copy in group}
+    return [f for f in files if f not in copies], duplicates
+
+def link_file(source, target):
+    """Cria target apontando para source: hardlink, ou symlink se não der"""
+    if os.path.exists(target) and os.path.samefile(source, target):
+        return    # Já ligado (renomear um hardlink sobre o outro não faria nada)
+    tmp = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.link")
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        os.symlink(os.path.abspath(source), tmp)
+    os.replace(tmp, target)
+
+def link_tree(source, target):
+    """Recria a pasta target com cada arquivo de source ligado (ver link_file)"""
+    import shutil
+    tmp = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.link")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for entry in os.scandir(source):
+        if entry.is_file():
+            link_file(entry.path, os.path.join(tmp, entry.name))
+    if os.path.isdir(target) and not os.path.islink(target):
+        shutil.rmtree(target)
+    os.replace(tmp, target)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Escalonamento de conversões por custo estimado (maior primeiro)"""
+import heapq
+
+import mediaprobe
+import planner
+import profiles
+
+# Modelo de custo: segundos de encode por segundo de mídia, por processo.
+# Referência: 1080p com libx264 preset medium. Ajuste com base no relatório
+# de makespan previsto x real exibido ao final de cada lote.
+VIDEO_COST_PER_SECOND = 1.0
+GPU_COST_FACTOR = 0.25
+AUDIO_COST_PER_SECOND = 0.02
+COPY_COST_PER_SECOND = 0.002
+REFERENCE_PIXELS = 1920 * 1080
+MIN_PIXEL_FACTOR = 0.1
+
+# Custo relativo dos presets do x264 em relação ao medium
+PRESET_FACTORS = {
+    'ultrafast': 0.15, 'superfast': 0.2, 'veryfast': 0.3, 'faster': 0.5, 'fast': 0.7,
+    'medium': 1.0, 'slow': 1.6, 'slower': 2.5, 'veryslow': 5.0, 'placebo': 10.0,
+}
+HARDWARE_ENCODER_SUFFIXES = ('_videotoolbox', '_nvenc', '_qsv', '_amf', '_vaapi')
+
+def is_hardware_encoder(codec):
+    return bool(codec) and codec.endswith(HARDWARE_ENCODER_SUFFIXES)
+
+def estimate_cost(info, profile, plan=None):
+    """Estima o tempo de conversão (segundos) a partir de duração e resolução
+
+    info é o resumo do mediaprobe e profile o perfil de codificação; plan
+    (planner.plan_conversion) reduz o custo dos streams que serão apenas
+    copiados. Retorna None quando a duração é desconhecida.
+    """
+    duration = info.get('duration') if info else None
+    if not duration:
+        return None
+
+    if plan and plan['path'] == planner.PATH_REMUX:
+        return duration * COPY_COST_PER_SECOND
+
+    video = mediaprobe.first_stream(info, 'video')
+    if profiles.is_audio_only(profile) or video is None or not video['width'] or (plan and plan['video'] == 'copy'):
+        # Apenas áudio (fonte sem vídeo ou vídeo copiado)
+        return duration * AUDIO_COST_PER_SECOND
+
+    pixels = video['width'] * video['height']
+    cost = duration * VIDEO_COST_PER_SECOND * max(pixels / REFERENCE_PIXELS, MIN_PIXEL_FACTOR)
+    if is_hardware_encoder(profile['video_codec']):
+        cost *= GPU_COST_FACTOR
+    else:
+        cost *= PRESET_FACTORS.get(profile.get('preset') or 'medium', 1.0)
+    return cost
+
+def schedule_longest_first(costs, workers):
+    """Ordena os jobs pelo maior custo primeiro (LPT) e prevê o makespan
+
+    Como o ProcessPoolExecutor entrega o próximo job da fila ao primeiro
+    worker livre, submeter nesta ordem reproduz o escalonamento guloso LPT.
+    Custos desconhecidos (None) recebem a média dos conhecidos.
+
+    Retorna (ordem dos índices, makespan previsto em segundos).
+    """
+    known = [c for c in costs if c is not None]
+    default = sum(known) / len(known) if known else 1.0
+    filled = [default if c is None else c for c in costs]
+
+    order = sorted(range(len(filled)), key=lambda i: filled[i], reverse=True)
+
+    # Simular a atribuição ao worker menos carregado
+    loads = [0.0] * max(1, min(workers, len(filled)))
+    heapq.heapify(loads)
+    for i in order:
+        heapq.heappush(loads, heapq.heappop(loads) + filled[i])
+
+    return order, max(loads) if filled else 0.0
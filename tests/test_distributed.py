@@ -0,0 +1,210 @@
+"""Modo distribuído: leases, reatribuição e workers que caem no meio do job
+
+Os testes de integração sobem um coordenador e workers de verdade em
+localhost, com ffmpeg/ffprobe falsos (scripts Python) no PATH.
+"""
+import asyncio
+import glob
+import json
+import os
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+import distributed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ffmpeg/ffprobe falsos: as "mídias" são JSON; o ffmpeg cria a saída logo de
+# início e só a preenche depois de FAKE_SECONDS, como um encode de verdade
+FAKE_FF = textwrap.dedent('''\
+    import json, os, sys, time
+    args = sys.argv[1:]
+    if os.path.basename(sys.argv[0]) == 'ffprobe':
+        with open(args[-1]) as f:
+            media = json.load(f)
+        streams = [dict(s, index=i) for i, s in enumerate(media['streams'])]
+        print(json.dumps({'format': {'duration': str(media['duration']), 'bit_rate': '1000000',
+                                     'format_name': 'avi', 'size': str(os.path.getsize(args[-1]))},
+                          'streams': streams}))
+        sys.exit(0)
+    if args[:1] == ['-version']:
+        print('ffmpeg version 6.0-fake')
+        sys.exit(0)
+    if '-encoders' in args:
+        print(' V..... libx264 H.264\\n A..... aac AAC')
+        sys.exit(0)
+    source = args[args.index('-i') + 1]
+    output = args[-1]
+    open(output, 'w').close()
+    deadline = time.time() + float(os.environ.get('FAKE_SECONDS', '0.2'))
+    while time.time() < deadline:
+        time.sleep(0.05)
+    with open(source) as f:
+        media = json.load(f)
+    media['streams'] = [{'codec_type': 'video', 'codec_name': 'h264', 'width': 640, 'height': 360},
+                        {'codec_type': 'audio', 'codec_name': 'aac', 'sample_rate': '48000', 'channels': 2}]
+    with open(output, 'w') as f:
+        json.dump(media, f)
+''')
+
+@pytest.fixture
+def fake_env(tmp_path):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    script = bin_dir / 'fakeff.py'
+    script.write_text(f"#!{sys.executable}\n{FAKE_FF}")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    for name in ('ffmpeg', 'ffprobe'):
+        (bin_dir / name).symlink_to(script)
+    env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+               CONVERSOR_CACHE_DIR=str(tmp_path / 'cache'), PYTHONUNBUFFERED='1')
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    for name in ('a', 'b', 'c', 'd'):
+        # Conteúdos diferentes: senão a deduplicação converte um só
+        (media_dir / f"{name}.avi").write_text(json.dumps({
+            'duration': 10.0 + ord(name),
+            'streams': [{'codec_type': 'video', 'codec_name': 'mpeg4', 'width': 640, 'height': 360},
+                        {'codec_type': 'audio', 'codec_name': 'mp3', 'sample_rate': '44100', 'channels': 2}]}))
+    return env, media_dir
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start(args, env, **extra):
+    return subprocess.Popen([sys.executable, os.path.join(ROOT, 'convertermoreperformace.py')] + args,
+                            env=dict(env, **extra), cwd=ROOT, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, start_new_session=True)
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def partials(media_dir):
+    return glob.glob(os.path.join(str(media_dir), 'convertida', '.*.partial*'))
+
+def test_expired_lease_goes_to_next_worker():
+    coordinator = distributed.Coordinator(['/acervo/a.avi'], {'format': 'mp4'}, lease_seconds=0.2)
+    first = coordinator.claim('w1')['job']
+    assert first['attempt'] == 1
+    assert coordinator.claim('w2')['job'] is None
+    time.sleep(0.3)
+    second = coordinator.claim('w2')['job']
+    assert (second['id'], second['attempt']) == (first['id'], 2)
+    # O worker antigo já não detém o job: heartbeat e resultado são recusados
+    assert coordinator.heartbeat('w1', [first['id']]) == {'owned': []}
+    assert coordinator.result('w1', first['id'], True) == {'accepted': False}
+    assert coordinator.result('w2', second['id'], True) == {'accepted': True}
+    assert coordinator.status()['done']
+
+def test_expired_lease_fails_after_max_attempts():
+    coordinator = distributed.Coordinator(['/acervo/a.avi'], {'format': 'mp4'}, lease_seconds=0.1,
+                                          max_attempts=1)
+    coordinator.claim('w1')
+    time.sleep(0.2)
+    assert coordinator.claim('w2')['job'] is None
+    assert coordinator.jobs[0]['state'] == distributed.STATE_FAILED
+    assert coordinator.status()['done']
+
+def test_partial_tag_is_per_worker_and_attempt():
+    assert distributed.partial_tag('host/1', 1) != distributed.partial_tag('host/1', 2)
+    assert distributed.partial_tag('nas.local-42', 3) == 'nas_local-42-3'
+
+def test_hung_heartbeat_still_cancels_before_lease_expires(monkeypatch):
+    # Coordenador que aceita a conexão e nunca responde (rede particionada)
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    accepted = []
+    threading.Thread(target=lambda: accepted.append(server.accept()), daemon=True).start()
+    url = f"http://127.0.0.1:{server.getsockname()[1]}"
+    monkeypatch.setattr(distributed, 'REQUEST_TIMEOUT', 60.0)
+    monkeypatch.setattr(distributed, 'WATCHDOG_SECONDS', 0.05)
+    lease = 1.0
+
+    async def scenario():
+        running = {0: asyncio.ensure_future(asyncio.sleep(60))}
+        last_ack = {0: time.time()}
+        tasks = [asyncio.ensure_future(distributed._heartbeats(url, 'w1', running, last_ack, lease)),
+                 asyncio.ensure_future(distributed._watchdog(running, last_ack, lease))]
+        start_time = time.time()
+        try:
+            await asyncio.wait_for(asyncio.gather(running[0], return_exceptions=True), lease * 2)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return running[0].cancelled(), time.time() - start_time
+
+    try:
+        cancelled, elapsed = asyncio.run(scenario())
+    finally:
+        server.close()
+    assert cancelled
+    assert elapsed < lease
+
+def test_worker_killed_mid_job_is_reassigned(fake_env):
+    env, media_dir = fake_env
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    coordinator = start(['coordinator', str(media_dir), '--port', str(port), '--lease', '2'], env)
+    slow = fast = None
+    try:
+        slow = start(['worker', url, '-w', '1', '--id', 'lento'], env, FAKE_SECONDS='60')
+        assert wait_for(lambda: partials(media_dir)), "o worker lento não começou nenhum job"
+        os.killpg(slow.pid, signal.SIGKILL)    # Junto com o ffmpeg dele
+        slow.wait()
+        fast = start(['worker', url, '-w', '1', '--id', 'rapido'], env, FAKE_SECONDS='0.2')
+        output, _ = coordinator.communicate(timeout=60)
+        fast.wait(timeout=30)
+    finally:
+        for process in (coordinator, slow, fast):
+            if process is not None and process.poll() is None:
+                os.killpg(process.pid, signal.SIGKILL)
+    assert coordinator.returncode == 0, output
+    assert '♻️' in output and 'lento parou de responder' in output
+    for name in ('a', 'b', 'c', 'd'):
+        assert os.path.getsize(media_dir / 'convertida' / f"{name}.mp4") > 0
+    # O temporário do worker morto foi apagado quando o job foi publicado
+    assert partials(media_dir) == []
+
+def test_stopped_worker_loses_lease_and_leaves_other_output_alone(fake_env):
+    env, media_dir = fake_env
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    coordinator = start(['coordinator', str(media_dir), '--port', str(port), '--lease', '2'], env)
+    first = second = None
+    try:
+        first = start(['worker', url, '-w', '1', '--id', 'pausado'], env, FAKE_SECONDS='4')
+        assert wait_for(lambda: partials(media_dir)), "o primeiro worker não começou nenhum job"
+        os.kill(first.pid, signal.SIGSTOP)    # Só o worker: o ffmpeg dele segue gravando
+        second = start(['worker', url, '-w', '2', '--id', 'segundo'], env, FAKE_SECONDS='0.5')
+        time.sleep(3)
+        os.kill(first.pid, signal.SIGCONT)
+        output, _ = coordinator.communicate(timeout=60)
+        first_output, _ = first.communicate(timeout=30)
+        second.wait(timeout=30)
+    finally:
+        for process in (coordinator, first, second):
+            if process is not None and process.poll() is None:
+                os.killpg(process.pid, signal.SIGKILL)
+    assert coordinator.returncode == 0, output
+    assert 'pausado parou de responder' in output
+    assert 'cancelando o job' in first_output, first_output
+    for name in ('a', 'b', 'c', 'd'):
+        with open(media_dir / 'convertida' / f"{name}.mp4") as f:
+            assert json.load(f)['streams']
+    assert partials(media_dir) == []
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Miniaturas e folha de contato (sprite) geradas junto com a conversão
+
+Com 'thumbnails' no perfil, N quadros espaçados igualmente pelo vídeo são
+gravados como JPEG ou WebP, e os mesmos quadros lado a lado viram um
+sprite. Quando o vídeo já vai ser reconvertido, as miniaturas são saídas
+extras do mesmo ffmpeg (o quadro já decodificado só passa por um filtro de
+escala). Quando o vídeo é copiado (remux), um ffmpeg separado decodifica
+apenas os quadros-chave (-skip_frame nokey), o que leva segundos em vez de
+uma segunda decodificação completa.
+"""
+import math
+import os
+
+import mediaprobe
+
+MODE_AUTO = 'auto'
+MODE_SAME_PASS = 'same-pass'
+MODE_KEYFRAMES = 'keyframes'
+MODES = (MODE_AUTO, MODE_SAME_PASS, MODE_KEYFRAMES)
+
+FORMATS = ('jpg', 'webp')
+DEFAULT_FORMAT = 'jpg'
+DEFAULT_WIDTH = 320
+
+# Qualidade das imagens (mjpeg: 2 = melhor, 31 = pior; libwebp: 0-100)
+IMAGE_ARGS = {
+    'jpg': ['-c:v', 'mjpeg', '-q:v', '3'],
+    'webp': ['-c:v', 'libwebp', '-quality', '75'],
+}
+
+def output_names(final_file, fmt=DEFAULT_FORMAT):
+    """Pasta das miniaturas e arquivo do sprite ao lado da saída principal"""
+    directory, name = os.path.split(final_file)
+    stem = os.path.splitext(name)[0]
+    return os.path.join(directory, f"{stem}_miniaturas"), os.path.join(directory, f"{stem}_sprite.{fmt}")
+
+def grid(count, columns=None):
+    """(colunas, linhas) do sprite; sem colunas, o mais próximo de um quadrado"""
+    columns = max(1, min(count, columns or math.ceil(math.sqrt(count))))
+    return columns, math.ceil(count / columns)
+
+def choose_mode(profile, plan):
+    """Mesma passada quando o vídeo já é decodificado; senão, só quadros-chave"""
+    mode = profile.get('thumbnail_mode', MODE_AUTO)
+    if mode != MODE_AUTO:
+        return mode
+    return MODE_SAME_PASS if plan and plan['video'] == 'encode' else MODE_KEYFRAMES
+
+def output_args(profile, duration, thumbs_dir, sprite_file):
+    """Saídas do ffmpeg para as miniaturas e o sprite (a partir do 1º stream de vídeo)
+
+    Os quadros são tirados no meio de cada um dos N intervalos iguais do
+    vídeo; cada saída tem sua própria cadeia de filtros, sobre os mesmos
+    quadros decodificados. O sprite é uma imagem só: '-update 1' evita o
+    aviso do ffmpeg sobre nome sem padrão de sequência (%03d).
+    """
+    count = int(profile['thumbnails'])
+    fmt = profile.get('thumbnail_format', DEFAULT_FORMAT)
+    width = int(profile.get('thumbnail_width', DEFAULT_WIDTH))
+    columns, rows = grid(count, profile.get('sprite_columns'))
+    sample = f"fps={count}/{duration:.3f}:start_time={duration / count / 2:.3f},scale={width}:-2"
+    image = IMAGE_ARGS[fmt]
+    return (['-map', '0:v:0', '-vf', sample, '-frames:v', str(count)] + image
+            + ['-y', os.path.join(thumbs_dir, f"%03d.{fmt}")]
+            + ['-map', '0:v:0', '-vf', f"{sample},tile={columns}x{rows}", '-frames:v', '1'] + image
+            + ['-update', '1', '-y', sprite_file])
+
+def prepare(input_file, profile, info, plan, thumbs_dir, sprite_file):
+    """Miniaturas de um job
+
+    thumbs_dir e sprite_file são os nomes temporários (publicados ao fim
+    da conversão). Retorna (argumentos a acrescentar ao ffmpeg principal,
+    comando separado ou None, mensagem para o log); sem duração ou sem
+    vídeo, as miniaturas são puladas.
+    """
+    filename = os.path.basename(input_file)
+    duration = info['duration'] if info else None
+    if not duration or mediaprobe.first_stream(info, 'video') is None:
+        return [], None, f"⚠️  {filename}: sem vídeo ou sem duração, miniaturas puladas"
+    os.makedirs(thumbs_dir, exist_ok=True)
+    args = output_args(profile, duration, thumbs_dir, sprite_file)
+    count = int(profile['thumbnails'])
+    if choose_mode(profile, plan) == MODE_SAME_PASS:
+        return args, None, f"🖼️  {filename}: {count} miniaturas e sprite na mesma passada"
+    command = ['ffmpeg', '-skip_frame', 'nokey', '-i', input_file] + args
+    return [], command, f"🖼️  {filename}: {count} miniaturas e sprite pelos quadros-chave"
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Ajuste automático de processos simultâneos e threads por tipo de job
+
+Jobs de áudio (MP3/AC3) e remux são praticamente single-thread, então
+rodam vários ao mesmo tempo; encodes de vídeo dividem as CPUs entre si
+com -threads. A memória disponível limita o total de jobs. Uma calibração
+opcional mede a melhor configuração na máquina e a guarda para as
+próximas execuções.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import profiles
+
+JOB_VIDEO = 'video'
+JOB_AUDIO = 'audio'
+JOB_COPY = 'copy'
+
+# Memória estimada por job (encode 1080p com lookahead do x264, áudio, remux)
+MEMORY_PER_JOB = {
+    JOB_VIDEO: 800 * 1024 * 1024,
+    JOB_AUDIO: 64 * 1024 * 1024,
+    JOB_COPY: 64 * 1024 * 1024,
+}
+# Remux é limitado pelo disco: mais processos só disputam I/O
+MAX_COPY_WORKERS = 8
+MIN_VIDEO_THREADS = 2
+MAX_VIDEO_THREADS = 8
+
+CALIBRATION_FILE = os.path.join(profiles.default_config_dir(), 'tuning.json')
+
+def available_memory():
+    """Memória disponível em bytes (None se não for possível descobrir)"""
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        elif sys.platform == 'darwin':
+            result = subprocess.run(['sysctl', '-n', 'hw.memsize'], capture_output=True, text=True)
+            # Sem MemAvailable no macOS: considerar metade da memória física
+            return int(result.stdout.strip()) // 2
+        elif os.name == 'nt':
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                    ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                    ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                    ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                    ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+                ]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return status.ullAvailPhys
+    except (OSError, ValueError):
+        pass
+    return None
+
+def job_type(profile, plan=None):
+    """Classifica o job: vídeo (encode), áudio ou cópia (remux)"""
+    if plan is not None and plan['path'] == 'remux':
+        return JOB_COPY
+    if profiles.is_audio_only(profile):
+        return JOB_AUDIO
+    if plan is not None and plan['video'] == 'copy':
+        return JOB_AUDIO
+    return JOB_VIDEO
+
+def heaviest(kinds):
+    """Tipo mais pesado de um conjunto de jobs (vídeo > áudio > cópia)"""
+    return next((k for k in (JOB_VIDEO, JOB_AUDIO, JOB_COPY) if k in kinds), JOB_VIDEO)
+
+def load_calibration():
+    try:
+        with open(CALIBRATION_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _calibration_key(kind, cpu_count):
+    return f"{socket.gethostname()}|{cpu_count}|{kind}"
+
+def recommend(kind=JOB_VIDEO, cpu_count=None, memory=None, use_calibration=True):
+    """Retorna (processos, threads por processo) para o tipo de job"""
+    cpu_count = cpu_count or os.cpu_count() or 1
+
+    if use_calibration:
+        saved = load_calibration().get(_calibration_key(kind, cpu_count))
+        if saved:
+            return saved['workers'], saved['threads']
+
+    if kind == JOB_VIDEO:
+        # Poucas threads por encode e vários encodes ao mesmo tempo escalam
+        # melhor que um único libx264 com todas as CPUs
+        threads = max(MIN_VIDEO_THREADS, min(MAX_VIDEO_THREADS, cpu_count // 8))
+        workers = max(1, cpu_count // threads)
+    elif kind == JOB_COPY:
+        workers = max(1, min(cpu_count, MAX_COPY_WORKERS))
+        threads = 1
+    else:
+        workers = cpu_count
+        threads = 1
+
+    # Limite pela memória disponível
+    memory = memory if memory is not None else available_memory()
+    if memory:
+        workers = max(1, min(workers, memory // MEMORY_PER_JOB[kind]))
+
+    if kind == JOB_VIDEO:
+        threads = max(1, cpu_count // workers)
+    return workers, threads
+
+def threads_for(workers, kind=JOB_VIDEO, cpu_count=None):
+    """Threads por processo quando o número de processos foi escolhido pelo usuário"""
+    if kind != JOB_VIDEO:
+        return 1
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, cpu_count // max(1, workers))
+
+def _calibration_run(input_file, profile, workers, threads, seconds):
+    """Executa `workers` encodes simultâneos de um trecho e mede o throughput"""
+    # Saída descartada (-f null) e duração limitada ao trecho
+    cmd = profiles.build_command(input_file, '-', dict(profile, format='null'), threads=threads)
+    cmd = cmd[:3] + ['-t', str(seconds)] + cmd[3:-1] + ['-f', 'null', '-']
+    start = time.time()
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda _: subprocess.run(cmd, capture_output=True).returncode, range(workers)))
+    wall = time.time() - start
+    if any(results):
+        return None
+    return workers * seconds / wall
+
+def calibrate(input_file, profile, seconds=20, candidates=None, cpu_count=None):
+    """Mede várias combinações de processos/threads e guarda a mais rápida
+
+    Retorna a lista de medições [(processos, threads, segundos de mídia por segundo)].
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    kind = job_type(profile)
+    if candidates is None:
+        candidates = sorted({1, 2, 4, 8, 16, 32, 64, cpu_count} & set(range(1, cpu_count + 1)))
+
+    measurements = []
+    for workers in candidates:
+        threads = threads_for(workers, kind, cpu_count)
+        throughput = _calibration_run(input_file, profile, workers, threads, seconds)
+        if throughput is not None:
+            measurements.append((workers, threads, throughput))
+            print(f"   • {workers} processos x {threads} threads: {throughput:.2f}x tempo real")
+
+    if measurements:
+        workers, threads, throughput = max(measurements, key=lambda m: m[2])
+        saved = load_calibration()
+        saved[_calibration_key(kind, cpu_count)] = {
+            'workers': workers, 'threads': threads, 'throughput': throughput,
+            'calibrated_at': time.time(),
+        }
+        os.makedirs(os.path.dirname(CALIBRATION_FILE), exist_ok=True)
+        with open(CALIBRATION_FILE, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, indent=2)
+    return measurements
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Verificação das saídas depois da conversão
+
+O código de saída do ffmpeg não garante que o arquivo gravado esteja
+inteiro (ex.: uma falha do NFS no meio da escrita). Cada saída é sondada
+de novo e comparada com a fonte: a duração precisa bater dentro da
+tolerância, e os streams esperados pelo plano precisam existir com os
+codecs certos. Opcionalmente a saída é decodificada inteira (-f null) em
+um pool de baixa prioridade, para não roubar CPU das conversões. Saídas
+reprovadas são apagadas, para que --incremental/--resume as refaçam.
+"""
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mediaprobe
+import planner
+import profiles
+
+DURATION_TOLERANCE_SECONDS = 1.0
+# Em arquivos longos vale a tolerância relativa, se for maior
+DURATION_TOLERANCE_RATIO = 0.01
+DEFAULT_WORKERS = 1
+# Prioridade das decodificações de verificação (nice no Linux/macOS)
+LOW_PRIORITY_NICE = 10
+STDERR_TAIL_LINES = 5
+
+def _streams(info, codec_type):
+    return [s for s in (info or {}).get('streams', [])
+            if s['codec_type'] == codec_type and not s.get('attached_pic')]
+
+def _expected_codec(action, target, source_stream, codec_type):
+    if action == 'copy':
+        return source_stream['codec_name'] if source_stream else None
+    encoder = target.get('video_codec' if codec_type == 'video' else 'audio_codec')
+    return profiles.ENCODER_CODECS.get(encoder)
+
+def check_output(output_file, target, source_info, tolerance=None):
+    """Problemas encontrados em uma saída (lista vazia se estiver ok)
+
+    source_info é a sondagem da fonte (mediaprobe.probe_media); tolerance,
+    em segundos, substitui a tolerância padrão da duração.
+    """
+    # Sem o cache: a saída acabou de ser gravada e pode ser regravada
+    info = mediaprobe.run_ffprobe(output_file)
+    if info is None:
+        return ["o ffprobe não conseguiu ler a saída"]
+    problems = []
+
+    expected = source_info['duration'] if source_info else None
+    if expected:
+        if tolerance is None:
+            tolerance = max(DURATION_TOLERANCE_SECONDS, expected * DURATION_TOLERANCE_RATIO)
+        actual = info['duration'] or 0.0
+        if abs(actual - expected) > tolerance:
+            problems.append(f"duração {actual:.1f}s, esperado {expected:.1f}s")
+
+    plan = planner.plan_conversion(source_info, target)
+    for codec_type in ('video', 'audio'):
+        streams = _streams(info, codec_type)
+        action = plan[codec_type]
+        if not action:
+            continue
+        if not streams:
+            problems.append(f"sem stream de {'vídeo' if codec_type == 'video' else 'áudio'}")
+            continue
+        source_stream = mediaprobe.first_stream(source_info, codec_type)
+        codec = _expected_codec(action, target, source_stream, codec_type)
+        if codec and streams[0]['codec_name'] != codec:
+            problems.append(f"codec {streams[0]['codec_name']}, esperado {codec}")
+    return problems
+
+def decode_check(output_file):
+    """Decodifica a saída inteira em baixa prioridade; retorna o erro ou None"""
+    cmd = ['ffmpeg', '-v', 'error', '-nostdin', '-xerror', '-i', output_file, '-map', '0', '-f', 'null', '-']
+    options = {}
+    if os.name == 'nt':
+        options['creationflags'] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    elif shutil.which('nice'):
+        # Pelo nice, não por preexec_fn: roda em threads, onde preexec_fn
+        # pode travar o processo filho
+        cmd = ['nice', '-n', str(LOW_PRIORITY_NICE)] + cmd
+    try:
+        result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, errors='replace', **options)
+    except OSError as e:
+        return f"decodificação falhou: {e}"
+    if result.returncode != 0:
+        lines = [line for line in result.stderr.splitlines() if line.strip()][-STDERR_TAIL_LINES:]
+        return "decodificação falhou" + (f": {lines[-1].strip()}" if lines else "")
+    return None
+
+def verify_job(input_file, outputs, profile, decode=False, tolerance=None):
+    """Verifica as saídas de um job (outputs como em core.job_outputs)
+
+    Retorna {'ok', 'problems', 'seconds'}; as saídas de um job reprovado
+    são apagadas.
+    """
+    start_time = time.time()
+    source_info = mediaprobe.probe_media(input_file)
+    problems = []
+    for target, (final_file, _) in zip(profiles.as_list(profile), outputs):
+        name = os.path.basename(final_file)
+        if not os.path.exists(final_file):
+            problems.append(f"{name}: saída ausente")
+            continue
+        found = check_output(final_file, target, source_info, tolerance)
+        if not found and decode:
+            error = decode_check(final_file)
+            found = [error] if error else []
+        problems += [f"{name}: {problem}" for problem in found]
+    if problems:
+        for final_file, _ in outputs:
+            if os.path.exists(final_file):
+                os.remove(final_file)
+    return {'ok': not problems, 'problems': problems, 'seconds': time.time() - start_time}
+
+class Verifier:
+    """Pool de verificação que roda enquanto o lote continua
+
+    submit() é chamado a cada job concluído; results() espera as
+    verificações pendentes e retorna {entrada: resultado de verify_job}.
+    """
+
+    def __init__(self, profile, decode=False, workers=DEFAULT_WORKERS, tolerance=None):
+        self.profile = profile
+        self.decode = decode
+        self.tolerance = tolerance
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='verificacao')
+        self._futures = {}
+
+    def verify(self, input_file, outputs):
+        return verify_job(input_file, outputs, self.profile, self.decode, self.tolerance)
+
+    def submit(self, input_file, outputs):
+        self._futures[input_file] = self._executor.submit(self.verify, input_file, outputs)
+
+    def results(self):
+        results = {}
+        for input_file, future in self._futures.items():
+            try:
+                results[input_file] = future.result()
+            except Exception as e:
+                results[input_file] = {'ok': False, 'problems': [f"verificação falhou: {e}"], 'seconds': 0.0}
+        self._executor.shutdown()
+        return results
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""Modo watch: monitora pastas e converte os arquivos que chegam
+
+Os diretórios são monitorados com inotify (Linux, via ctypes) ou, nos
+outros sistemas, por varredura periódica. Um arquivo só entra na fila
+depois de ficar sem mudanças por alguns segundos (cópia terminada). A fila
+fica em SQLite: estado, tentativas e prioridades sobrevivem a reinícios, e
+outro processo pode adicionar arquivos (watch --add) com o daemon rodando.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import admission
+import convertermoreperformace as core
+import manifest
+import mediaprobe
+import profiles
+import recovery
+import tuning
+
+DEFAULT_QUEUE = os.path.join(mediaprobe.default_cache_dir(), 'watch-queue.sqlite3')
+DEFAULT_SETTLE_SECONDS = 5.0
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 60
+
+STATE_PENDING = 'pending'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+# Eventos do inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+def is_candidate(path):
+    """Arquivo de mídia que deve ser convertido (ignora saídas e temporários)"""
+    name = os.path.basename(path)
+    if name.startswith('.') or os.path.basename(os.path.dirname(path)) == 'convertida':
+        return False
+    return os.path.splitext(name)[1].lower() in core.MEDIA_EXTENSIONS
+
+class JobQueue:
+    """Fila durável de conversões em SQLite (segura entre processos)"""
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_QUEUE
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE, size INTEGER,'
+                ' mtime_ns INTEGER, profile TEXT, priority INTEGER DEFAULT 0,'
+                ' state TEXT, attempts INTEGER DEFAULT 0, last_error TEXT,'
+                ' enqueued_at REAL, next_attempt_at REAL DEFAULT 0, updated_at REAL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, priority)')
+
+    def enqueue(self, path, profile, priority=0):
+        """Adiciona (ou reativa) um arquivo; retorna False se já foi convertido nessa versão"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT state, size, mtime_ns FROM jobs WHERE path = ?', (path,)).fetchone()
+            if row is not None:
+                state, size, mtime_ns = row
+                unchanged = (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+                if unchanged and state != STATE_FAILED:
+                    # Já na fila, em andamento ou concluído: só ajustar a prioridade
+                    self._conn.execute('UPDATE jobs SET priority = MAX(priority, ?) WHERE path = ?',
+                                       (priority, path))
+                    return False
+            self._conn.execute(
+                'INSERT OR REPLACE INTO jobs (path, size, mtime_ns, profile, priority, state, attempts,'
+                ' last_error, enqueued_at, next_attempt_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 0, NULL, ?, 0, ?)',
+                (path, stat.st_size, stat.st_mtime_ns, json.dumps(profile), priority, STATE_PENDING, now, now)
+            )
+        return True
+
+    def claim(self, limit):
+        """Marca até `limit` jobs pendentes como em andamento e os retorna
+
+        Maior prioridade primeiro; dentro da mesma prioridade, ordem de chegada.
+        Retorna a lista de (id, caminho, perfil).
+        """
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                'SELECT id, path, profile FROM jobs WHERE state = ? AND next_attempt_at <= ?'
+                ' ORDER BY priority DESC, enqueued_at ASC LIMIT ?',
+                (STATE_PENDING, now, limit)
+            ).fetchall()
+            for job_id, _, _ in rows:
+                self._conn.execute(
+                    'UPDATE jobs SET state = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?',
+                    (STATE_RUNNING, now, job_id))
+        return [(job_id, path, json.loads(profile)) for job_id, path, profile in rows]
+
+    def finish(self, job_id, success, error=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Registra o resultado; falhas voltam para a fila até max_attempts tentativas"""
+        now = time.time()
+        with self._lock, self._conn:
+            if success:
+                self._conn.execute('UPDATE jobs SET state = ?, last_error = NULL, updated_at = ? WHERE id = ?',
+                                   (STATE_DONE, now, job_id))
+                return STATE_DONE
+            attempts = self._conn.execute('SELECT attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()[0]
+            state = STATE_PENDING if attempts < max_attempts else STATE_FAILED
+            # Nova tentativa com espera crescente
+            self._conn.execute(
+                'UPDATE jobs SET state = ?, last_error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?',
+                (state, error, now + RETRY_BACKOFF_SECONDS * attempts, now, job_id))
+        return state
+
+    def release(self, job_id):
+        """Devolve um job retirado por claim à fila, sem contar a tentativa"""
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE jobs SET state = ?, attempts = attempts - 1 WHERE id = ?',
+                               (STATE_PENDING, job_id))
+
+    def recover(self):
+        """Jobs 'running' de uma execução interrompida voltam para a fila"""
+        with self._lock, self._conn:
+            return self._conn.execute('UPDATE jobs SET state = ? WHERE state = ?',
+                                      (STATE_PENDING, STATE_RUNNING)).rowcount
+
+    def counts(self):
+        with self._lock, self._conn:
+            return dict(self._conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+
+    def jobs(self):
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'SELECT path, state, priority, attempts, last_error FROM jobs'
+                ' ORDER BY state, priority DESC, enqueued_at').fetchall()
+
+    def close(self):
+        self._conn.close()
+
+class InotifyWatcher:
+    """Monitora diretórios com inotify (Linux) via ctypes"""
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._dirs = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch falhou: {directory}")
+            self._dirs[wd] = directory
+
+    def poll(self, timeout):
+        """Caminhos criados/alterados; None quando a fila do kernel estourou (revarrer tudo)"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if wd in self._dirs and name:
+                paths.append(os.path.join(self._dirs[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """Alternativa portátil: varre os diretórios a cada intervalo"""
+
+    def __init__(self, directories, interval=DEFAULT_POLL_INTERVAL):
+        self.directories = directories
+        self.interval = interval
+        self._seen = {}
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        paths = []
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if entry.is_file() and self._seen.get(entry.path) != signature:
+                    self._seen[entry.path] = signature
+                    paths.append(entry.path)
+        return paths
+
+    def close(self):
+        pass
+
+def create_watcher(directories, polling=False, interval=DEFAULT_POLL_INTERVAL):
+    """inotify quando disponível; senão, varredura periódica"""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify indisponível ({e}); usando varredura periódica")
+    return PollingWatcher(directories, interval)
+
+class SettleTracker:
+    """Libera um arquivo só depois de `settle` segundos sem mudar tamanho/mtime"""
+
+    def __init__(self, settle=DEFAULT_SETTLE_SECONDS):
+        self.settle = settle
+        self._candidates = {}   # caminho -> (tamanho, mtime_ns, estável desde)
+
+    def touch(self, path):
+        if is_candidate(path):
+            self._candidates.setdefault(path, (None, None, None))
+
+    def ready(self, now=None):
+        now = now if now is not None else time.time()
+        settled = []
+        for path, (size, mtime_ns, since) in list(self._candidates.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Apagado ou renomeado antes de terminar a cópia
+                del self._candidates[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self._candidates[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif now - since >= self.settle:
+                del self._candidates[path]
+                settled.append(path)
+        return settled
+
+    def __len__(self):
+        return len(self._candidates)
+
+def _enqueue(queue, path, profile, priority=0):
+    targets = profiles.as_list(profile)
+    if all(manifest.is_up_to_date(path, core.get_output_path(path, t['format'])) for t in targets):
+        return False
+    try:
+        return queue.enqueue(path, profile, priority)
+    except OSError:
+        return False
+
+def run_daemon(directories, profile, max_workers=None, settle=DEFAULT_SETTLE_SECONDS,
+               polling=False, interval=DEFAULT_POLL_INTERVAL, max_attempts=DEFAULT_MAX_ATTEMPTS,
+               queue_path=None, metrics_path=None, admission_control=None):
+    """Laço principal do modo watch (termina com Ctrl+C)
+
+    metrics_path recebe uma linha de métricas por job (ver metrics.py);
+    admission_control (admission.AdmissionController) segura os jobs que
+    não caberiam na memória ou no disco.
+    """
+    queue = JobQueue(queue_path)
+    recovered = queue.recover()
+    if recovered:
+        print(f"♻️  {recovered} jobs interrompidos voltaram para a fila")
+
+    controller = admission_control or admission.AdmissionController()
+    profile = recovery.resolve_encoders(profile)
+    kinds = {tuning.job_type(target) for target in profiles.as_list(profile)}
+    kind = tuning.heaviest(kinds)
+    if max_workers is None:
+        max_workers, threads = tuning.recommend(kind)
+    else:
+        threads = tuning.threads_for(max_workers, kind)
+
+    directories = [os.path.abspath(d) for d in directories]
+    watcher = create_watcher(directories, polling, interval)
+    tracker = SettleTracker(settle)
+    # Arquivos que já estavam nas pastas entram na fila como qualquer outro
+    for directory in directories:
+        for file in core.find_media_files(directory, recursive=False):
+            tracker.touch(os.path.abspath(file))
+
+    print(f"👀 Monitorando {len(directories)} pasta(s) com {type(watcher).__name__} | "
+          f"{max_workers} processos | fila: {queue.path}")
+    print("   Pressione Ctrl+C para sair")
+
+    running = {}
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                changed = watcher.poll(1.0)
+                if changed is None:
+                    for directory in directories:
+                        for file in core.find_media_files(directory, recursive=False):
+                            tracker.touch(os.path.abspath(file))
+                else:
+                    for path in changed:
+                        tracker.touch(path)
+
+                for path in tracker.ready():
+                    if _enqueue(queue, path, profile):
+                        print(f"📥 Na fila: {os.path.basename(path)}")
+
+                # Alimentar o pool com jobs da fila (inclusive os de watch --add),
+                # um por vez enquanto couberem na memória e no disco
+                while len(running) < max_workers:
+                    claimed = queue.claim(1)
+                    if not claimed:
+                        break
+                    job_id, path, job_profile = claimed[0]
+                    # Jobs de watch --add guardam o perfil pedido, sem a troca de encoders
+                    job_profile = recovery.resolve_encoders(job_profile, log=None)
+                    if not os.path.exists(path):
+                        queue.finish(job_id, False, "arquivo não encontrado", max_attempts=0)
+                        continue
+                    estimate = admission.estimate_job(path, job_profile, core.job_outputs(path, job_profile))
+                    reason = controller.check(estimate)
+                    if reason:
+                        # O espaço pode ser liberado depois: falha com nova tentativa
+                        queue.finish(job_id, False, reason, max_attempts)
+                        print(f"❌ Não iniciado: {os.path.basename(path)} - {reason}")
+                        continue
+                    if not controller.try_admit(estimate):
+                        queue.release(job_id)
+                        break
+                    future = executor.submit(core.convert_file, path, len(running) + 1,
+                                             profile=job_profile, threads=threads,
+                                             metrics_path=metrics_path, submitted_at=time.time())
+                    running[future] = (job_id, path, estimate)
+
+                if running:
+                    done, _ = wait(list(running), timeout=0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id, path, estimate = running.pop(future)
+                        controller.release(estimate)
+                        try:
+                            success, _, _ = future.result()
+                            error = None if success else "ffmpeg falhou"
+                        except Exception as e:
+                            success, error = False, str(e)
+                        state = queue.finish(job_id, success, error, max_attempts)
+                        if state == STATE_PENDING:
+                            print(f"🔁 {os.path.basename(path)} falhou; nova tentativa mais tarde")
+                        elif state == STATE_FAILED:
+                            print(f"❌ {os.path.basename(path)} falhou após {max_attempts} tentativas")
+    except KeyboardInterrupt:
+        print("\n🛑 Encerrando o modo watch (jobs em andamento voltam para a fila no próximo início)")
+    finally:
+        watcher.close()
+        queue.close()
+
+def print_status(queue_path=None):
+    queue = JobQueue(queue_path)
+    try:
+        counts = queue.counts()
+        print(f"📋 Fila {queue.path}: " + (', '.join(f"{state}: {n}" for state, n in sorted(counts.items()))
+                                           or "vazia"))
+        for path, state, priority, attempts, last_error in queue.jobs():
+            line = f"   {state:8} p={priority:<3} tentativas={attempts} {path}"
+            if last_error:
+                line += f" ({last_error})"
+            print(line)
+    finally:
+        queue.close()